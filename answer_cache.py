@@ -0,0 +1,200 @@
+"""
+Answer Cache
+Reuses answers to repeated (or near-identical) questions about the same video
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and strip punctuation and extra whitespace"""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return vector / norm
+
+
+def _index_scope(scope: str) -> Tuple[str, str, str]:
+    """Qualify a scope with what its answers depend on besides the videos: the index layout and the LLM"""
+    return Config.index_namespace(), Config.OPENAI_MODEL, scope
+
+
+class _Entry:
+    __slots__ = ("answer", "created")
+
+    def __init__(self, answer: Any, created: float) -> None:
+        self.answer = answer
+        self.created = created
+
+
+class _ScopeVectors:
+    """Question embeddings of one scope as rows of a matrix, so they are scored in one product"""
+
+    def __init__(self, dimensions: int) -> None:
+        self.matrix = np.empty((8, dimensions), dtype=np.float32)
+        self.keys: List[tuple] = []
+        self.rows: Dict[tuple, int] = {}
+
+    def add(self, key: tuple, vector: np.ndarray) -> None:
+        if key in self.rows:
+            self.matrix[self.rows[key]] = vector
+            return
+        if len(self.keys) == len(self.matrix):
+            self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+        self.rows[key] = len(self.keys)
+        self.matrix[len(self.keys)] = vector
+        self.keys.append(key)
+
+    def remove(self, key: tuple) -> None:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        # The last row fills the gap
+        last = self.keys.pop()
+        if last != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last
+            self.rows[last] = row
+
+    def best(self, vector: np.ndarray) -> Tuple[Optional[tuple], float]:
+        if not self.keys or len(vector) != self.matrix.shape[1]:
+            return None, -1.0
+        scores = self.matrix[:len(self.keys)] @ vector
+        row = int(np.argmax(scores))
+        return self.keys[row], float(scores[row])
+
+
+class AnswerCache:
+    """LRU cache of answers keyed by (scope, normalized question), with TTL
+
+    A scope names the videos an answer was drawn from, as comma-separated
+    video IDs; it is qualified with the index namespace and LLM model, so
+    re-chunked indexes or another model never reuse answers. If
+    ``embed_query`` is given to ``get``/``put``, a semantic tier also
+    returns the answer of a cached question in the same scope whose
+    embedding has cosine similarity of at least ``similarity_threshold``
+    with the new question.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = Config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = Config.ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = Config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._vectors: Dict[tuple, _ScopeVectors] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created > self.ttl_seconds
+
+    def _delete(self, key: tuple) -> None:
+        del self._entries[key]
+        vectors = self._vectors.get(key[0])
+        if vectors is not None:
+            vectors.remove(key)
+            if not vectors.keys:
+                del self._vectors[key[0]]
+
+    def get(self, scope: str, question: str, embed_query: Optional[Callable] = None) -> Optional[Any]:
+        """Return a cached answer for the question, or None"""
+        scope = _index_scope(scope)
+        key = (scope, normalize_question(question))
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(key)
+                    self.exact_hits += 1
+                    return entry.answer
+                self._delete(key)
+            searchable = embed_query is not None and scope in self._vectors
+            if not searchable:
+                self.misses += 1
+                return None
+
+        # Embedding may be a network call, so it happens outside the lock
+        vector = _unit(embed_query(question))
+        with self._lock:
+            vectors = self._vectors.get(scope)
+            best_key, best_score = vectors.best(vector) if vectors is not None else (None, -1.0)
+            entry = self._entries.get(best_key) if best_key is not None else None
+            if entry is not None and self._expired(entry, now):
+                self._delete(best_key)
+                entry = None
+            if entry is not None and best_score >= self.similarity_threshold:
+                self._entries.move_to_end(best_key)
+                self.semantic_hits += 1
+                return entry.answer
+            self.misses += 1
+        return None
+
+    def put(self, scope: str, question: str, answer: Any, embed_query: Optional[Callable] = None) -> None:
+        """Cache an answer, evicting the least recently used entries over capacity"""
+        vector = _unit(embed_query(question)) if embed_query is not None else None
+        scope = _index_scope(scope)
+        key = (scope, normalize_question(question))
+        with self._lock:
+            self._entries[key] = _Entry(answer, time.time())
+            self._entries.move_to_end(key)
+            if vector is not None:
+                if scope not in self._vectors:
+                    self._vectors[scope] = _ScopeVectors(len(vector))
+                self._vectors[scope].add(key, vector)
+            while len(self._entries) > self.max_entries:
+                self._delete(next(iter(self._entries)))
+
+    def invalidate(self, video_id: str) -> None:
+        """Drop every cached answer drawn from a video, alone or with others"""
+        with self._lock:
+            for key in [key for key in self._entries if video_id in key[0][2].split(",")]:
+                self._delete(key)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters"""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+_shared_cache: Optional[AnswerCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Return the process-wide answer cache"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = AnswerCache()
+        return _shared_cache
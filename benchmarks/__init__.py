@@ -0,0 +1,4 @@
+"""
+Offline benchmarks
+Run from the repository root, e.g. ``python -m benchmarks.bench_channel_ingest``
+"""
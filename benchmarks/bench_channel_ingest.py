@@ -0,0 +1,48 @@
+"""
+Channel ingestion benchmark
+Compares pipeline worker settings against fake transcript and embedding backends
+"""
+
+import argparse
+
+from benchmarks.fakes import FakeEmbeddings, FakeTranscriptSource, split_fake_documents
+from channel_ingest import ChannelIngestPipeline
+
+SETTINGS = [
+    # (fetch, split, embed) workers; the first row is the old sequential loop
+    (1, 1, 1),
+    (4, 1, 2),
+    (8, 2, 4),
+    (16, 2, 8),
+]
+
+
+def run(videos: int, fetch_latency: float, embed_latency: float, queue_size: int) -> None:
+    for fetch_workers, split_workers, embed_workers in SETTINGS:
+        pipeline = ChannelIngestPipeline(
+            FakeTranscriptSource(latency=fetch_latency, failure_every=10),
+            split_fake_documents,
+            FakeEmbeddings(request_latency=embed_latency),
+            lambda video_id, chunks, vectors: None,
+            fetch_workers=fetch_workers,
+            split_workers=split_workers,
+            embed_workers=embed_workers,
+            queue_size=queue_size,
+        )
+        result = pipeline.run(f"video{i:06d}" for i in range(videos))
+        print(f"\n== fetch={fetch_workers} split={split_workers} embed={embed_workers}")
+        print(result.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--fetch-latency", type=float, default=0.05)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--queue-size", type=int, default=32)
+    args = parser.parse_args()
+    run(args.videos, args.fetch_latency, args.embed_latency, args.queue_size)
+
+
+if __name__ == "__main__":
+    main()
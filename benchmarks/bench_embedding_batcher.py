@@ -0,0 +1,75 @@
+"""
+Embedding batcher benchmark
+Measures chunks/sec for different batch budgets and concurrency against a fake backend
+"""
+
+import argparse
+import itertools
+import threading
+
+from benchmarks.fakes import FakeEmbeddings, fake_transcript_text
+from embedding_batcher import BatchedEmbeddings
+
+
+class RateLimitedError(Exception):
+    http_status = 429
+
+
+class FlakyBackend:
+    """Fake backend that answers every Nth request with a 429"""
+
+    def __init__(self, embeddings: FakeEmbeddings, fail_every: int) -> None:
+        self.embeddings = embeddings
+        self.fail_every = fail_every
+        self._calls = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            call = next(self._calls)
+        if self.fail_every and call % self.fail_every == 0:
+            raise RateLimitedError("Rate limit reached")
+        return self.embeddings.embed_documents(texts)
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+def run(chunks: int, request_latency: float, text_latency: float, fail_every: int) -> None:
+    texts = [fake_transcript_text(f"chunk{i}", 150) for i in range(chunks)]
+    print(f"{'max tokens':>10} {'max size':>8} {'workers':>7} {'requests':>8} {'retries':>7} {'chunks/s':>10}")
+    for max_tokens, max_size, workers in [
+        (2000, 16, 1),
+        (8000, 64, 1),
+        (8000, 64, 4),
+        (8000, 256, 8),
+    ]:
+        backend = FlakyBackend(FakeEmbeddings(request_latency=request_latency, text_latency=text_latency), fail_every)
+        batcher = BatchedEmbeddings(
+            backend,
+            max_batch_tokens=max_tokens,
+            max_batch_size=max_size,
+            max_concurrency=workers,
+            requests_per_minute=100000,
+            tokens_per_minute=100000000,
+            token_counter=word_count,
+        )
+        batcher.embed_documents(texts)
+        stats = batcher.stats()
+        print(f"{max_tokens:>10} {max_size:>8} {workers:>7} {stats['requests']:>8} "
+              f"{stats['retries']:>7} {stats['chunks_per_second']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--request-latency", type=float, default=0.05)
+    parser.add_argument("--text-latency", type=float, default=0.0005)
+    parser.add_argument("--fail-every", type=int, default=0, help="Return a 429 on every Nth request")
+    args = parser.parse_args()
+    run(args.chunks, args.request_latency, args.text_latency, args.fail_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Local embedding benchmark
+Measures sentence-transformers throughput for different batch sizes and thread counts
+"""
+
+import argparse
+import time
+
+import torch
+
+from benchmarks.fakes import fake_transcript_text
+from config import Config
+from local_embeddings import SentenceTransformerEmbeddings
+
+
+def run(model_name: str, chunks: int, batch_sizes, thread_counts) -> None:
+    texts = [fake_transcript_text(f"chunk{i}", 180) for i in range(chunks)]
+    # Load the model (and warm it up) outside the timed runs
+    SentenceTransformerEmbeddings(model_name).embed_documents(texts[:8])
+
+    print(f"model: {model_name}, chunks: {chunks}")
+    print(f"{'threads':>7} {'batch':>6} {'seconds':>8} {'chunks/s':>9}")
+    for threads in thread_counts:
+        for batch_size in batch_sizes:
+            embeddings = SentenceTransformerEmbeddings(model_name, batch_size=batch_size, num_threads=threads)
+            started = time.perf_counter()
+            embeddings.embed_documents(texts)
+            elapsed = time.perf_counter() - started
+            print(f"{threads:>7} {batch_size:>6} {elapsed:>8.2f} {chunks / elapsed:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=Config.LOCAL_EMBEDDING_MODEL)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64, 128])
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, 2, 4, torch.get_num_threads()}))
+    args = parser.parse_args()
+    run(args.model, args.chunks, args.batch_sizes, args.threads)
+
+
+if __name__ == "__main__":
+    main()
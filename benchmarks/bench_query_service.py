@@ -0,0 +1,128 @@
+"""
+Query service load test
+Fires concurrent /ask requests at the HTTP service backed by fake LLM and embedding backends,
+with and without micro-batching
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from typing import List
+
+import aiohttp
+import uvicorn
+
+from benchmarks.fake_llm import FakeClients
+from benchmarks.fakes import FakeEmbeddings, fixture_chunks
+from config import Config
+from micro_batcher import MicroBatchedEmbeddings
+from query_service import QueryService, create_app
+from shared_resources import ResourceRegistry
+from vectorstore import add_embedded_documents, open_video_store
+
+QUESTIONS = [
+    "what did they say about performance and latency",
+    "how does the channel talk about caching and memory",
+    "which part covers search and the index",
+    "what is said about vectors and embeddings",
+]
+
+
+def build_indexes(videos: int, chunks_per_video: int, embeddings) -> List[str]:
+    """Write fixture chunks into the configured vector store, so ingest finds them already indexed"""
+    chunks = fixture_chunks(videos, chunks_per_video)
+    video_ids = sorted({chunk.metadata["video_id"] for chunk in chunks})
+    for video_id in video_ids:
+        documents = [chunk for chunk in chunks if chunk.metadata["video_id"] == video_id]
+        store = open_video_store(video_id, embeddings)
+        add_embedded_documents(store, video_id, documents, embeddings.embed_documents(
+            [document.page_content for document in documents]
+        ))
+    return video_ids
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def fire(port: int, video_ids: List[str], requests: int, concurrency: int) -> List[float]:
+    """Send ``requests`` /ask calls, ``concurrency`` at a time; return per-request latencies in ms"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(session: aiohttp.ClientSession, n: int) -> None:
+        video_id = video_ids[n % len(video_ids)]
+        payload = {
+            "question": QUESTIONS[n % len(QUESTIONS)],
+            "videos": [f"https://www.youtube.com/watch?v={video_id}"],
+        }
+        async with semaphore:
+            started = time.perf_counter()
+            async with session.post(f"http://127.0.0.1:{port}/ask", json=payload) as response:
+                response.raise_for_status()
+                await response.json()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(one(session, n) for n in range(requests)))
+    return latencies
+
+
+def run_once(batch: bool, args, video_ids: List[str]) -> None:
+    embeddings = FakeEmbeddings(request_latency=args.embed_latency)
+    query_embeddings = MicroBatchedEmbeddings(embeddings) if batch else embeddings
+    registry = ResourceRegistry(client_factory=lambda key: FakeClients(query_embeddings, args.llm_latency))
+    service = QueryService("sk-fake", registry=registry, batch=batch)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(service, pool_connections=False), port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    try:
+        # Warm the registry so the timed run measures questions, not index loading
+        asyncio.run(fire(port, video_ids, len(video_ids), args.concurrency))
+        requests_before = embeddings.requests
+        started = time.perf_counter()
+        latencies = asyncio.run(fire(port, video_ids, args.requests, args.concurrency))
+        wall = time.perf_counter() - started
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    cuts = statistics.quantiles(latencies, n=100)
+    search = service.search_batcher.stats() if service.search_batcher is not None else {}
+    print(f"{'on' if batch else 'off':>8} {args.requests / wall:>8.1f} {cuts[49]:>8.1f} {cuts[94]:>8.1f} "
+          f"{embeddings.requests - requests_before:>10} {search.get('mean_batch_size', 1.0):>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=8)
+    parser.add_argument("--chunks-per-video", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Seconds per embedding request")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per LLM call")
+    args = parser.parse_args()
+
+    # Fixture indexes live in a throwaway NumPy store; repeated questions must not hit the answer cache
+    Config.VECTOR_STORE_TYPE = "numpy"
+    Config.VECTOR_STORE_DIR = tempfile.mkdtemp(prefix="bench_query_service_")
+    Config.ANSWER_CACHE_ENABLED = False
+    video_ids = build_indexes(args.videos, args.chunks_per_video, FakeEmbeddings(request_latency=0.0))
+    print(f"videos: {len(video_ids)}, requests: {args.requests}, concurrency: {args.concurrency}")
+    print(f"{'batching':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'embed reqs':>10} {'search batch':>13}")
+    for batch in (False, True):
+        run_once(batch, args, video_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Retrieval benchmark
+Compares latency and recall@k of vector, BM25 and hybrid retrieval over fixture transcripts
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.fakes import HashingEmbeddings, fixture_chunks
+from keyword_index import BM25Index, hybrid_search, keyword_search
+
+
+class BruteForceVectors:
+    """Exact dot-product search over in-memory vectors"""
+
+    def __init__(self, documents, embeddings: HashingEmbeddings) -> None:
+        self.documents = documents
+        self.embeddings = embeddings
+        self.vectors = embeddings.embed_documents([document.page_content for document in documents])
+
+    def search(self, query: str, k: int):
+        query_vector = self.embeddings.embed_query(query)
+        scored = sorted(
+            range(len(self.vectors)),
+            key=lambda i: -sum(a * b for a, b in zip(query_vector, self.vectors[i])),
+        )
+        return [self.documents[i] for i in scored[:k]]
+
+
+def build_queries(chunks, count: int, seed: int = 7):
+    """Half ask for a chunk's exact product name, half paraphrase its words"""
+    rng = random.Random(seed)
+    queries = []
+    for n in range(count):
+        target = rng.choice(chunks)
+        words = target.page_content.split()
+        model = words[words.index("Model") + 1]
+        if n % 2 == 0:
+            query = f"What happened with the Model {model} launch?"
+        else:
+            query = " ".join(rng.sample([word for word in words if word.isalpha() and word.islower()], 12))
+        queries.append((query, target))
+    return queries
+
+
+def measure(name: str, search, queries, k: int) -> None:
+    latencies = []
+    hits = 0
+    for query, target in queries:
+        started = time.perf_counter()
+        results = search(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += any(result is target for result in results)
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{name:>8} {hits / len(queries):>9.2f} {cuts[49]:>8.2f} {cuts[94]:>8.2f}")
+
+
+def run(videos: int, chunks_per_video: int, queries: int, k: int, query_latency: float) -> None:
+    chunks = fixture_chunks(videos, chunks_per_video)
+    embeddings = HashingEmbeddings(query_latency=query_latency)
+
+    started = time.perf_counter()
+    keyword_index = BM25Index(chunks)
+    print(f"chunks: {len(chunks)}, BM25 build {time.perf_counter() - started:.2f}s, "
+          f"simulated query embedding {query_latency * 1000:.0f}ms")
+    vectors = BruteForceVectors(chunks, embeddings)
+    query_set = build_queries(chunks, queries)
+
+    stats = {}
+    print(f"{'method':>8} {'recall@' + str(k):>9} {'p50 ms':>8} {'p95 ms':>8}")
+    measure("vector", vectors.search, query_set, k)
+    measure("bm25", lambda query, n: keyword_search([keyword_index], query, n), query_set, k)
+    measure("hybrid", lambda query, n: hybrid_search([keyword_index], query, vectors.search, n, stats=stats), query_set, k)
+    print(f"hybrid: {stats.get('keyword_only', 0)} answered from keywords alone, {stats.get('fused', 0)} fused")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--chunks-per-video", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=8)
+    parser.add_argument("--query-latency", type=float, default=0.05, help="Seconds per query embedding call")
+    args = parser.parse_args()
+    run(args.videos, args.chunks_per_video, args.queries, args.k, args.query_latency)
+
+
+if __name__ == "__main__":
+    main()
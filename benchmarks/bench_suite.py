@@ -0,0 +1,371 @@
+"""
+Offline benchmark suite
+Ingest throughput, ask latency, summarize time, peak RSS and index size at several transcript and
+channel sizes, with fixture transcripts and fake embedding and LLM backends
+
+Transcripts come from recorded fixtures (``--record`` saves real ones once) or are generated, and
+flow through the real transcript store, chunking, embedding batcher and cache, vector store,
+``YoutubeQuery``, summarizer and channel ingestion. Each case runs in its own interpreter so peak
+RSS is per case. Save a baseline, then check later runs against it (e.g. in CI); only the work
+done (chunks, requests, tokens, cache hits) is checked, as timings and RSS depend on the machine:
+
+    python -m benchmarks.bench_suite --quick --save-baseline
+    python -m benchmarks.bench_suite --quick --check
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import FakeEmbeddings, FixtureTranscripts, WordEncoding, fixture_questions
+from config import Config
+from metrics import get_metrics, percentile
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FIXTURES = os.path.join(_ROOT, "benchmarks", "fixtures")
+DEFAULT_BASELINE = os.path.join(_ROOT, "benchmarks", "baselines", "offline.json")
+
+# Transcript lengths in words (about 13 minutes, 1 hour and 4 hours of speech) and channel sizes in videos
+VIDEO_WORDS = (2000, 10000, 40000)
+CHANNEL_VIDEOS = (10, 50)
+QUICK_VIDEO_WORDS = (2000, 10000)
+QUICK_CHANNEL_VIDEOS = (10,)
+
+# Machine-independent metrics compared with the baseline, and whether higher is better (None: any change)
+CHECKED_METRICS = {
+    "chunks": None,
+    "embedding_requests": False,
+    "embedding_tokens": False,
+    "embedding_cache_hits": True,
+    "prompt_tokens": False,
+    "completion_tokens": False,
+    "dedup_chunks_collapsed": True,
+}
+# Registry counters copied into each record
+COUNTERS = (
+    "embedding_requests", "embedding_tokens", "embedding_cache_hits", "prompt_tokens", "completion_tokens",
+    "dedup_chunks_collapsed",
+)
+# Fake backend settings a baseline is only comparable under
+SETTINGS = ("store", "tokenizer", "dim", "fetch_latency", "embed_latency", "llm_latency", "questions", "channel_words")
+
+
+def use_workdir(workdir: str, store_type: str) -> None:
+    """Point every on-disk store and cache at a scratch directory"""
+    Config.OUTPUT_DIR = workdir
+    Config.CACHE_DIR = os.path.join(workdir, "cache")
+    Config.VECTOR_STORE_DIR = os.path.join(workdir, "vectorstores")
+    Config.CHANNEL_DIR = os.path.join(workdir, "channels")
+    Config.TRANSCRIPT_STORE_DIR = os.path.join(workdir, "transcripts")
+    Config.SUMMARY_CACHE_PATH = os.path.join(Config.CACHE_DIR, "summaries.sqlite3")
+    Config.EMBEDDING_CACHE_PATH = os.path.join(Config.CACHE_DIR, "embeddings.sqlite3")
+    Config.VECTOR_STORE_TYPE = store_type
+    # Stage timings are read from the in-process registry instead of the request log
+    Config.METRICS_ENABLED = False
+    # Repeated questions must be answered every time, not served from the answer cache
+    Config.ANSWER_CACHE_ENABLED = False
+
+
+def use_transcripts(source: FixtureTranscripts) -> None:
+    """Make the transcript store fetch from ``source`` instead of YouTube"""
+    import transcript_store
+    from transcript_segments import TranscriptSegments
+
+    def fetch(video_id: str, languages: Optional[List[str]] = None) -> TranscriptSegments:
+        languages = languages or Config.TRANSCRIPT_LANGUAGES
+        return TranscriptSegments.from_entries(video_id, source.get_transcript(video_id, languages), languages[0])
+
+    transcript_store.fetch_segments = fetch
+
+
+def use_tokenizer(name: str) -> None:
+    """Count tokens with ``WordEncoding`` ("words") instead of tiktoken ("tiktoken", downloads its encoding once)"""
+    if name != "words":
+        return
+    import token_budget
+
+    encoding = WordEncoding()
+    token_budget.get_encoding = lambda encoding_name=Config.TOKEN_ENCODING: encoding
+
+
+def fake_embeddings(args):
+    """Build the embeddings stack the apps use (batcher behind the disk cache) over a fake backend"""
+    from embedding_batcher import BatchedEmbeddings
+    from embedding_cache import CachedEmbeddings, get_embedding_cache
+
+    backend = FakeEmbeddings(dim=args.dim, request_latency=args.embed_latency)
+    return CachedEmbeddings(BatchedEmbeddings(backend.embed_documents), get_embedding_cache(), "fake")
+
+
+def time_questions(answer, questions: List[str]) -> Dict[str, float]:
+    """Answer questions one after another; return p50/p95 latency in milliseconds"""
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        answer(question)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "ask_p50_ms": round(percentile(latencies, 50), 1),
+        "ask_p95_ms": round(percentile(latencies, 95), 1),
+    }
+
+
+def ingest_rate(chunks: int, seconds: float) -> Dict[str, float]:
+    return {
+        "chunks": chunks,
+        "ingest_seconds": round(seconds, 3),
+        "ingest_chunks_per_second": round(chunks / seconds, 1) if seconds else 0.0,
+    }
+
+
+def run_video_case(size: str, args) -> dict:
+    """Ingest one video, ask questions about it and summarize it"""
+    from benchmarks.fake_llm import FakeClients, FakeLLM
+    from shared_resources import ResourceRegistry
+    from summarizer import SummarizationEngine, summarize_video
+    from vectorstore import store_size
+    from youtubequery import YoutubeQuery
+
+    # A size is a generated transcript's word count, or the ID of a recorded fixture
+    words = int(size) if size.isdigit() else 0
+    video_id = f"fx{words:09d}" if words else size
+    use_transcripts(FixtureTranscripts(args.fixtures, words=words, latency=args.fetch_latency))
+    embeddings = fake_embeddings(args)
+    registry = ResourceRegistry(client_factory=lambda key: FakeClients(embeddings, args.llm_latency))
+    query = YoutubeQuery("sk-fake", registry=registry)
+
+    started = time.perf_counter()
+    result = query.ingest(f"https://www.youtube.com/watch?v={video_id}")
+    seconds = time.perf_counter() - started
+    if result != "Success":
+        raise RuntimeError(result)
+    store = query.videos[video_id][1].store
+    record = ingest_rate(store_size(store), seconds)
+
+    record.update(time_questions(
+        lambda question: query.ask_with_sources(question, raise_errors=True), fixture_questions(args.questions)
+    ))
+
+    # No summary cache, so every chunk is mapped
+    engine = SummarizationEngine(FakeLLM(latency=args.llm_latency), cache=None)
+    started = time.perf_counter()
+    summarize_video(engine, video_id)
+    record["summarize_seconds"] = round(time.perf_counter() - started, 3)
+    record["index_mb"] = index_mb(store)
+    return record
+
+
+def run_channel_case(videos: int, args) -> dict:
+    """Index a channel from scratch, then ask questions about it"""
+    from langchain.chains.question_answering import load_qa_chain
+
+    from benchmarks.fake_llm import FakeLLM
+    from chat_channel import answer_channel_question, refresh_channel_index
+    from vectorstore import store_size
+
+    use_transcripts(FixtureTranscripts(words=args.channel_words, latency=args.fetch_latency))
+    embeddings = fake_embeddings(args)
+    channel_id = "UC" + "fixturechannel".ljust(22, "0")
+    video_ids = [f"ch{n:09d}" for n in range(videos)]
+
+    started = time.perf_counter()
+    store, result, _ = refresh_channel_index(channel_id, iter(video_ids), embeddings, on_video_done=lambda *_: None)
+    seconds = time.perf_counter() - started
+    if result.failed:
+        raise RuntimeError(f"{len(result.failed)} videos failed: {result.failed[0][1]}")
+    record = ingest_rate(store_size(store), seconds)
+
+    chain = load_qa_chain(FakeLLM(latency=args.llm_latency), chain_type="stuff")
+    record.update(time_questions(
+        lambda question: answer_channel_question(store, embeddings, chain, question), fixture_questions(args.questions)
+    ))
+    record["index_mb"] = index_mb(store)
+    return record
+
+
+def index_mb(store) -> float:
+    """Size of the persisted indexes, or the estimated in-memory size of an unpersisted store"""
+    from vectorstore import estimate_store_bytes
+
+    total = 0
+    for directory, _, files in os.walk(Config.VECTOR_STORE_DIR):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return round((total or estimate_store_bytes(store)) / (1024 * 1024), 2)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process, where the platform reports it"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(case: str, args) -> dict:
+    """Run one case in this process, in a scratch directory"""
+    kind, _, size = case.partition(":")
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        use_workdir(workdir, args.store)
+        use_tokenizer(args.tokenizer)
+        if kind == "video":
+            record = run_video_case(size, args)
+        elif kind == "channel":
+            record = run_channel_case(int(size), args)
+        else:
+            raise ValueError(f"Unknown benchmark case: {case}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    record["peak_rss_mb"] = peak_rss_mb()
+    snapshot = get_metrics().snapshot()
+    record.update({name: snapshot["counters"].get(name, 0) for name in COUNTERS})
+    record["stages"] = {stage: round(totals["seconds"], 3) for stage, totals in snapshot["stages"].items()}
+    return {"case": case, **record}
+
+
+def run_case_subprocess(case: str, argv: List[str]) -> dict:
+    """Run one case in a fresh interpreter, so its peak RSS isn't inflated by earlier cases"""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_suite", *argv, "--case", case],
+        capture_output=True, text=True, cwd=_ROOT,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{case} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def case_names(args) -> List[str]:
+    video_words = QUICK_VIDEO_WORDS if args.quick else VIDEO_WORDS
+    channel_videos = QUICK_CHANNEL_VIDEOS if args.quick else CHANNEL_VIDEOS
+    cases = [f"video:{words}" for words in video_words]
+    cases += [f"video:{video_id}" for video_id in FixtureTranscripts(args.fixtures).recorded_video_ids()]
+    cases += [f"channel:{videos}" for videos in channel_videos]
+    return cases
+
+
+def print_table(records: List[dict]) -> None:
+    print(f"{'case':<20} {'chunks':>7} {'requests':>9} {'emb tok':>8} {'chunks/s':>9} {'ask p50':>8} {'ask p95':>8} "
+          f"{'summ s':>7} {'RSS MB':>7} {'index MB':>9}")
+    for record in records:
+        summarize = record.get("summarize_seconds")
+        rss = record.get("peak_rss_mb")
+        print(f"{record['case']:<20} {record['chunks']:>7} {record['embedding_requests']:>9} "
+              f"{record['embedding_tokens']:>8} {record['ingest_chunks_per_second']:>9.1f} "
+              f"{record['ask_p50_ms']:>8.1f} {record['ask_p95_ms']:>8.1f} "
+              f"{'-' if summarize is None else f'{summarize:.2f}':>7} {'-' if rss is None else f'{rss:.0f}':>7} "
+              f"{record['index_mb']:>9.2f}")
+
+
+def regressions(records: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """List the metrics that got worse than the baseline by more than ``tolerance``"""
+    problems = []
+    for record in records:
+        before = baseline["results"].get(record["case"])
+        if before is None:
+            continue
+        for metric, higher_is_better in CHECKED_METRICS.items():
+            old, new = before.get(metric), record.get(metric)
+            if old is None or new is None or old == new:
+                continue
+            change = (new - old) / old if old else float("inf")
+            worse = abs(change) if higher_is_better is None else (-change if higher_is_better else change)
+            if worse > tolerance:
+                problems.append(f"{record['case']} {metric}: {old:g} -> {new:g} ({change:+.0%})")
+    return problems
+
+
+def record_fixtures(video_ids: List[str], directory: str) -> None:
+    """Save real transcripts as fixtures (needs network once; later runs replay them offline)"""
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    os.makedirs(directory, exist_ok=True)
+    for video_id in video_ids:
+        entries = YouTubeTranscriptApi.get_transcript(video_id, languages=Config.TRANSCRIPT_LANGUAGES)
+        with open(os.path.join(directory, f"{video_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        print(f"recorded {video_id}: {len(entries)} segments")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for CI")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="directory of recorded transcripts")
+    parser.add_argument("--record", nargs="+", metavar="VIDEO_ID", help="record real transcripts as fixtures and exit")
+    parser.add_argument("--store", default=Config.VECTOR_STORE_TYPE, choices=["chroma", "memory", "numpy"])
+    parser.add_argument("--tokenizer", default="words", choices=["words", "tiktoken"],
+                        help="offline word-level token counts, or tiktoken's (needs network on first use)")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimensions")
+    parser.add_argument("--fetch-latency", type=float, default=0.02, help="seconds per transcript fetch")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="seconds per embedding request")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per LLM call")
+    parser.add_argument("--questions", type=int, default=50, help="questions asked per case")
+    parser.add_argument("--channel-words", type=int, default=3000, help="transcript words per channel video")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a metric regressed past --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="allowed relative regression")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    argv = sys.argv[1:]
+    args = parse_args(argv)
+    if args.case:
+        print(json.dumps(run_case(args.case, args)))
+        return
+    if args.record:
+        record_fixtures(args.record, args.fixtures)
+        return
+
+    settings = {name: getattr(args, name) for name in SETTINGS}
+    print(" ".join(f"{name}={value}" for name, value in settings.items()))
+    records = []
+    for case in case_names(args):
+        records.append(run_case_subprocess(case, argv))
+        print(f"  done {case}", file=sys.stderr, flush=True)
+    print_table(records)
+
+    report = {
+        "machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+        "settings": settings,
+        "results": {record["case"]: record for record in records},
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if args.check:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"No baseline at {args.baseline}; create one with --save-baseline")
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["settings"] != settings:
+            sys.exit(f"Baseline was recorded with other settings: {baseline['settings']}")
+        problems = regressions(records, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        print(f"{len(problems)} regressions against {args.baseline} ({baseline['machine']})")
+        failed = bool(problems)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Vector store benchmark
+Compares build time, query latency, vector memory and recall@k of the exact and quantized NumPy store and Chroma
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fakes import HashingEmbeddings, fixture_chunks, fixture_questions
+from numpy_collection import NumpyCollection
+
+
+def random_unit_vectors(count: int, dim: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fixture_vectors(count: int, dim: int) -> np.ndarray:
+    """Embed fixture transcript chunks, which share vocabulary and so cluster like real embeddings"""
+    texts = [chunk.page_content for chunk in fixture_chunks(max(1, count // 100), 100)[:count]]
+    return np.asarray(HashingEmbeddings(dim).embed_documents(texts), dtype=np.float32)
+
+
+def fixture_query_vectors(count: int, dim: int) -> np.ndarray:
+    return np.asarray(HashingEmbeddings(dim).embed_documents(fixture_questions(count)), dtype=np.float32)
+
+
+def build_quantized(ids, vectors, quantization: str, directory: str):
+    """Build, train and persist a quantized collection, then reopen it as a new process would"""
+    collection = NumpyCollection(f"{directory}/{quantization}", quantization=quantization)
+    add_in_batches(collection, ids, vectors)  # Trains the quantizer as the collection grows
+    collection.persist()
+    return NumpyCollection(f"{directory}/{quantization}", quantization=quantization)
+
+
+def time_queries(search, queries: np.ndarray, k: int):
+    """Return (p50 ms, p95 ms, results) for one search call per query"""
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(search(query, k))
+        latencies.append((time.perf_counter() - started) * 1000)
+    cuts = statistics.quantiles(latencies, n=100)
+    return cuts[49], cuts[94], results
+
+
+def recall(results, exact) -> float:
+    return sum(len(set(found) & set(truth)) / len(truth) for found, truth in zip(results, exact)) / len(exact)
+
+
+def add_in_batches(collection, ids, vectors, batch_size: int = 5000) -> None:
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.add(
+            ids=ids[start:end],
+            embeddings=vectors[start:end].tolist(),
+            metadatas=[{"video_id": "bench"}] * len(ids[start:end]),
+            documents=[""] * len(ids[start:end]),
+        )
+
+
+def run(sizes, dim: int, queries: int, k: int, data: str, quantizations) -> None:
+    try:
+        import chromadb
+        from chromadb.config import Settings
+        chroma_client = chromadb.Client(Settings())
+    except ImportError:
+        chroma_client = None
+        print("chromadb is not installed, benchmarking the NumPy store only")
+
+    print(f"dim: {dim}, queries: {queries}, k: {k}, data: {data}")
+    print(f"{'chunks':>7} {'store':>6} {'build s':>8} {'p50 ms':>7} {'p95 ms':>7} {'recall':>7} {'vec MB':>8}")
+    if data == "fixture":
+        query_vectors = fixture_query_vectors(queries, dim)
+    else:
+        query_vectors = random_unit_vectors(queries, dim, seed=1)
+    for size in sizes:
+        vectors = fixture_vectors(size, dim) if data == "fixture" else random_unit_vectors(size, dim, seed=size)
+        ids = [f"chunk-{i}" for i in range(size)]
+
+        started = time.perf_counter()
+        collection = NumpyCollection()
+        add_in_batches(collection, ids, vectors)
+        build = time.perf_counter() - started
+
+        def numpy_search(query, n):
+            return collection.query([query], n_results=n)["ids"][0]
+
+        p50, p95, exact = time_queries(numpy_search, query_vectors, k)
+        megabytes = collection.vector_bytes() / (1024 * 1024)
+        print(f"{size:>7} {'numpy':>6} {build:>8.2f} {p50:>7.2f} {p95:>7.2f} {1.0:>7.2f} {megabytes:>8.1f}")
+
+        for quantization in quantizations:
+            with tempfile.TemporaryDirectory() as directory:
+                started = time.perf_counter()
+                quantized = build_quantized(ids, vectors, quantization, directory)
+                build = time.perf_counter() - started
+
+                def quantized_search(query, n):
+                    return quantized.query([query], n_results=n)["ids"][0]
+
+                p50, p95, results = time_queries(quantized_search, query_vectors, k)
+                megabytes = quantized.vector_bytes() / (1024 * 1024)
+                print(
+                    f"{size:>7} {quantization:>6} {build:>8.2f} {p50:>7.2f} {p95:>7.2f} "
+                    f"{recall(results, exact):>7.2f} {megabytes:>8.1f}"
+                )
+                del quantized  # Unmaps the matrix before the directory is removed
+
+        if chroma_client is None:
+            continue
+        started = time.perf_counter()
+        chroma_collection = chroma_client.create_collection(f"bench_{size}")
+        add_in_batches(chroma_collection, ids, vectors)
+        build = time.perf_counter() - started
+
+        def chroma_search(query, n):
+            return chroma_collection.query(query_embeddings=[query.tolist()], n_results=n)["ids"][0]
+
+        p50, p95, results = time_queries(chroma_search, query_vectors, k)
+        print(f"{size:>7} {'chroma':>6} {build:>8.2f} {p50:>7.2f} {p95:>7.2f} {recall(results, exact):>7.2f} {'':>8}")
+        chroma_client.delete_collection(f"bench_{size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=8)
+    parser.add_argument("--data", choices=["fixture", "random"], default="fixture",
+                        help="Embedded fixture transcript chunks, or uniformly random unit vectors (a worst case for quantization)")
+    parser.add_argument("--quantization", nargs="*", choices=["int8", "pq"], default=["int8", "pq"],
+                        help="Quantized stores to compare against the exact one")
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.queries, args.k, args.data, args.quantization)
+
+
+if __name__ == "__main__":
+    main()
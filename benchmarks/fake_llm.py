@@ -0,0 +1,55 @@
+"""
+Fake LLM backends
+LangChain-compatible LLM and query clients with fixed latency, for benchmarks without network
+"""
+
+import asyncio
+import time
+from typing import Any, List, Optional
+
+from langchain.chains.question_answering import load_qa_chain
+from langchain.llms.base import LLM
+
+
+ANSWER = "A canned answer."
+
+
+class FakeLLM(LLM):
+    """LLM that sleeps for a fixed latency and returns a canned answer, streamed word by word to callbacks"""
+
+    latency: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None) -> str:
+        time.sleep(self.latency)
+        if run_manager is not None:
+            for token in _tokens(ANSWER):
+                run_manager.on_llm_new_token(token)
+        return ANSWER
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None) -> str:
+        await asyncio.sleep(self.latency)
+        if run_manager is not None:
+            for token in _tokens(ANSWER):
+                await run_manager.on_llm_new_token(token)
+        return ANSWER
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into word tokens with their leading spaces, as a streaming API would send them"""
+    words = text.split(" ")
+    return words[:1] + [f" {word}" for word in words[1:]]
+
+
+class FakeClients:
+    """Stand-in for QueryClients with fake backends"""
+
+    def __init__(self, embeddings, llm_latency: float) -> None:
+        self.embeddings = embeddings
+        self.llm = FakeLLM(latency=llm_latency)
+        self.streaming_llm = self.llm
+        self.chain = load_qa_chain(self.llm, chain_type="stuff")
+        self.streaming_chain = self.chain
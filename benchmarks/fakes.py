@@ -0,0 +1,222 @@
+"""
+Local fake backends
+Deterministic stand-ins for YouTube transcripts and embedding APIs
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+_WORDS = (
+    "welcome back to the channel today we are going to talk about python "
+    "performance vectors embeddings transcripts search models latency memory "
+    "throughput caching index query answer video subscribe like comment"
+).split()
+
+
+class FakeDocument:
+    """Minimal stand-in for a LangChain Document"""
+
+    def __init__(self, page_content: str, metadata: dict = None) -> None:
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+def fake_transcript_text(video_id: str, words: int) -> str:
+    """Return a deterministic transcript for a video ID"""
+    rng = random.Random(video_id)
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+class FakeTranscriptSource:
+    """Transcript fetcher that sleeps to simulate network latency"""
+
+    def __init__(self, latency: float = 0.05, words: int = 2000, failure_every: int = 0) -> None:
+        self.latency = latency
+        self.words = words
+        self.failure_every = failure_every
+        self.calls = 0
+
+    def __call__(self, video_id: str) -> List[FakeDocument]:
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.failure_every and int(hashlib.md5(video_id.encode()).hexdigest(), 16) % self.failure_every == 0:
+            raise ValueError(f"No transcript for {video_id}")
+        return [FakeDocument(fake_transcript_text(video_id, self.words), {"source": video_id})]
+
+
+def split_fake_documents(documents: List[FakeDocument], chunk_size: int = 1000) -> List[FakeDocument]:
+    """Split documents into fixed-size character chunks"""
+    chunks = []
+    for document in documents:
+        text = document.page_content
+        for start in range(0, len(text), chunk_size):
+            chunks.append(FakeDocument(text[start:start + chunk_size], dict(document.metadata)))
+    return chunks
+
+
+def fake_vector(text: str, dim: int) -> List[float]:
+    """Return a deterministic unit-length pseudo-embedding for text"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(x * x for x in vector) ** 0.5 or 1.0
+    return [x / norm for x in vector]
+
+
+class FakeEmbeddings:
+    """Embeddings backend with per-request and per-text simulated latency"""
+
+    def __init__(self, dim: int = 64, request_latency: float = 0.1, text_latency: float = 0.0) -> None:
+        self.dim = dim
+        self.request_latency = request_latency
+        self.text_latency = text_latency
+        self.requests = 0
+        self.texts = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        self.texts += len(texts)
+        time.sleep(self.request_latency + self.text_latency * len(texts))
+        return [fake_vector(text, self.dim) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class WordEncoding:
+    """Offline stand-in for a tiktoken encoding: every word or punctuation mark, with its leading spaces, is a token
+
+    tiktoken downloads its encodings on first use, so this keeps the suite
+    runnable without network access. Counts differ somewhat from those of
+    ``cl100k_base``, so chunk counts do too.
+    """
+
+    _PIECES = re.compile(r"\s*(?:\w+|[^\w\s])|\s+")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._pieces: List[str] = []
+
+    def encode(self, text: str, disallowed_special=()) -> List[int]:
+        tokens = []
+        with self._lock:
+            for piece in self._PIECES.findall(text):
+                token = self._ids.get(piece)
+                if token is None:
+                    token = self._ids[piece] = len(self._pieces)
+                    self._pieces.append(piece)
+                tokens.append(token)
+        return tokens
+
+    def decode(self, tokens: List[int]) -> str:
+        return "".join(self._pieces[token] for token in tokens)
+
+
+_SYLLABLES = "ka lo mi nu re sa ti vo ze pa".split()
+# A larger made-up vocabulary so chunks differ in more than a few filler words
+_VOCABULARY = [a + b + c for a in _SYLLABLES for b in _SYLLABLES for c in _SYLLABLES]
+
+
+def fixture_chunks(videos: int, chunks_per_video: int, words: int = 120) -> List[FakeDocument]:
+    """Return transcript chunks, each naming one unique product and number
+
+    Chunk ``i`` of every video mentions ``Model Z{video}x{i}`` and the year
+    ``1900 + i`` so keyword and recall benchmarks have exact terms to find.
+    """
+    chunks = []
+    for video in range(videos):
+        video_id = f"video{video:06d}"[:11]
+        for i in range(chunks_per_video):
+            rng = random.Random(f"{video_id}-{i}")
+            # Mostly filler words, plus topic words a paraphrase can match on
+            body = [rng.choice(_WORDS) if rng.random() < 0.7 else rng.choice(_VOCABULARY) for _ in range(words)]
+            body.insert(rng.randrange(words), f"Model Z{video}x{i} launched in {1900 + i}")
+            chunks.append(FakeDocument(" ".join(body), {"video_id": video_id, "start": float(i * 30)}))
+    return chunks
+
+
+class HashingEmbeddings:
+    """Bag-of-words feature-hashing embeddings, so texts sharing words embed close together"""
+
+    def __init__(self, dim: int = 256, query_latency: float = 0.0) -> None:
+        self.dim = dim
+        self.query_latency = query_latency
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0 if digest[4] & 1 else -1.0
+        norm = sum(x * x for x in vector) ** 0.5 or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Stands in for the embedding API round-trip on every question
+        time.sleep(self.query_latency)
+        return self._embed(text)
+
+
+def fixture_transcript_entries(video_id: str, words: int) -> List[Dict]:
+    """Return a deterministic transcript in the youtube_transcript_api format ({"text", "start", "duration"})
+
+    Segments run 6-14 words at about 2.5 words a second, like auto-generated
+    captions, and draw on the made-up vocabulary so questions can target them.
+    """
+    rng = random.Random(video_id)
+    entries = []
+    start = 0.0
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(6, 14))
+        text = " ".join(rng.choice(_WORDS) if rng.random() < 0.7 else rng.choice(_VOCABULARY) for _ in range(length))
+        duration = round(length / 2.5, 2)
+        entries.append({"text": text, "start": round(start, 2), "duration": duration})
+        start += duration
+        remaining -= length
+    return entries
+
+
+def fixture_questions(count: int, seed: int = 11) -> List[str]:
+    """Return deterministic questions about the fixture vocabulary"""
+    rng = random.Random(seed)
+    return [f"What do they say about {rng.choice(_VOCABULARY)} and {rng.choice(_VOCABULARY)}?" for _ in range(count)]
+
+
+class FixtureTranscripts:
+    """Offline transcript source: recorded fixtures from a directory, generated ones otherwise
+
+    A recorded fixture is ``<directory>/<video_id>.json`` holding the entries
+    youtube_transcript_api returned for that video. Other videos get a
+    generated transcript of ``words`` words. Each call sleeps ``latency``
+    seconds to stand in for the YouTube round-trip.
+    """
+
+    def __init__(self, directory: Optional[str] = None, words: int = 2000, latency: float = 0.0) -> None:
+        self.directory = directory
+        self.words = words
+        self.latency = latency
+        self.calls = 0
+
+    def recorded_video_ids(self) -> List[str]:
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def get_transcript(self, video_id: str, languages: Optional[List[str]] = None) -> List[Dict]:
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.directory:
+            path = os.path.join(self.directory, f"{video_id}.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    return json.load(f)
+        return fixture_transcript_entries(video_id, self.words)
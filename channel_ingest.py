@@ -0,0 +1,274 @@
+"""
+Channel ingestion pipeline
+Fetches, splits and embeds channel videos in overlapping, bounded-concurrency stages
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from config import Config
+from metrics import span
+
+_DONE = object()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.chunks = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, chunks: int = 0, failed: bool = False) -> None:
+        with self._lock:
+            self.items += 1
+            self.chunks += chunks
+            self.busy_seconds += seconds
+            if failed:
+                self.failures += 1
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def items_per_second(self) -> float:
+        wall = self.wall_seconds
+        return self.items / wall if wall else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        wall = self.wall_seconds
+        return self.chunks / wall if wall else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": self.items,
+            "chunks": self.chunks,
+            "failures": self.failures,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "wall_seconds": round(self.wall_seconds, 4),
+            "items_per_second": round(self.items_per_second, 2),
+            "chunks_per_second": round(self.chunks_per_second, 2),
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<6} workers={self.workers:<3} items={self.items:<6} "
+            f"chunks={self.chunks:<7} failures={self.failures:<4} "
+            f"{self.items_per_second:8.2f} items/s {self.chunks_per_second:9.2f} chunks/s"
+        )
+
+
+class IngestResult:
+    """Outcome of a pipeline run"""
+
+    def __init__(self, stages: List[StageStats]) -> None:
+        self.stages = stages
+        self.processed: List[str] = []
+        self.failed: List[Tuple[str, Exception]] = []
+        self.skipped: List[str] = []
+        self.chunk_count = 0
+        self.wall_seconds = 0.0
+        # Deduplication counters (ChunkDeduplicator.stats()), when near-duplicate chunks were collapsed
+        self.dedup: Optional[dict] = None
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunk_count / self.wall_seconds if self.wall_seconds else 0.0
+
+    def report(self) -> str:
+        """Return a human readable per-stage summary"""
+        lines = [str(stage) for stage in self.stages]
+        lines.append(
+            f"total  videos={len(self.processed)} failed={len(self.failed)} skipped={len(self.skipped)} "
+            f"chunks={self.chunk_count} in {self.wall_seconds:.2f}s "
+            f"({self.chunks_per_second:.2f} chunks/s)"
+        )
+        if self.dedup is not None:
+            share = self.dedup["duplicates"] / self.dedup["chunks"] if self.dedup["chunks"] else 0.0
+            lines.append(
+                f"dedup  duplicates={self.dedup['duplicates']} ({share:.1%} of chunks) "
+                f"embeddings skipped={self.dedup['skipped_embeddings']} ({self.dedup['skipped_tokens']} tokens) "
+                f"storage saved={self.dedup['saved_bytes'] / (1024 * 1024):.1f} MB"
+            )
+        return "\n".join(lines)
+
+
+class ChannelIngestPipeline:
+    """Three-stage fetch -> split -> embed pipeline over bounded queues
+
+    Every backend is injected so the pipeline can run against the real
+    YouTube/OpenAI stack or against local fakes:
+
+    - ``fetch_transcript(video_id)`` returns the video's transcript, or None
+      to skip a video that does not need (re-)indexing
+    - ``split_documents(transcript)`` returns the chunks to index
+    - ``embeddings`` exposes ``embed_documents(texts)``
+    - ``sink(video_id, chunks, vectors)`` stores the embedded chunks
+    - ``deduplicate(video_id, chunks)``, if given, returns the chunks that
+      need embedding and a value the sink gets as a fourth argument (the
+      deduplicator's signatures, so chunks are only hashed once); the sink
+      gets None for the vectors of the other chunks
+
+    Bounded queues between stages provide backpressure: a slow embed stage
+    stalls fetching instead of buffering the whole channel in memory. Chunks
+    are embedded in requests of at most ``embed_batch_size`` texts.
+    """
+
+    def __init__(
+        self,
+        fetch_transcript: Callable,
+        split_documents: Callable,
+        embeddings,
+        sink: Callable,
+        fetch_workers: int = Config.CHANNEL_FETCH_WORKERS,
+        split_workers: int = Config.CHANNEL_SPLIT_WORKERS,
+        embed_workers: int = Config.CHANNEL_EMBED_WORKERS,
+        queue_size: int = Config.CHANNEL_QUEUE_SIZE,
+        embed_batch_size: int = Config.CHANNEL_EMBED_BATCH_SIZE,
+        on_video_done: Optional[Callable] = None,
+        deduplicate: Optional[Callable] = None,
+    ) -> None:
+        if min(fetch_workers, split_workers, embed_workers, queue_size, embed_batch_size) < 1:
+            raise ValueError("Worker counts, queue size and batch size must be at least 1")
+
+        self.fetch_transcript = fetch_transcript
+        self.split_documents = split_documents
+        self.embeddings = embeddings
+        self.sink = sink
+        self.fetch_workers = fetch_workers
+        self.split_workers = split_workers
+        self.embed_workers = embed_workers
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.on_video_done = on_video_done
+        self.deduplicate = deduplicate
+
+    def run(self, video_ids: Iterable[str]) -> IngestResult:
+        """Ingest every video ID, consuming the iterable lazily"""
+        fetch_stats = StageStats("fetch", self.fetch_workers)
+        split_stats = StageStats("split", self.split_workers)
+        embed_stats = StageStats("embed", self.embed_workers)
+        result = IngestResult([fetch_stats, split_stats, embed_stats])
+
+        fetch_queue: queue.Queue = queue.Queue(self.queue_size)
+        split_queue: queue.Queue = queue.Queue(self.queue_size)
+        embed_queue: queue.Queue = queue.Queue(self.queue_size)
+        result_lock = threading.Lock()
+        sink_lock = threading.Lock()
+
+        def fail(video_id, error):
+            with result_lock:
+                result.failed.append((video_id, error))
+            if self.on_video_done:
+                self.on_video_done(video_id, 0, error)
+
+        def fetch(video_id, _):
+            return self.fetch_transcript(video_id), 0
+
+        def split(video_id, documents):
+            chunks = self.split_documents(documents)
+            if not chunks:
+                raise ValueError("Transcript produced no chunks")
+            return chunks, len(chunks)
+
+        def embed(video_id, chunks):
+            pending, extra = self.deduplicate(video_id, chunks) if self.deduplicate else (chunks, None)
+            texts = [chunk.page_content for chunk in pending]
+            vectors = []
+            with span("embed"):
+                for start in range(0, len(texts), self.embed_batch_size):
+                    vectors.extend(self.embeddings.embed_documents(texts[start:start + self.embed_batch_size]))
+            if self.deduplicate:
+                embedded = {id(chunk): vector for chunk, vector in zip(pending, vectors)}
+                vectors = [embedded.get(id(chunk)) for chunk in chunks]
+            with sink_lock:
+                if self.deduplicate:
+                    self.sink(video_id, chunks, vectors, extra)
+                else:
+                    self.sink(video_id, chunks, vectors)
+            with result_lock:
+                result.processed.append(video_id)
+                result.chunk_count += len(chunks)
+            if self.on_video_done:
+                self.on_video_done(video_id, len(chunks), None)
+            return None, len(chunks)
+
+        stages = [
+            (fetch_stats, fetch_queue, split_queue, fetch),
+            (split_stats, split_queue, embed_queue, split),
+            (embed_stats, embed_queue, None, embed),
+        ]
+        downstream_workers = [self.split_workers, self.embed_workers, 0]
+
+        threads = []
+        for (stats, inbox, outbox, work), next_workers in zip(stages, downstream_workers):
+            finished = [0]
+            finished_lock = threading.Lock()
+
+            def worker(stats=stats, inbox=inbox, outbox=outbox, work=work,
+                       next_workers=next_workers, finished=finished, finished_lock=finished_lock):
+                while True:
+                    item = inbox.get()
+                    if item is _DONE:
+                        break
+                    video_id, payload = item
+                    started = time.perf_counter()
+                    try:
+                        output, chunks = work(video_id, payload)
+                    except Exception as e:
+                        stats.record(time.perf_counter() - started, failed=True)
+                        fail(video_id, e)
+                        continue
+                    stats.record(time.perf_counter() - started, chunks)
+                    if output is None and outbox is not None:
+                        with result_lock:
+                            result.skipped.append(video_id)
+                    elif outbox is not None:
+                        outbox.put((video_id, output))
+
+                # The last worker of a stage closes the next stage
+                with finished_lock:
+                    finished[0] += 1
+                    last = finished[0] == stats.workers
+                if last:
+                    stats.finished_at = time.perf_counter()
+                    for _ in range(next_workers):
+                        outbox.put(_DONE)
+
+            for _ in range(stats.workers):
+                threads.append(threading.Thread(target=worker, name=f"ingest-{stats.name}", daemon=True))
+
+        started = time.perf_counter()
+        for stats in result.stages:
+            stats.started_at = started
+        for thread in threads:
+            thread.start()
+
+        # Feeding blocks once the fetch queue is full, so the video iterable
+        # is consumed no faster than the pipeline can absorb it.
+        try:
+            for video_id in video_ids:
+                fetch_queue.put((video_id, None))
+        finally:
+            for _ in range(self.fetch_workers):
+                fetch_queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        result.wall_seconds = time.perf_counter() - started
+        return result
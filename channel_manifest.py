@@ -0,0 +1,74 @@
+"""
+Channel manifest
+Tracks which videos of a channel are already indexed so refreshes only touch the delta
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+from config import Config
+
+
+class ChannelManifest:
+    """JSON record of indexed videos (transcript hash, chunk count, timestamp) for a channel"""
+
+    def __init__(self, channel_id: str, path: str, videos: Dict[str, dict] = None) -> None:
+        self.channel_id = channel_id
+        self.path = path
+        self.videos: Dict[str, dict] = videos or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, channel_id: str, directory: str = None) -> "ChannelManifest":
+        """Load the manifest for a channel, or start an empty one"""
+        directory = directory or os.path.join(Config.CHANNEL_DIR, Config.index_namespace(), channel_id)
+        path = os.path.join(directory, "manifest.json")
+        if not os.path.exists(path):
+            return cls(channel_id, path)
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(channel_id, path, data.get("videos", {}))
+
+    def save(self) -> None:
+        """Atomically write the manifest to disk"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            data = {"channel_id": self.channel_id, "videos": dict(self.videos)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self.videos
+
+    def __len__(self) -> int:
+        return len(self.videos)
+
+    def is_unchanged(self, video_id: str, hash_value: str) -> bool:
+        """Check whether a video is indexed with the same transcript"""
+        entry = self.videos.get(video_id)
+        return entry is not None and entry["transcript_hash"] == hash_value
+
+    def record(self, video_id: str, hash_value: str, chunk_count: int) -> None:
+        """Mark a video as indexed"""
+        with self._lock:
+            self.videos[video_id] = {
+                "transcript_hash": hash_value,
+                "chunks": chunk_count,
+                "indexed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+
+    def remove(self, video_id: str) -> None:
+        """Forget a video"""
+        with self._lock:
+            self.videos.pop(video_id, None)
+
+    def removed_videos(self, current_video_ids: Iterable[str]) -> List[str]:
+        """Return indexed videos that are no longer on the channel"""
+        current = set(current_video_ids)
+        return [video_id for video_id in self.videos if video_id not in current]
@@ -4,15 +4,23 @@ YouTube Channel Chat
 Chat with all videos from a YouTube channel
 """
 
+import atexit
 import os
 import sys
-import scrapetube
-from langchain.vectorstores import Chroma
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.llms import OpenAI
-from langchain.chains.question_answering import load_qa_chain
-from langchain.document_loaders import YoutubeLoader
-from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from embedders import build_embeddings, embedding_batch_stats, embedding_cache_stats
+from channel_ingest import ChannelIngestPipeline
+from channel_manifest import ChannelManifest
+from config import Config
+from metrics import debug_breakdown, flush_metrics, request_trace, span
+from token_budget import context_budget, pack_context
+from transcript_segments import source_timestamps
+from transcript_store import load_transcript
+from vectorstore import (
+    ChunkStore, add_embedded_documents, delete_video_chunks, open_channel_store, persist_store, store_size
+)
 import re
 
 def validate_channel_id(channel_id):
@@ -20,7 +28,165 @@ def validate_channel_id(channel_id):
     # YouTube channel IDs are typically 24 characters starting with UC
     return bool(re.match(r'^UC[a-zA-Z0-9_-]{22}$', channel_id))
 
+def channel_video_ids(channel_id):
+    """Lazily list a channel's video IDs, newest first"""
+    import scrapetube
+    return (v['videoId'] for v in scrapetube.get_channel(channel_id))
+
+def fetch_transcript(video_id):
+    """Load the timestamped transcript segments for a single video"""
+    return load_transcript(video_id)
+
+def chunk_transcript(segments):
+    """Split a video's transcript into segment-aligned chunks"""
+    with span("split"):
+        return segments.chunk()
+
+def report_video(video_id, chunk_count, error):
+    """Print the outcome of processing one video"""
+    from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    if error is None:
+        print(f"✅ {url} ({chunk_count} chunks)")
+    elif isinstance(error, NoTranscriptFound):
+        print(f"⚠️  No transcript for {url}")
+    elif isinstance(error, TranscriptsDisabled):
+        print(f"⚠️  Transcripts disabled for {url}")
+    else:
+        print(f"❌ Error processing {url}: {error}")
+
+def refresh_channel_index(channel_id, video_ids, embeddings, store=None, store_lock=None,
+                          recheck=Config.CHANNEL_RECHECK_EXISTING, on_video_done=report_video,
+                          stop_event=None, deduplicate=Config.CHANNEL_DEDUP):
+    """Bring the persistent channel index up to date with the channel's current videos
+    
+    ``video_ids`` is consumed lazily, so the scrapetube generator can be passed
+    in directly. Only videos missing from the manifest are fetched and
+    embedded. With ``recheck`` existing videos are re-fetched too, but only
+    re-embedded when their transcript hash changed. Once the listing is
+    exhausted, chunks of videos that left the channel are deleted.
+    
+    Writes to ``store`` happen under ``store_lock`` so the index can be
+    queried while it is being refreshed. Setting ``stop_event`` stops
+    reading the listing; videos already in flight are still indexed.
+    
+    With ``deduplicate`` near-identical chunks (repeated intros, sponsor
+    reads) are embedded and stored once, citing every video they appear in.
+    """
+    store = store or open_channel_store(channel_id, embeddings)
+    store_lock = store_lock or threading.Lock()
+    dedup = None
+    if deduplicate:
+        from chunk_dedup import ChunkDeduplicator, dedup_index_path
+        # The in-memory store is rebuilt every run, so its index is too
+        path = dedup_index_path(channel_id) if Config.VECTOR_STORE_TYPE != "memory" else None
+        dedup = ChunkDeduplicator(ChunkStore(store), embeddings, path)
+    manifest = ChannelManifest.load(channel_id)
+    hashes = {}
+    seen = set()
+    indexed = [0]
+    listing_complete = [False]
+    
+    def pending_videos():
+        for video_id in video_ids:
+            if stop_event is not None and stop_event.is_set():
+                return
+            seen.add(video_id)
+            if recheck or video_id not in manifest:
+                yield video_id
+        listing_complete[0] = True
+    
+    def fetch_changed(video_id):
+        segments = fetch_transcript(video_id)
+        hash_value = segments.content_hash()
+        if manifest.is_unchanged(video_id, hash_value):
+            return None
+        hashes[video_id] = hash_value
+        return segments
+    
+    def checkpoint():
+        with store_lock:
+            persist_store(store)
+            if dedup is not None:
+                dedup.commit()
+        manifest.save()
+    
+    def delete_chunks(video_id):
+        if dedup is not None:
+            # Chunks other videos repeat are handed over to them rather than deleted
+            dedup.delete_video(video_id)
+        else:
+            delete_video_chunks(store, video_id)
+    
+    def store_chunks(video_id, chunks, vectors, signatures=None):
+        with store_lock:
+            # Replaces an earlier version, or leftovers of an interrupted run
+            delete_chunks(video_id)
+            with span("index_build"):
+                if dedup is not None:
+                    dedup.add_video(video_id, chunks, vectors, signatures)
+                else:
+                    add_embedded_documents(store, video_id, chunks, vectors)
+        manifest.record(video_id, hashes.pop(video_id), len(chunks))
+        indexed[0] += 1
+        if indexed[0] % Config.CHANNEL_CHECKPOINT_EVERY == 0:
+            checkpoint()
+    
+    pipeline = ChannelIngestPipeline(
+        fetch_changed,
+        chunk_transcript,
+        embeddings,
+        store_chunks,
+        on_video_done=on_video_done,
+        deduplicate=dedup.select_new if dedup is not None else None,
+    )
+    try:
+        result = pipeline.run(pending_videos())
+        # Videos that failed after fetching were never recorded
+        for video_id, _ in result.failed:
+            hashes.pop(video_id, None)
+        
+        # A partial listing can't tell which videos were removed
+        removed = manifest.removed_videos(seen) if listing_complete[0] else []
+        for video_id in removed:
+            with store_lock:
+                delete_chunks(video_id)
+            manifest.remove(video_id)
+            hashes.pop(video_id, None)
+        if dedup is not None:
+            result.dedup = dedup.stats()
+    finally:
+        checkpoint()
+        if dedup is not None:
+            dedup.close()
+    
+    return store, result, removed
+
+def answer_channel_question(store, embeddings, chain, question, store_lock=None):
+    """Answer a question from a channel index
+    
+    Returns the answer and its source timestamps, or (None, []) when no
+    indexed chunk is relevant. Searches happen under ``store_lock`` so they
+    can run while the index is being refreshed; the question is embedded
+    before taking it, so a slow embedding request doesn't stall indexing.
+    """
+    with request_trace("ask", scope="channel") as trace:
+        with span("retrieval"):
+            with span("embed_query"):
+                query_vector = embeddings.embed_query(question)
+            with span("vector_search"):
+                with store_lock or nullcontext():
+                    docs = store.similarity_search_by_vector(query_vector, k=Config.RETRIEVAL_K)
+            docs = pack_context(docs, context_budget(question))
+        if not docs:
+            trace.status = "no_context"
+            return None, []
+        with span("llm"):
+            output = chain.run(input_documents=docs, question=question)
+        return output.strip(), source_timestamps(docs)
+
 def main():
+    atexit.register(flush_metrics)
     print("📺 YouTube Channel Chat")
     print("=" * 40)
     
@@ -52,72 +218,81 @@ def main():
         sys.exit(1)
     
     try:
-        # Initialize components
+        # Initialize components (the LLM stack is only imported once input is valid)
         print("\n🔄 Initializing...")
-        embeddings = OpenAIEmbeddings(openai_api_key=api_key)
-        llm = OpenAI(temperature=0, openai_api_key=api_key)
-        
-        # Get channel videos
-        print("📺 Fetching channel videos...")
-        videos = list(scrapetube.get_channel(channel_id))
-        
-        if not videos:
-            print("❌ No videos found for this channel!")
-            sys.exit(1)
+        from langchain.chains.question_answering import load_qa_chain
+        from langchain.llms import OpenAI
+        embeddings = build_embeddings(api_key)
+        llm = OpenAI(temperature=0, max_tokens=Config.ANSWER_MAX_TOKENS, openai_api_key=api_key)
         
-        print(f"✅ Found {len(videos)} videos")
+        store = open_channel_store(channel_id, embeddings)
+        store_lock = threading.Lock()
+        progress = {"indexed": 0, "failed": 0}
         
-        # Process videos
-        pages = []
-        processed_count = 0
-        failed_count = 0
+        def track_video(video_id, chunk_count, error):
+            progress["failed" if error else "indexed"] += 1
+            if not Config.CHANNEL_STREAMING:
+                report_video(video_id, chunk_count, error)
         
-        print("\n🔄 Processing videos...")
-        for i, v in enumerate(videos, 1):
-            try:
-                video_id = v['videoId']
-                url = f"https://www.youtube.com/watch?v={video_id}"
-                print(f"Processing video {i}/{len(videos)}: {url}")
-                
-                loader = YoutubeLoader.from_youtube_url(url, add_video_info=False)
-                video_pages = loader.load_and_split()
-                pages.extend(video_pages)
-                processed_count += 1
-                
-            except NoTranscriptFound:
-                print(f"⚠️  No transcript for video {i}")
-                failed_count += 1
-            except TranscriptsDisabled:
-                print(f"⚠️  Transcripts disabled for video {i}")
-                failed_count += 1
-            except Exception as e:
-                print(f"❌ Error processing video {i}: {e}")
-                failed_count += 1
+        # The channel listing is consumed lazily; only new (or, with recheck,
+        # changed) videos are fetched and embedded
+        print("📺 Fetching channel videos and updating the index...")
+        video_ids = channel_video_ids(channel_id)
+        stop_indexing = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1)
+        refresh = executor.submit(
+            refresh_channel_index, channel_id, video_ids, embeddings,
+            store=store, store_lock=store_lock, on_video_done=track_video,
+            stop_event=stop_indexing,
+        )
+        executor.shutdown(wait=False)
         
-        if not pages:
-            print("❌ No transcripts found for any videos in this channel!")
-            sys.exit(1)
+        def report_refresh():
+            _, result, removed = refresh.result()
+            print(f"\n✅ Indexed {len(result.processed)} new or changed videos")
+            if result.skipped:
+                print(f"♻️  {len(result.skipped)} rechecked videos unchanged")
+            if removed:
+                print(f"🗑️  Removed {len(removed)} videos no longer on the channel")
+            if result.failed:
+                print(f"⚠️  Failed to process {len(result.failed)} videos")
+            print(result.report())
+            cache_stats = embedding_cache_stats(embeddings)
+            if cache_stats:
+                print(f"💾 Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+            batch_stats = embedding_batch_stats(embeddings)
+            if batch_stats.get("chunks"):
+                print(f"⚡ Embedded {batch_stats['chunks']} chunks in {batch_stats['requests']} requests "
+                      f"({batch_stats['chunks_per_second']:.1f} chunks/s, {batch_stats['retries']} retries)")
         
-        print(f"\n✅ Successfully processed {processed_count} videos")
-        if failed_count > 0:
-            print(f"⚠️  Failed to process {failed_count} videos")
+        if not Config.CHANNEL_STREAMING:
+            report_refresh()
+            if store_size(store) == 0:
+                print("❌ No transcripts found for any videos in this channel!")
+                sys.exit(1)
+            print("✅ Channel ready for chatting!")
+        else:
+            print("✅ Indexing in the background - questions are answered from what is indexed so far")
         
-        # Create vector store
-        print("\n🔄 Creating search index...")
-        docsearch = Chroma.from_documents(pages, embeddings).as_retriever()
         chain = load_qa_chain(llm, chain_type="stuff")
-        
-        print("✅ Channel ready for chatting!")
+        refresh_reported = not Config.CHANNEL_STREAMING
         
         # Chat loop
         print("\n💬 Start chatting! (Type 'quit' to exit)")
         print("-" * 40)
         
+        def finish_indexing():
+            if not refresh.done():
+                print("⏳ Saving indexing progress...")
+                stop_indexing.set()
+                refresh.exception()
+        
         while True:
             try:
                 query = input("\n🤔 Your question: ").strip()
                 
                 if query.lower() in ['quit', 'exit', 'q']:
+                    finish_indexing()
                     print("👋 Goodbye!")
                     break
                 
@@ -125,17 +300,33 @@ def main():
                     print("❌ Please enter a question.")
                     continue
                 
-                print("🤖 Searching and thinking...")
-                docs = docsearch.get_relevant_documents(query)
+                if not refresh_reported:
+                    if refresh.done():
+                        refresh_reported = True
+                        report_refresh()
+                    else:
+                        print(f"🔄 Still indexing: {progress['indexed']} videos indexed so far")
                 
-                if not docs:
-                    print("❌ No relevant information found in the channel.")
+                with store_lock:
+                    indexed_chunks = store_size(store)
+                if indexed_chunks == 0:
+                    print("❌ Nothing indexed yet, please try again shortly.")
                     continue
+                print("🤖 Searching and thinking...")
+                answer, sources = answer_channel_question(store, embeddings, chain, query, store_lock)
+                breakdown = debug_breakdown()
                 
-                output = chain.run(input_documents=docs, question=query)
-                print(f"💡 Answer: {output}")
+                if answer is None:
+                    print("❌ No relevant information found in the channel.")
+                else:
+                    print(f"💡 Answer: {answer}")
+                    for source in sources:
+                        print(f"   🕒 {source['timestamp']} {source['url']}")
+                if breakdown:
+                    print(f"⏱️  {breakdown}")
                 
             except KeyboardInterrupt:
+                finish_indexing()
                 print("\n👋 Goodbye!")
                 break
             except Exception as e:
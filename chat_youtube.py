@@ -4,11 +4,21 @@ Simple YouTube Chat Script
 A command-line interface for chatting with YouTube videos
 """
 
+import atexit
 import os
 import sys
-from youtubequery import YoutubeQuery
+from config import Config
+from metrics import debug_breakdown, flush_metrics
+import re
+
+def print_breakdown():
+    """Show where the last request spent its time (DEBUG only)"""
+    breakdown = debug_breakdown()
+    if breakdown:
+        print(f"⏱️  {breakdown}")
 
 def main():
+    atexit.register(flush_metrics)
     print("🎥 YouTube to Chatbot - Command Line Version")
     print("=" * 50)
     
@@ -20,12 +30,8 @@ def main():
             print("❌ OpenAI API key is required!")
             sys.exit(1)
     
-    # Initialize YoutubeQuery
-    try:
-        youtube_query = YoutubeQuery(api_key)
-        print("✅ API key validated successfully!")
-    except ValueError as e:
-        print(f"❌ {e}")
+    if not api_key.startswith('sk-'):
+        print("❌ Invalid OpenAI API key format!")
         sys.exit(1)
     
     # Get YouTube URL
@@ -37,9 +43,23 @@ def main():
         print("❌ YouTube URL is required!")
         sys.exit(1)
     
+    if not re.match(Config.YOUTUBE_URL_PATTERN, url):
+        print("❌ Invalid YouTube URL format!")
+        sys.exit(1)
+    
+    # Initialize YoutubeQuery; the LangChain/vector store stack loads here, after input checks
+    from youtubequery import YoutubeQuery
+    try:
+        youtube_query = YoutubeQuery(api_key)
+        print("✅ API key validated successfully!")
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
     # Process the video
     print("\n🔄 Processing video...")
     result = youtube_query.ingest(url)
+    print_breakdown()
     
     if result != "Success":
         print(f"❌ {result}")
@@ -64,9 +84,12 @@ def main():
                 print("❌ Please enter a question.")
                 continue
             
-            print("🤖 Thinking...")
-            response = youtube_query.ask(question)
-            print(f"💡 Answer: {response}")
+            # Print the answer as it is generated
+            print("💡 Answer: ", end="", flush=True)
+            for token in youtube_query.stream_ask(question):
+                print(token, end="", flush=True)
+            print()
+            print_breakdown()
             
         except KeyboardInterrupt:
             print("\n👋 Goodbye!")
@@ -0,0 +1,353 @@
+"""
+Chunk deduplication
+Collapses near-identical transcript chunks of a shared index into one stored vector
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import Config
+from metrics import count
+from token_budget import count_tokens
+from transcript_segments import with_references
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_WORD = re.compile(r"\w+")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    # Every stored chunk, with its owner and metadata as stored apart from its references
+    "CREATE TABLE IF NOT EXISTS chunks ("
+    "chunk_id TEXT PRIMARY KEY, video_id TEXT NOT NULL, signature BLOB NOT NULL, metadata TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS chunks_video ON chunks (video_id)",
+    # LSH band keys: band number followed by that band's rows of the signature
+    "CREATE TABLE IF NOT EXISTS bands (key BLOB NOT NULL, chunk_id TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS bands_key ON bands (key)",
+    # Every other moment a stored chunk was said at, oldest first
+    "CREATE TABLE IF NOT EXISTS refs ("
+    "chunk_id TEXT NOT NULL, video_id TEXT NOT NULL, start_time REAL, end_time REAL)",
+    "CREATE INDEX IF NOT EXISTS refs_chunk ON refs (chunk_id)",
+    "CREATE INDEX IF NOT EXISTS refs_video ON refs (video_id)",
+)
+
+
+def shingles(text: str, size: int = Config.CHANNEL_DEDUP_SHINGLE_WORDS) -> Set[str]:
+    """Return the overlapping ``size``-word shingles of a text, ignoring case and punctuation"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def dedup_index_path(channel_id: str) -> str:
+    """Return where a channel's deduplication index is kept, next to its manifest"""
+    return os.path.join(Config.CHANNEL_DIR, Config.index_namespace(), channel_id, "dedup.sqlite3")
+
+
+class MinHasher:
+    """MinHash signatures of word shingles; the fraction of equal positions estimates Jaccard similarity"""
+
+    def __init__(self, permutations: int = Config.CHANNEL_DEDUP_PERMUTATIONS, seed: int = 1) -> None:
+        rng = np.random.RandomState(seed)
+        # With 32-bit shingle hashes, multipliers below 2^31 keep a * h + b inside uint64
+        self._a = rng.randint(1, 1 << 31, size=permutations).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=permutations).astype(np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)), dtype=np.uint64)
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+class _Buckets:
+    """In-memory LSH buckets: signatures sharing every row of any band become candidates"""
+
+    def __init__(self, bands: int, rows: int) -> None:
+        self.bands = bands
+        self.rows = rows
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+
+    def _keys(self, signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: str, signature: np.ndarray) -> None:
+        for bucket in self._keys(signature):
+            self._buckets.setdefault(bucket, set()).add(key)
+
+    def candidates(self, signature: np.ndarray) -> Set[str]:
+        found: Set[str] = set()
+        for bucket in self._keys(signature):
+            found.update(self._buckets.get(bucket, ()))
+        return found
+
+
+class ChunkDeduplicator:
+    """Keeps one stored vector per group of near-identical chunks in a shared store
+
+    A new chunk whose estimated Jaccard similarity to a stored chunk reaches
+    ``threshold`` is neither embedded nor stored; the stored chunk's
+    metadata cites the first ``references_per_chunk`` videos and time ranges
+    it was repeated at, and counts them all. Call ``select_new`` before
+    embedding a video's chunks and ``add_video``/``delete_video`` under the
+    store's write lock.
+
+    ``store`` is a ``vectorstore.ChunkStore``. Signatures, band keys and
+    every reference are kept in a SQLite index at ``path`` (in memory if
+    None) and looked up per chunk, so memory doesn't grow with the channel.
+    Changes to it are committed by ``commit``, to be called whenever the
+    store is persisted so both stay in step.
+    """
+
+    def __init__(
+        self,
+        store,
+        embeddings,
+        path: Optional[str] = None,
+        threshold: float = Config.CHANNEL_DEDUP_THRESHOLD,
+        permutations: int = Config.CHANNEL_DEDUP_PERMUTATIONS,
+        bands: int = Config.CHANNEL_DEDUP_BANDS,
+        references_per_chunk: int = Config.CHANNEL_DEDUP_SOURCES_PER_CHUNK,
+    ) -> None:
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+        self.store = store
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.hasher = MinHasher(permutations)
+        self.bands = bands
+        self.rows = permutations // bands
+        self.references_per_chunk = references_per_chunk
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        settings = dict(self._conn.execute("SELECT name, value FROM settings"))
+        if settings.get("permutations", permutations) != permutations or settings.get("bands", bands) != bands:
+            # Signatures of another length or banding can't be compared: chunks
+            # indexed with them are no longer matched, but are still handed over
+            self._conn.execute("DELETE FROM bands")
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
+            [("permutations", permutations), ("bands", bands)],
+        )
+        self._conn.commit()
+        self.dimensions = settings.get("dimensions", 0)
+        self.chunks = 0
+        self.duplicates = 0
+        self.skipped_embeddings = 0
+        self.skipped_tokens = 0
+        self.skipped_text_bytes = 0
+
+    def signatures(self, chunks: List) -> List[np.ndarray]:
+        return [self.hasher.signature(chunk.page_content) for chunk in chunks]
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            band.to_bytes(2, "little") + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _match(self, signature: np.ndarray, exclude_video: Optional[str] = None) -> Optional[str]:
+        """Return the stored chunk most similar to a signature, if any reaches the threshold"""
+        keys = self._band_keys(signature)
+        candidates = self._conn.execute(
+            "SELECT DISTINCT chunks.chunk_id, chunks.video_id, chunks.signature FROM bands "
+            f"JOIN chunks ON chunks.chunk_id = bands.chunk_id WHERE bands.key IN ({','.join('?' * len(keys))})",
+            keys,
+        )
+        best, best_similarity = None, self.threshold
+        for chunk_id, video_id, stored in candidates:
+            if exclude_video is not None and video_id == exclude_video:
+                continue
+            similarity = float(np.mean(np.frombuffer(stored, dtype=np.uint64) == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = chunk_id, similarity
+        return best
+
+    def _index(self, chunk_id: str, video_id: str, signature: np.ndarray, metadata: dict) -> None:
+        self._conn.execute(
+            "INSERT INTO chunks (chunk_id, video_id, signature, metadata) VALUES (?, ?, ?, ?)",
+            (chunk_id, video_id, signature.tobytes(), json.dumps(metadata)),
+        )
+        self._conn.executemany(
+            "INSERT INTO bands (key, chunk_id) VALUES (?, ?)",
+            [(key, chunk_id) for key in self._band_keys(signature)],
+        )
+
+    def _forget(self, chunk_id: str, signature: bytes) -> None:
+        self._conn.executemany(
+            "DELETE FROM bands WHERE key = ? AND chunk_id = ?",
+            [(key, chunk_id) for key in self._band_keys(np.frombuffer(signature, dtype=np.uint64))],
+        )
+        self._conn.execute("DELETE FROM chunks WHERE chunk_id = ?", (chunk_id,))
+        self._conn.execute("DELETE FROM refs WHERE chunk_id = ?", (chunk_id,))
+
+    def _stored_metadata(self, chunk_id: str, metadata: dict) -> dict:
+        """Return a stored chunk's metadata with its first references and their total count"""
+        references = [
+            {"video_id": video_id, "start": start, "end": end}
+            for video_id, start, end in self._conn.execute(
+                "SELECT video_id, start_time, end_time FROM refs WHERE chunk_id = ? ORDER BY rowid LIMIT ?",
+                (chunk_id, self.references_per_chunk),
+            )
+        ]
+        (total,) = self._conn.execute("SELECT COUNT(*) FROM refs WHERE chunk_id = ?", (chunk_id,)).fetchone()
+        return with_references(metadata, references, total)
+
+    def select_new(self, video_id: str, chunks: List) -> Tuple[List, List[np.ndarray]]:
+        """Return the chunks of a video that are not near-duplicates and so need embedding, and every chunk's signature
+
+        The video's own stored chunks don't count, as they are replaced when
+        it is re-indexed. Repeats within the video are only embedded once.
+        Pass the signatures on to ``add_video``.
+        """
+        signatures = self.signatures(chunks)
+        local = _Buckets(self.bands, self.rows)
+        new = []
+        with self._lock:
+            for position, (chunk, signature) in enumerate(zip(chunks, signatures)):
+                if self._match(signature, exclude_video=video_id) is not None:
+                    continue
+                if any(np.mean(signatures[int(other)] == signature) >= self.threshold
+                       for other in local.candidates(signature)):
+                    continue
+                local.add(str(position), signature)
+                new.append(chunk)
+        return new, signatures
+
+    def _free_id(self, video_id: str, position: int) -> str:
+        chunk_id = f"{video_id}-{position}"
+        suffix = 0
+        # A chunk handed over to another video keeps its ID, which a re-indexed video may reuse
+        while self._conn.execute("SELECT 1 FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone():
+            suffix += 1
+            chunk_id = f"{video_id}-{position}-{suffix}"
+        return chunk_id
+
+    def add_video(
+        self,
+        video_id: str,
+        chunks: List,
+        vectors: List[Optional[List[float]]],
+        signatures: Optional[List[np.ndarray]] = None,
+    ) -> None:
+        """Store a video's chunks, collapsing near-duplicates into references on stored chunks
+
+        ``vectors`` holds None for chunks ``select_new`` left out. Chunks that
+        turn out to be new after all (their match was removed since) are
+        embedded here.
+        """
+        signatures = signatures if signatures is not None else self.signatures(chunks)
+        added: List[Tuple[str, object, Optional[List[float]]]] = []
+        updated: Dict[str, dict] = {}
+        with self._lock:
+            for position, (chunk, vector, signature) in enumerate(zip(chunks, vectors, signatures)):
+                chunk.metadata["video_id"] = video_id
+                if vector is not None and not self.dimensions:
+                    self.dimensions = len(vector)
+                    self._conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('dimensions', ?)",
+                                       (self.dimensions,))
+                self.chunks += 1
+                match = self._match(signature)
+                if match is None:
+                    chunk_id = self._free_id(video_id, position)
+                    self._index(chunk_id, video_id, signature, chunk.metadata)
+                    added.append((chunk_id, chunk, vector))
+                    continue
+
+                self._conn.execute(
+                    "INSERT INTO refs (chunk_id, video_id, start_time, end_time) VALUES (?, ?, ?, ?)",
+                    (match, video_id, chunk.metadata.get("start"), chunk.metadata.get("end")),
+                )
+                (metadata,) = self._conn.execute("SELECT metadata FROM chunks WHERE chunk_id = ?", (match,)).fetchone()
+                updated[match] = self._stored_metadata(match, json.loads(metadata))
+                self.duplicates += 1
+                self.skipped_text_bytes += len(chunk.page_content.encode("utf-8"))
+                if vector is None:
+                    self.skipped_embeddings += 1
+                    self.skipped_tokens += count_tokens(chunk.page_content)
+                count("dedup_chunks_collapsed")
+
+        missing = [i for i, (_, _, vector) in enumerate(added) if vector is None]
+        if missing:
+            vectors = self.embeddings.embed_documents([added[i][1].page_content for i in missing])
+            for i, vector in zip(missing, vectors):
+                added[i] = (added[i][0], added[i][1], vector)
+        if added:
+            self.store.add(
+                [chunk_id for chunk_id, _, _ in added],
+                [chunk for _, chunk, _ in added],
+                [vector for _, _, vector in added],
+            )
+        if updated:
+            self.store.update_metadatas(updated)
+
+    def delete_video(self, video_id: str) -> None:
+        """Remove a video's chunks and references; chunks other videos repeat are handed over to them"""
+        updated: Dict[str, dict] = {}
+        with self._lock:
+            owned = self._conn.execute(
+                "SELECT chunk_id, signature, metadata FROM chunks WHERE video_id = ?", (video_id,)
+            ).fetchall()
+            referenced = {
+                chunk_id
+                for (chunk_id,) in self._conn.execute("SELECT DISTINCT chunk_id FROM refs WHERE video_id = ?", (video_id,))
+            }
+            self._conn.execute("DELETE FROM refs WHERE video_id = ?", (video_id,))
+            for chunk_id, signature, metadata in owned:
+                referenced.discard(chunk_id)
+                heir = self._conn.execute(
+                    "SELECT rowid, video_id, start_time, end_time FROM refs WHERE chunk_id = ? ORDER BY rowid LIMIT 1",
+                    (chunk_id,),
+                ).fetchone()
+                if heir is None:
+                    self._forget(chunk_id, signature)
+                    continue
+                rowid, heir_video, start, end = heir
+                self._conn.execute("DELETE FROM refs WHERE rowid = ?", (rowid,))
+                metadata = dict(json.loads(metadata), video_id=heir_video, source=heir_video, start=start, end=end)
+                self._conn.execute(
+                    "UPDATE chunks SET video_id = ?, metadata = ? WHERE chunk_id = ?",
+                    (heir_video, json.dumps(metadata), chunk_id),
+                )
+                updated[chunk_id] = self._stored_metadata(chunk_id, metadata)
+            for chunk_id in sorted(referenced):
+                row = self._conn.execute("SELECT metadata FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if row is not None:
+                    updated[chunk_id] = self._stored_metadata(chunk_id, json.loads(row[0]))
+        # Handed-over chunks change owner first, so only the video's other chunks are deleted
+        if updated:
+            self.store.update_metadatas(updated)
+        self.store.delete_video(video_id)
+
+    def commit(self) -> None:
+        """Make the index changes durable; call whenever the store is persisted"""
+        with self._lock:
+            self._conn.commit()
+
+    def close(self) -> None:
+        self.commit()
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        """Return how many chunks were collapsed and the embedding and storage that saved"""
+        with self._lock:
+            return {
+                "chunks": self.chunks,
+                "duplicates": self.duplicates,
+                "skipped_embeddings": self.skipped_embeddings,
+                "skipped_tokens": self.skipped_tokens,
+                "saved_bytes": self.skipped_text_bytes + self.duplicates * self.dimensions * 4,
+            }
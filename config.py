@@ -3,6 +3,7 @@ Configuration file for YouTube to Chatbot
 """
 
 import os
+import re
 from typing import Optional
 
 class Config:
@@ -14,25 +15,151 @@ class Config:
     OPENAI_TEMPERATURE: float = 0.0
     
     # LangChain Configuration
-    CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 200
+    # Chunk size and overlap are measured in tokens; chunks follow transcript segment boundaries
+    CHUNK_SIZE: int = 300
+    # About 15% of a chunk, so an answer spanning a chunk boundary is still retrieved whole
+    CHUNK_OVERLAP: int = 45
+    TOKEN_ENCODING: str = "cl100k_base"
+    # Context window shared by the prompt, the retrieved chunks and the answer
     MAX_TOKENS: int = 4000
+    ANSWER_MAX_TOKENS: int = 256
+    PROMPT_OVERHEAD_TOKENS: int = 100
+    # Upper bound on tokens of retrieved transcript stuffed into one prompt
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_MIN_CHUNK_TOKENS: int = 50
+    RETRIEVAL_K: int = 8
+    # Fuse BM25 keyword search with vector search (reciprocal rank fusion)
+    HYBRID_RETRIEVAL: bool = True
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_RRF_CONSTANT: int = 60
+    # Skip the query embedding when the top keyword hit has every exact term asked for
+    HYBRID_KEYWORD_SHORTCUT: bool = True
     
     # Vector Store Configuration
+    # "chroma" keeps one persistent collection per video, "memory" rebuilds per process,
+    # "numpy" keeps persistent float32 matrices searched exactly (fastest for small indexes)
     VECTOR_STORE_TYPE: str = "chroma"
+    # Memory-map NumPy indexes from disk instead of reading them into memory
+    NUMPY_STORE_MMAP: bool = False
+    # "int8" (4x smaller) or "pq" (product quantization, 16x smaller at 4 dimensions per code) keeps
+    # compact codes in memory and the float32 matrix memory-mapped on disk; "none" searches floats only
+    NUMPY_STORE_QUANTIZATION: str = "none"
+    NUMPY_STORE_PQ_SUBVECTOR_DIMS: int = 4
+    # Rows sampled to train the quantizer, and indexes smaller than this are searched exactly
+    NUMPY_STORE_QUANTIZE_TRAIN_ROWS: int = 5000
+    NUMPY_STORE_QUANTIZE_MIN_ROWS: int = 1024
+    # Nearest candidates by quantized distance, per result, re-ranked with the float vectors
+    NUMPY_STORE_RERANK_FACTOR: int = 8
+    
+    # Shared Resource Configuration (Streamlit app)
+    # Idle per-video indexes are evicted once the shared ones exceed this estimate. Persistent Chroma keeps
+    # every collection in memory regardless, so with "chroma" only keyword indexes count towards it
+    SHARED_INDEX_MAX_MB: int = 1024
+    # Distinct API keys whose clients are kept alive
+    SHARED_CLIENTS_MAX: int = 16
+    
+    # Answer Cache Configuration
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 2000
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    # Reuse an answer when a new question's embedding is this similar to a cached one
+    ANSWER_CACHE_SEMANTIC: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.96
+    
+    # Summarization Configuration
+    # Transcript tokens per map call, and summary tokens combined per reduce call
+    SUMMARY_CHUNK_TOKENS: int = 2000
+    SUMMARY_REDUCE_TOKENS: int = 3000
+    SUMMARY_MAX_TOKENS: int = 256
+    SUMMARY_MAP_WORKERS: int = 4
+    SUMMARY_REQUESTS_PER_MINUTE: int = 3000
+    SUMMARY_MAX_RETRIES: int = 6
+    SUMMARY_CACHE_ENABLED: bool = True
+    # Videos summarized at once in batch mode
+    SUMMARY_BATCH_WORKERS: int = 4
+    
+    # Query Service Configuration
+    # Concurrent questions arriving within this window share one embedding request and one search per index
+    SERVICE_BATCH_WINDOW_MS: float = 10.0
+    SERVICE_BATCH_MAX_SIZE: int = 64
+    SERVICE_BATCH_CONCURRENCY: int = 4
+    # Threads for retrieval and ingest work, and pooled HTTP connections to OpenAI
+    SERVICE_WORKERS: int = 32
+    SERVICE_HTTP_POOL_SIZE: int = 32
+    
+    # Command-Line Tool Configuration
+    # Questions answered at once, and videos indexed at once, by youtube_cli.py
+    CLI_QUESTION_WORKERS: int = 8
+    CLI_INGEST_WORKERS: int = 4
     
     # YouTube Configuration
     YOUTUBE_URL_PATTERN: str = r'(?:https?://)?(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]{11})'
     CHANNEL_ID_PATTERN: str = r'^UC[a-zA-Z0-9_-]{22}$'
+    TRANSCRIPT_LANGUAGES: list = ["en"]
+    
+    # Channel Ingestion Configuration
+    CHANNEL_FETCH_WORKERS: int = 8
+    CHANNEL_SPLIT_WORKERS: int = 2
+    CHANNEL_EMBED_WORKERS: int = 4
+    CHANNEL_QUEUE_SIZE: int = 32
+    CHANNEL_EMBED_BATCH_SIZE: int = 64
+    # Persist the channel index and manifest every N indexed videos
+    CHANNEL_CHECKPOINT_EVERY: int = 25
+    # Start chatting while the channel is still being indexed
+    CHANNEL_STREAMING: bool = True
+    # Re-fetch already indexed videos on refresh to pick up edited transcripts
+    CHANNEL_RECHECK_EXISTING: bool = False
+    # Store near-identical chunks (repeated intros, sponsor reads, outros) once, with references to every video
+    CHANNEL_DEDUP: bool = True
+    # Estimated Jaccard similarity of word shingles at which two chunks count as duplicates
+    CHANNEL_DEDUP_THRESHOLD: float = 0.85
+    CHANNEL_DEDUP_SHINGLE_WORDS: int = 5
+    # MinHash signature length, split into LSH bands (rows per band = permutations / bands)
+    CHANNEL_DEDUP_PERMUTATIONS: int = 64
+    CHANNEL_DEDUP_BANDS: int = 16
+    # Other videos cited as sources when a collapsed chunk is retrieved
+    CHANNEL_DEDUP_SOURCES_PER_CHUNK: int = 3
     
     # Application Configuration
     APP_NAME: str = "YouTube to Chatbot"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = os.environ.get("DEBUG", "False").lower() == "true"
     
+    # Metrics Configuration
+    # Log every ingest/ask/summarize request's stage timings and keep a Prometheus snapshot in LOG_DIR
+    METRICS_ENABLED: bool = True
+    # Minimum seconds between snapshot rewrites while a process keeps serving requests
+    METRICS_SNAPSHOT_SECONDS: float = 10.0
+    
     # File Paths
     OUTPUT_DIR: str = "output"
     LOG_DIR: str = "logs"
+    CACHE_DIR: str = os.path.join(OUTPUT_DIR, "cache")
+    VECTOR_STORE_DIR: str = os.path.join(OUTPUT_DIR, "vectorstores")
+    CHANNEL_DIR: str = os.path.join(OUTPUT_DIR, "channels")
+    TRANSCRIPT_STORE_DIR: str = os.path.join(OUTPUT_DIR, "transcripts")
+    SUMMARY_CACHE_PATH: str = os.path.join(CACHE_DIR, "summaries.sqlite3")
+    METRICS_LOG_PATH: str = os.path.join(LOG_DIR, "requests.jsonl")
+    METRICS_SNAPSHOT_PATH: str = os.path.join(LOG_DIR, "metrics.prom")
+    SUMMARY_BATCH_DIR: str = os.path.join(OUTPUT_DIR, "summaries")
+    
+    # Embedding Configuration
+    # "openai" calls the OpenAI API, "local" encodes on CPU with sentence-transformers
+    EMBEDDING_BACKEND: str = os.environ.get("EMBEDDING_BACKEND", "openai")
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    LOCAL_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    LOCAL_EMBEDDING_BATCH_SIZE: int = 64
+    # 0 keeps torch's default thread count
+    LOCAL_EMBEDDING_THREADS: int = 0
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = os.path.join(CACHE_DIR, "embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+    EMBEDDING_BATCH_MAX_TOKENS: int = 8000
+    EMBEDDING_BATCH_MAX_SIZE: int = 256
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 3000
+    EMBEDDING_TOKENS_PER_MINUTE: int = 1000000
+    EMBEDDING_MAX_RETRIES: int = 6
     
     @classmethod
     def validate_api_key(cls) -> bool:
@@ -48,8 +175,22 @@ class Config:
             raise ValueError("Invalid or missing OpenAI API key")
         return cls.OPENAI_API_KEY
     
+    @classmethod
+    def embedding_model_name(cls) -> str:
+        """Get the name of the embedding model used by the configured backend"""
+        if cls.EMBEDDING_BACKEND == "local":
+            return cls.LOCAL_EMBEDDING_MODEL
+        return cls.EMBEDDING_MODEL
+    
+    @classmethod
+    def index_namespace(cls) -> str:
+        """Get a directory name identifying the embedding model and chunking of stored indexes"""
+        model = re.sub(r"[^a-zA-Z0-9_.-]", "_", cls.embedding_model_name())
+        return f"{model}-seg{cls.CHUNK_SIZE}-{cls.CHUNK_OVERLAP}"
+    
     @classmethod
     def create_directories(cls):
         """Create necessary directories"""
         os.makedirs(cls.OUTPUT_DIR, exist_ok=True)
-        os.makedirs(cls.LOG_DIR, exist_ok=True) 
\ No newline at end of file
+        os.makedirs(cls.LOG_DIR, exist_ok=True)
+        os.makedirs(cls.CACHE_DIR, exist_ok=True) 
\ No newline at end of file
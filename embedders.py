@@ -0,0 +1,61 @@
+"""
+Embeddings factory
+Builds the embeddings client shared by the chat, channel and Streamlit entry points
+"""
+
+from config import Config
+from embedding_batcher import BatchedEmbeddings, openai_embedding_backend
+from embedding_cache import CachedEmbeddings, get_embedding_cache
+from local_embeddings import SentenceTransformerEmbeddings
+from micro_batcher import MicroBatchedEmbeddings
+
+
+def build_embeddings(openai_api_key=None, batch_queries=False):
+    """Create the configured embeddings client, wrapped in the shared disk cache
+
+    With ``batch_queries`` concurrent query embeddings that miss the cache
+    are coalesced into batched requests (for the query service).
+    """
+    if Config.EMBEDDING_BACKEND == "local":
+        embeddings = SentenceTransformerEmbeddings()
+    elif Config.EMBEDDING_BACKEND == "openai":
+        embeddings = BatchedEmbeddings(openai_embedding_backend(openai_api_key, Config.EMBEDDING_MODEL))
+    else:
+        raise ValueError(f"Unsupported embedding backend: {Config.EMBEDDING_BACKEND}")
+    if batch_queries:
+        embeddings = MicroBatchedEmbeddings(embeddings)
+
+    if not Config.EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    # The cache sits in front of the backend so only misses are computed
+    return CachedEmbeddings(embeddings, get_embedding_cache(), Config.embedding_model_name())
+
+
+def embedding_cache_stats(embeddings) -> dict:
+    """Return cache hit/miss statistics for an embeddings client, if it is cached"""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.stats()
+    return {}
+
+
+def _unwrap(embeddings, wrapper):
+    """Find the ``wrapper`` layer of an embeddings client, if it has one"""
+    while not isinstance(embeddings, wrapper) and isinstance(embeddings, (CachedEmbeddings, MicroBatchedEmbeddings)):
+        embeddings = embeddings.embeddings
+    return embeddings if isinstance(embeddings, wrapper) else None
+
+
+def embedding_batch_stats(embeddings) -> dict:
+    """Return request and throughput statistics for an embeddings client, if it is batched"""
+    embeddings = _unwrap(embeddings, BatchedEmbeddings)
+    if embeddings is not None:
+        return embeddings.stats()
+    return {}
+
+
+def query_batch_stats(embeddings) -> dict:
+    """Return how concurrent query embeddings were coalesced, if they are micro-batched"""
+    embeddings = _unwrap(embeddings, MicroBatchedEmbeddings)
+    if embeddings is not None:
+        return embeddings.stats()
+    return {}
@@ -0,0 +1,186 @@
+"""
+Embedding batcher
+Packs chunks into token-bounded requests and runs them in parallel under a rate limit
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from config import Config
+from metrics import count, in_current_trace
+from token_budget import count_tokens
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` units per minute"""
+
+    def __init__(self, rate_per_minute: float) -> None:
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.capacity = float(rate_per_minute)
+        self.fill_rate = rate_per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """Block until ``amount`` units are available"""
+        # A single request larger than the bucket may still proceed once it is full
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.fill_rate
+            time.sleep(wait)
+
+
+def pack_batches(token_counts: List[int], max_tokens: int, max_size: int) -> List[List[int]]:
+    """Greedily group text indices into batches bounded by total tokens and item count"""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_size):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether an embedding request failed because of rate limits or a transient server error"""
+    status = getattr(error, "http_status", None) or getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("RateLimitError", "ServiceUnavailableError", "APIConnectionError", "Timeout")
+
+
+def openai_embedding_backend(openai_api_key: Optional[str], model: str) -> Callable[[List[str]], List[List[float]]]:
+    """Return a backend that embeds one batch with a single OpenAI request"""
+    import openai
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        response = openai.Embedding.create(input=texts, model=model, api_key=openai_api_key)
+        data = sorted(response["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+    return embed
+
+
+class BatchedEmbeddings:
+    """Embeddings client that batches, parallelizes, rate-limits and retries requests
+
+    ``backend(texts)`` embeds one batch and returns one vector per text; any
+    callable works, so a local fake can stand in for the OpenAI API.
+    """
+
+    def __init__(
+        self,
+        backend: Callable[[List[str]], List[List[float]]],
+        max_batch_tokens: int = Config.EMBEDDING_BATCH_MAX_TOKENS,
+        max_batch_size: int = Config.EMBEDDING_BATCH_MAX_SIZE,
+        max_concurrency: int = Config.EMBEDDING_MAX_CONCURRENCY,
+        requests_per_minute: float = Config.EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = Config.EMBEDDING_TOKENS_PER_MINUTE,
+        max_retries: int = Config.EMBEDDING_MAX_RETRIES,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ) -> None:
+        self.backend = backend
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self._token_counter = token_counter
+        self._request_limiter = RateLimiter(requests_per_minute)
+        self._token_limiter = RateLimiter(tokens_per_minute)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.chunks = 0
+        self.tokens = 0
+        self._first_started: Optional[float] = None
+        self._last_finished: Optional[float] = None
+
+    def count_tokens(self, text: str) -> int:
+        return (self._token_counter or count_tokens)(text)
+
+    def _embed_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            self._request_limiter.acquire()
+            self._token_limiter.acquire(tokens)
+            try:
+                vectors = self.backend(texts)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e):
+                    raise
+                with self._stats_lock:
+                    self.retries += 1
+                # Exponential backoff with jitter
+                time.sleep(min(60.0, 2 ** attempt) * random.uniform(0.5, 1.5))
+
+        if len(vectors) != len(texts):
+            raise ValueError(f"Embedding backend returned {len(vectors)} vectors for {len(texts)} texts")
+        with self._stats_lock:
+            self.requests += 1
+        count("embedding_requests")
+        count("embedding_tokens", tokens)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in token-packed batches, several requests at a time"""
+        if not texts:
+            return []
+
+        started = time.perf_counter()
+        token_counts = [self.count_tokens(text) for text in texts]
+        batches = pack_batches(token_counts, self.max_batch_tokens, self.max_batch_size)
+        futures = [
+            self._executor.submit(
+                in_current_trace(self._embed_batch),
+                [texts[i] for i in batch],
+                sum(token_counts[i] for i in batch),
+            )
+            for batch in batches
+        ]
+
+        vectors: List[List[float]] = [None] * len(texts)
+        for batch, future in zip(batches, futures):
+            for index, vector in zip(batch, future.result()):
+                vectors[index] = vector
+
+        with self._stats_lock:
+            self.chunks += len(texts)
+            self.tokens += sum(token_counts)
+            if self._first_started is None:
+                self._first_started = started
+            self._last_finished = time.perf_counter()
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self._embed_batch([text], self.count_tokens(text))[0]
+
+    def stats(self) -> dict:
+        """Return request, retry and throughput counters"""
+        with self._stats_lock:
+            elapsed = (self._last_finished - self._first_started) if self._first_started is not None else 0.0
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "chunks": self.chunks,
+                "tokens": self.tokens,
+                "chunks_per_second": self.chunks / elapsed if elapsed else 0.0,
+            }
@@ -0,0 +1,189 @@
+"""
+Embedding Cache
+Persistent, content-addressed cache for chunk embeddings shared by every entry point
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from config import Config
+from metrics import count
+
+
+def _cache_key(model: str, text: str) -> str:
+    """Hash the embedding model and chunk text into a cache key"""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU store of embedding vectors keyed by (model, text hash)"""
+
+    def __init__(self, path: str, max_entries: int = 200000) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # WAL lets the Streamlit app and the CLI scripts share one cache file
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, "
+            "vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up vectors for texts, returning None for every miss"""
+        keys = [_cache_key(model, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for vector in results if vector is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """Store vectors for texts and evict the least recently used overflow"""
+        if len(texts) != len(vectors):
+            raise ValueError("texts and vectors must have the same length")
+
+        now = time.time()
+        rows = [
+            (_cache_key(model, text), model, array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current number of cached vectors"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+        }
+
+    def clear(self) -> None:
+        """Remove every cached vector and reset the counters"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+
+class CachedEmbeddings:
+    """Embeddings wrapper that serves previously seen chunks from an EmbeddingCache"""
+
+    def __init__(self, embeddings, cache: EmbeddingCache, model_name: str) -> None:
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, only calling the backend for cache misses"""
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        count("embedding_cache_hits", len(texts) - len(missing))
+        count("embedding_cache_misses", len(missing))
+        if not missing:
+            return vectors
+
+        # Identical chunks within one call are embedded once
+        unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+        new_vectors = self.embeddings.embed_documents(unique_texts)
+        self.cache.put_many(self.model_name, unique_texts, new_vectors)
+
+        by_text = dict(zip(unique_texts, new_vectors))
+        for i in missing:
+            vectors[i] = by_text[texts[i]]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, caching it separately from document embeddings"""
+        query_model = f"{self.model_name}:query"
+        (vector,) = self.cache.get_many(query_model, [text])
+        count("query_embedding_cache_hits" if vector is not None else "query_embedding_cache_misses")
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(query_model, [text], [vector])
+        return vector
+
+    def stats(self) -> dict:
+        """Return the underlying cache statistics"""
+        return self.cache.stats()
+
+
+_shared_caches: Dict[str, EmbeddingCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(path: Optional[str] = None) -> EmbeddingCache:
+    """Return the process-wide cache instance for a cache file"""
+    path = path or Config.EMBEDDING_CACHE_PATH
+    with _shared_caches_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = EmbeddingCache(path, Config.EMBEDDING_CACHE_MAX_ENTRIES)
+        return _shared_caches[path]
@@ -0,0 +1,156 @@
+"""
+Keyword index
+Local BM25 inverted index over transcript chunks and its fusion with vector search
+"""
+
+import heapq
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import Config
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['.][a-z0-9]+)*")
+_QUOTED_PATTERN = re.compile(r'"([^"]+)"')
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can did do does for from how i in is it its of on or so "
+    "that the their there they this to was we what when where which who why will with you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase a text and split it into indexable terms"""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def exact_terms(question: str) -> List[str]:
+    """Return the terms a question asks for literally: quoted text, numbers and names"""
+    terms = []
+    for phrase in _QUOTED_PATTERN.findall(question):
+        terms.extend(tokenize(phrase))
+    words = question.split()
+    for position, word in enumerate(words):
+        stripped = word.strip("\"'?!.,:;()")
+        if not stripped:
+            continue
+        # Capitalized words past the start of the question are usually names
+        if any(c.isdigit() for c in stripped) or (position > 0 and stripped[0].isupper()):
+            terms.extend(tokenize(stripped))
+    return list(dict.fromkeys(terms))
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents
+
+    Postings are stored per term as parallel ``array('I')`` buffers of
+    document numbers and term frequencies.
+    """
+
+    def __init__(self, documents: Sequence, k1: float = 1.5, b: float = 0.75) -> None:
+        self.documents = list(documents)
+        self.k1 = k1
+        postings: Dict[str, Tuple[array, array]] = {}
+        lengths = array("I")
+        for number, document in enumerate(self.documents):
+            counts = Counter(tokenize(document.page_content))
+            lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                if term not in postings:
+                    postings[term] = (array("I"), array("I"))
+                postings[term][0].append(number)
+                postings[term][1].append(frequency)
+        self.postings = postings
+
+        count = len(self.documents)
+        average_length = (sum(lengths) / count) if count else 0.0
+        # Per-document length normalization, precomputed once
+        self._norms = array("d", (
+            k1 * (1.0 - b + b * length / average_length) if average_length else k1
+            for length in lengths
+        ))
+        self._idf = {
+            term: math.log(1.0 + (count - len(numbers) + 0.5) / (len(numbers) + 0.5))
+            for term, (numbers, _) in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, k: int) -> List[Tuple[float, object]]:
+        """Return up to ``k`` (score, document) pairs, best first"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            idf = self._idf[term]
+            numbers, frequencies = self.postings[term]
+            for number, frequency in zip(numbers, frequencies):
+                score = idf * frequency * (self.k1 + 1.0) / (frequency + self._norms[number])
+                scores[number] = scores.get(number, 0.0) + score
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.documents[number]) for number, score in best]
+
+    def estimated_bytes(self) -> int:
+        """Roughly estimate the memory the postings take"""
+        return sum(numbers.itemsize * len(numbers) * 2 + len(term) + 100 for term, (numbers, _) in self.postings.items())
+
+
+def keyword_search(indexes: Iterable[BM25Index], query: str, k: int) -> List:
+    """Search several keyword indexes and merge their hits by score"""
+    hits: List[Tuple[float, object]] = []
+    for index in indexes:
+        hits.extend(index.search(query, k))
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+    return [document for _, document in hits[:k]]
+
+
+def _document_key(document) -> tuple:
+    return (document.metadata.get("video_id"), document.metadata.get("start"), document.page_content)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List], k: int, constant: int = Config.HYBRID_RRF_CONSTANT) -> List:
+    """Fuse ranked document lists, scoring each document by the sum of 1 / (constant + rank)"""
+    scores: Dict[tuple, float] = {}
+    documents: Dict[tuple, object] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = _document_key(document)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (constant + rank)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+def covers_exact_terms(document, terms: List[str]) -> bool:
+    """Check whether a document contains every one of the terms"""
+    return set(terms) <= set(tokenize(document.page_content))
+
+
+def hybrid_search(
+    indexes: Iterable[BM25Index],
+    query: str,
+    vector_search: Callable[[str, int], List],
+    k: int,
+    candidates: int = Config.HYBRID_CANDIDATES,
+    keyword_shortcut: bool = Config.HYBRID_KEYWORD_SHORTCUT,
+    stats: Optional[Dict[str, int]] = None,
+) -> List:
+    """Retrieve ``k`` documents by fusing BM25 and vector rankings
+
+    When the query names exact terms (numbers, names, quoted text) and the
+    best keyword hit contains all of them, the keyword ranking is returned
+    on its own and ``vector_search`` (an embedding round-trip) is skipped.
+    """
+    keyword_hits = keyword_search(indexes, query, candidates)
+    terms = exact_terms(query)
+    if keyword_shortcut and terms and keyword_hits and covers_exact_terms(keyword_hits[0], terms):
+        if stats is not None:
+            stats["keyword_only"] = stats.get("keyword_only", 0) + 1
+        return keyword_hits[:k]
+
+    if stats is not None:
+        stats["fused"] = stats.get("fused", 0) + 1
+    return reciprocal_rank_fusion([vector_search(query, candidates), keyword_hits], k)
@@ -0,0 +1,65 @@
+"""
+Local embeddings
+CPU embedding backend built on sentence-transformers, with no remote API involved
+"""
+
+import threading
+from typing import Dict, List
+
+from config import Config
+
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+
+def load_sentence_transformer(model_name: str, device: str = "cpu"):
+    """Load a sentence-transformers model once per process"""
+    key = f"{model_name}@{device}"
+    with _models_lock:
+        if key not in _models:
+            from sentence_transformers import SentenceTransformer
+
+            _models[key] = SentenceTransformer(model_name, device=device)
+        return _models[key]
+
+
+class SentenceTransformerEmbeddings:
+    """Embeddings client that encodes texts locally in batches"""
+
+    def __init__(
+        self,
+        model_name: str = Config.LOCAL_EMBEDDING_MODEL,
+        batch_size: int = Config.LOCAL_EMBEDDING_BATCH_SIZE,
+        num_threads: int = Config.LOCAL_EMBEDDING_THREADS,
+        device: str = "cpu",
+    ) -> None:
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.device = device
+        if num_threads > 0:
+            import torch
+
+            # Intra-op threads parallelize each batch across CPU cores
+            torch.set_num_threads(num_threads)
+        self.model = load_sentence_transformer(model_name, device)
+        # Batches already use every core, so concurrent callers take turns
+        self._encode_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Encode texts into unit-length vectors"""
+        if not texts:
+            return []
+        with self._encode_lock:
+            vectors = self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Encode a single query"""
+        return self.embed_documents([text])[0]
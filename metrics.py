@@ -0,0 +1,319 @@
+"""
+Metrics
+Per-stage timing spans, token counts and cache hit rates for ingest, ask and summarize requests
+
+Work is wrapped in ``request_trace(kind)``; ``span(stage)`` and ``count(name)``
+inside it add to both the request's trace and the process-wide registry.
+Finished requests are appended to a JSONL log and the registry is written as
+a Prometheus text snapshot, both under ``Config.LOG_DIR``.
+"""
+
+import bisect
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+
+# Histogram bucket upper bounds in seconds, from a cached lookup to a long LLM call
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_PREFIX = "youtube_chatbot"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Tuple[float, ...] = STAGE_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Return (upper bound, observations at or below it) pairs, ending with +Inf"""
+        total = 0
+        pairs = []
+        for bound, bucket_count in zip(list(self.buckets) + [math.inf], self.counts):
+            total += bucket_count
+            pairs.append(("+Inf" if bound == math.inf else repr(bound), total))
+        return pairs
+
+
+class RequestTrace:
+    """Stage timings and counters of one request
+
+    Stages that run several times (an embedding call per batch, an LLM call
+    per chunk) are summed, and their number of calls kept alongside.
+    """
+
+    def __init__(self, kind: str, **labels) -> None:
+        self.kind = kind
+        self.labels = labels
+        self.status = "ok"
+        self.stages: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+        self.started_at = datetime.now(timezone.utc)
+        self.seconds: Optional[float] = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def finish(self) -> None:
+        """Stop the clock and record the request, once; it becomes the caller's ``last_trace()``"""
+        if self.seconds is not None:
+            return
+        self.seconds = time.perf_counter() - self._started
+        get_metrics().record_request(self)
+        _last_trace.set(self)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "status": self.status,
+                "started_at": self.started_at.isoformat(timespec="milliseconds"),
+                "seconds": round(self.seconds or 0.0, 4),
+                "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+                "calls": dict(self.calls),
+                "counters": dict(self.counters),
+                **self.labels,
+            }
+
+    def breakdown(self) -> str:
+        """Return a one-line human readable timing breakdown"""
+        with self._lock:
+            parts = []
+            for stage, seconds in self.stages.items():
+                calls = self.calls[stage]
+                parts.append(f"{stage} {seconds * 1000:.0f}ms" + (f" ({calls} calls)" if calls > 1 else ""))
+            counters = [f"{name}={value:g}" for name, value in self.counters.items()]
+        total = self.seconds if self.seconds is not None else time.perf_counter() - self._started
+        line = f"{self.kind} {self.status} in {total * 1000:.0f}ms"
+        if parts:
+            line += ": " + ", ".join(parts)
+        if counters:
+            line += " | " + ", ".join(counters)
+        return line
+
+
+class MetricsRegistry:
+    """Process-wide stage histograms, request counts and counters"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Histogram] = {}
+        self.requests: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self._log_lock = threading.Lock()
+        self._last_snapshot = 0.0
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_request(self, trace: RequestTrace) -> None:
+        with self._lock:
+            self.requests.setdefault((trace.kind, trace.status), Histogram()).observe(trace.seconds)
+        if not Config.METRICS_ENABLED:
+            return
+        self._log(trace)
+        # Long-running processes (web app, query service) refresh the snapshot as they go
+        if time.monotonic() - self._last_snapshot >= Config.METRICS_SNAPSHOT_SECONDS:
+            self.write_snapshot()
+
+    def _log(self, trace: RequestTrace) -> None:
+        line = json.dumps(trace.as_dict(), ensure_ascii=False, default=str)
+        with self._log_lock:
+            os.makedirs(os.path.dirname(Config.METRICS_LOG_PATH) or ".", exist_ok=True)
+            with open(Config.METRICS_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def snapshot(self) -> dict:
+        """Return stage and request totals, counters and cache hit rates as plain data"""
+        with self._lock:
+            return {
+                "stages": {
+                    stage: {"count": histogram.count, "seconds": histogram.sum}
+                    for stage, histogram in self.stages.items()
+                },
+                "requests": {
+                    f"{kind}:{status}": {"count": histogram.count, "seconds": histogram.sum}
+                    for (kind, status), histogram in self.requests.items()
+                },
+                "counters": dict(self.counters),
+                "cache_hit_rates": self._hit_rates(),
+            }
+
+    def _hit_rates(self) -> Dict[str, float]:
+        """Pair ``<cache>_hits`` with ``<cache>_misses`` counters (lock held)"""
+        caches = {name.rsplit("_", 1)[0] for name in self.counters if name.endswith(("_hits", "_misses"))}
+        rates = {}
+        for cache in caches:
+            hits = self.counters.get(f"{cache}_hits", 0)
+            lookups = hits + self.counters.get(f"{cache}_misses", 0)
+            rates[cache] = hits / lookups if lookups else 0.0
+        return rates
+
+    def prometheus_text(self) -> str:
+        """Render the registry in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {_PREFIX}_stage_seconds Time spent in each pipeline stage")
+            lines.append(f"# TYPE {_PREFIX}_stage_seconds histogram")
+            for stage, histogram in sorted(self.stages.items()):
+                lines.extend(_histogram_lines(f"{_PREFIX}_stage_seconds", f'stage="{stage}"', histogram))
+            lines.append(f"# HELP {_PREFIX}_request_seconds End-to-end request time by kind and outcome")
+            lines.append(f"# TYPE {_PREFIX}_request_seconds histogram")
+            for (kind, status), histogram in sorted(self.requests.items()):
+                labels = f'kind="{kind}",status="{status}"'
+                lines.extend(_histogram_lines(f"{_PREFIX}_request_seconds", labels, histogram))
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {_PREFIX}_{name}_total counter")
+                lines.append(f"{_PREFIX}_{name}_total {value:g}")
+            lines.append(f"# TYPE {_PREFIX}_cache_hit_ratio gauge")
+            for cache, rate in sorted(self._hit_rates().items()):
+                lines.append(f'{_PREFIX}_cache_hit_ratio{{cache="{cache}"}} {rate:.4f}')
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path: Optional[str] = None) -> None:
+        """Atomically write the Prometheus text snapshot (for a textfile collector or a quick look)"""
+        path = path or Config.METRICS_SNAPSHOT_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        self._last_snapshot = time.monotonic()
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> List[str]:
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}' for bound, count in histogram.cumulative()]
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+_registry = MetricsRegistry()
+_current_trace: "contextvars.ContextVar[Optional[RequestTrace]]" = contextvars.ContextVar("request_trace", default=None)
+# The caller's most recently finished trace; per thread and per asyncio task, like any context variable
+_last_trace: "contextvars.ContextVar[Optional[RequestTrace]]" = contextvars.ContextVar("last_request_trace", default=None)
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry"""
+    return _registry
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def last_trace() -> Optional[RequestTrace]:
+    """Return the trace of the last request finished by this thread or task (for debug output)"""
+    return _last_trace.get()
+
+
+def debug_breakdown() -> Optional[str]:
+    """Return the timing breakdown of the caller's last request when ``Config.DEBUG`` is on"""
+    trace = _last_trace.get()
+    if not Config.DEBUG or trace is None:
+        return None
+    return trace.breakdown()
+
+
+def flush_metrics() -> None:
+    """Write the Prometheus snapshot now, if metrics are enabled (scripts call this on exit)"""
+    if Config.METRICS_ENABLED and (_registry.requests or _registry.stages):
+        _registry.write_snapshot()
+
+
+@contextmanager
+def activate(trace: Optional[RequestTrace]) -> Iterator[Optional[RequestTrace]]:
+    """Make ``trace`` the current request's trace (e.g. in a worker thread) without finishing it"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def request_trace(kind: str, **labels) -> Iterator[RequestTrace]:
+    """Trace one request; an exception escaping the block marks it as an error"""
+    trace = RequestTrace(kind, **labels)
+    try:
+        with activate(trace):
+            yield trace
+    except BaseException:
+        trace.status = "error"
+        raise
+    finally:
+        trace.finish()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block as one call of a pipeline stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        _registry.observe(stage, seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(stage, seconds)
+
+
+def count(name: str, amount: float = 1) -> None:
+    """Add to a counter, process-wide and for the current request"""
+    if not amount:
+        return
+    _registry.count(name, amount)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, amount)
+
+
+def in_current_trace(fn: Callable) -> Callable:
+    """Wrap ``fn`` so worker threads running it report to the caller's trace"""
+    trace = _current_trace.get()
+
+    def run(*args, **kwargs):
+        with activate(trace):
+            return fn(*args, **kwargs)
+
+    return run
@@ -0,0 +1,129 @@
+"""
+Micro-batching
+Coalesces concurrent single-item calls (query embeddings, vector searches) into batched calls
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from config import Config
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Collects items submitted from many threads into batches handled by one call
+
+    The first item of a batch waits at most ``window`` seconds for others to
+    join, and a batch closes early once ``max_size`` items have joined.
+    ``process(items)`` returns one result per item; up to ``max_concurrency``
+    batches are processed at once while the next one is being collected.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[list], list],
+        window: float = Config.SERVICE_BATCH_WINDOW_MS / 1000.0,
+        max_size: int = Config.SERVICE_BATCH_MAX_SIZE,
+        max_concurrency: int = Config.SERVICE_BATCH_CONCURRENCY,
+        name: str = "micro-batcher",
+    ) -> None:
+        self.process = process
+        self.window = window
+        self.max_size = max_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=name)
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._collect, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        """Queue an item for the next batch"""
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        """Process one item as part of a batch and return its result"""
+        return self.submit(item).result()
+
+    def _collect(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            stop = False
+            while len(batch) < self.max_size:
+                try:
+                    # Whatever is already queued joins even when the window is 0
+                    entry = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._executor.submit(self._process, batch)
+            if stop:
+                return
+
+    def _process(self, batch: List[tuple]) -> None:
+        items = [item for item, _ in batch]
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(items)
+            self.largest_batch = max(self.largest_batch, len(items))
+        try:
+            results = self.process(items)
+            if len(results) != len(items):
+                raise ValueError(f"Batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def close(self) -> None:
+        """Process what is queued, then stop the collector thread"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        """Return batch counts and the mean batch size"""
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "largest_batch": self.largest_batch,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            }
+
+
+class MicroBatchedEmbeddings:
+    """Embeddings wrapper that embeds concurrent queries with one batched request
+
+    ``embed_documents`` calls pass straight through; they are batched already.
+    """
+
+    def __init__(self, embeddings, batcher: Optional[MicroBatcher] = None) -> None:
+        self.embeddings = embeddings
+        self.batcher = batcher or MicroBatcher(embeddings.embed_documents, name="embed-queries")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher(text)
+
+    def stats(self) -> dict:
+        return self.batcher.stats()
@@ -0,0 +1,426 @@
+"""
+NumPy collection
+Exact top-k search over a float32 matrix, optionally memory-mapped or shortlisted by quantized codes
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config import Config
+from quantization import make_quantizer
+
+# Rows copied per step when encoding or writing a whole matrix
+_BLOCK_ROWS = 4096
+
+
+def _matches(metadata: dict, where: Optional[dict]) -> bool:
+    return not where or all(metadata.get(key) == value for key, value in where.items())
+
+
+def _nearest(distances: np.ndarray, n: int) -> np.ndarray:
+    """Return the rows of the ``n`` smallest distances, nearest first"""
+    rows = np.argpartition(distances, n - 1)[:n] if n < len(distances) else np.arange(len(distances))
+    return rows[np.argsort(distances[rows])]
+
+
+def _append(buffer: np.ndarray, used: int, rows: np.ndarray) -> np.ndarray:
+    """Write ``rows`` after the first ``used`` rows of ``buffer``, growing it geometrically so appends stay amortized O(n)"""
+    needed = used + len(rows)
+    if needed > len(buffer) or buffer.shape[1:] != rows.shape[1:]:
+        grown = np.empty((max(needed, 2 * used, 64),) + rows.shape[1:], dtype=rows.dtype)
+        if used:
+            grown[:used] = buffer[:used]
+        buffer = grown
+    buffer[used:needed] = rows
+    return buffer
+
+
+def _gather(base: np.ndarray, base_rows: int, tail: np.ndarray, rows: np.ndarray, dimensions: int) -> np.ndarray:
+    """Return the float vectors of sorted ``rows``, split between the base matrix and the tail"""
+    split = np.searchsorted(rows, base_rows)
+    parts = [part for part in (base[rows[:split]], tail[rows[split:] - base_rows]) if len(part)]
+    return np.concatenate(parts) if parts else np.zeros((0, dimensions), dtype=np.float32)
+
+
+def _products(queries: np.ndarray, base: np.ndarray, base_rows: int, tail: np.ndarray) -> np.ndarray:
+    """Return the dot product of every query with every row of the base matrix and the tail"""
+    parts = [queries @ part.T for part in (base[:base_rows], tail) if len(part)]
+    return np.concatenate(parts, axis=1) if parts else np.zeros((len(queries), 0), dtype=np.float32)
+
+
+class NumpyCollection:
+    """Chunks and their embeddings for one collection
+
+    Implements the subset of the chromadb ``Collection`` API (``count``,
+    ``add``, ``query``, ``get``, ``peek``, ``update``, ``delete``) that the helpers in
+    ``vectorstore.py`` use, so both backends are driven the same way.
+    Distances are squared L2, as in Chroma's default space.
+
+    Rows are never modified in place: the matrix loaded from disk (memory-
+    mapped with ``mmap``) is followed by an in-memory tail of added rows, and
+    ``update``/``delete`` mark the old row dead. Dead rows are dropped at
+    once from in-memory matrices, and from memory-mapped ones by ``persist``,
+    which then maps the rewritten file. A memory-mapped collection so never
+    copies its float matrix into memory.
+
+    With ``quantization`` ("int8" or "pq") every row also has a compact code
+    (see ``quantization.py``) and the matrix is always memory-mapped.
+    Searches shortlist ``rerank_factor`` times the requested rows by
+    quantized distance and re-rank them with the float vectors, reading only
+    the shortlisted rows. The quantizer is trained once the collection
+    reaches ``NUMPY_STORE_QUANTIZE_MIN_ROWS`` (and again as it doubles), by
+    ``add`` or on load, outside the lock so searches carry on meanwhile.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        mmap: bool = False,
+        quantization: Optional[str] = None,
+        rerank_factor: int = Config.NUMPY_STORE_RERANK_FACTOR,
+    ) -> None:
+        self.path = path
+        self.quantization = None if quantization in (None, "none") else quantization
+        if self.quantization:
+            make_quantizer(self.quantization)  # Fail early on an unknown kind
+        self.mmap = mmap or self.quantization is not None
+        self.rerank_factor = rerank_factor
+        self._lock = threading.Lock()
+        self._base = np.zeros((0, 0), dtype=np.float32)
+        self._base_rows = 0
+        self._tail = np.zeros((0, 0), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._dimensions = 0
+        # Rows stored, dead ones included, and how many are dead
+        self._count = 0
+        self._dead = 0
+        # Bumped by every change, so persist() can tell whether its snapshot is still current
+        self._version = 0
+        self._quantizer = None
+        self._codes: Optional[np.ndarray] = None
+        self._trained_rows = 0
+        self._training = False
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[dict] = []
+        if path and os.path.exists(path + ".npy"):
+            self._load()
+            self._train()
+
+    def _load(self) -> None:
+        with open(self.path + ".json", "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.ids, self.documents, self.metadatas = data["ids"], data["documents"], data["metadatas"]
+        # A memory-mapped matrix is paged in from disk on demand
+        self._base = np.load(self.path + ".npy", mmap_mode="r" if self.mmap else None)
+        self._count = self._base_rows = len(self.ids)
+        self._alive = np.ones(self._count, dtype=bool)
+        self._dimensions = self._base.shape[1] if self._count else 0
+        self._tail = np.zeros((0, self._dimensions), dtype=np.float32)
+        if not self._load_codes():
+            self._norms = np.einsum("ij,ij->i", self._base, self._base).astype(np.float32)
+
+    def _load_codes(self) -> bool:
+        """Restore persisted codes and row norms, unless they are missing, stale or of another kind"""
+        if not self.quantization or not os.path.exists(self.path + ".codes.npz"):
+            return False
+        with np.load(self.path + ".codes.npz") as data:
+            arrays = {name: data[name] for name in data.files}
+        if str(arrays["kind"]) != self.quantization or len(arrays["codes"]) != self._count:
+            return False
+        self._quantizer = make_quantizer(self.quantization, arrays)
+        self._codes, self._norms = arrays["codes"], arrays["norms"]
+        self._trained_rows = int(arrays["trained_rows"])
+        return True
+
+    def _needs_training(self) -> bool:
+        """Whether the quantizer should be (re-)trained: at the minimum size, then whenever the collection doubles"""
+        live = self._count - self._dead
+        if not self.quantization or self._training or live < Config.NUMPY_STORE_QUANTIZE_MIN_ROWS:
+            return False
+        if self._quantizer is None:
+            return True
+        return self._trained_rows < Config.NUMPY_STORE_QUANTIZE_TRAIN_ROWS and live >= 2 * self._trained_rows
+
+    def _train(self) -> None:
+        """Train the quantizer and encode every row if due, without holding the lock while doing so"""
+        with self._lock:
+            if not self._needs_training():
+                return
+            self._training = True
+            count, base, base_rows, tail = self._count, self._base, self._base_rows, self._tail
+            live = np.flatnonzero(self._alive[:count])
+        try:
+            sample = np.sort(np.random.default_rng(0).choice(
+                live, min(len(live), Config.NUMPY_STORE_QUANTIZE_TRAIN_ROWS), replace=False
+            ))
+            quantizer = make_quantizer(self.quantization).fit(
+                _gather(base, base_rows, tail, sample, self._dimensions)
+            )
+            codes = np.concatenate([
+                quantizer.encode(_gather(base, base_rows, tail, np.arange(start, min(start + _BLOCK_ROWS, count)), self._dimensions))
+                for start in range(0, count, _BLOCK_ROWS)
+            ])
+        finally:
+            with self._lock:
+                self._training = False
+        with self._lock:
+            # Rows are immutable and nothing is compacted during training, so
+            # only rows added meanwhile are left to encode
+            if self._count > count:
+                added = np.arange(count, self._count)
+                codes = np.concatenate([
+                    codes, quantizer.encode(_gather(self._base, self._base_rows, self._tail, added, self._dimensions))
+                ])
+            self._quantizer, self._codes, self._trained_rows = quantizer, codes, len(sample)
+            # A persist() that snapshotted the old codes mustn't install them
+            self._version += 1
+            self._compact_in_memory()
+
+    def vector_bytes(self) -> int:
+        """Return the memory the vectors take; a memory-mapped matrix stays on disk and isn't counted"""
+        with self._lock:
+            count = self._count
+            base_bytes = 0 if isinstance(self._base, np.memmap) else self._base[:self._base_rows].nbytes
+            codes_bytes = self._codes[:count].nbytes if self._codes is not None else 0
+            return base_bytes + self._tail[:count - self._base_rows].nbytes + self._norms[:count].nbytes + codes_bytes
+
+    def count(self) -> int:
+        return self._count - self._dead
+
+    def _append_rows(self, vectors: np.ndarray, ids: List[str], metadatas: List[dict], documents: List[str]) -> None:
+        """Append rows after the last one (lock held)"""
+        if self._count and vectors.shape[1] != self._dimensions:
+            raise ValueError(f"Expected {self._dimensions}-dimensional embeddings, got {vectors.shape[1]}")
+        self._dimensions = vectors.shape[1]
+        self._tail = _append(self._tail, self._count - self._base_rows, vectors)
+        self._norms = _append(self._norms, self._count, np.einsum("ij,ij->i", vectors, vectors))
+        self._alive = _append(self._alive, self._count, np.ones(len(vectors), dtype=bool))
+        if self._codes is not None:
+            self._codes = _append(self._codes, self._count, self._quantizer.encode(vectors))
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+        self.metadatas.extend(dict(metadata or {}) for metadata in metadatas)
+        self._count += len(vectors)
+        self._version += 1
+
+    def _kill(self, row: int) -> None:
+        self._alive[row] = False
+        self._dead += 1
+        self._version += 1
+
+    def _live_rows(self) -> Dict[str, int]:
+        """Map the ID of every live row to its row (lock held)"""
+        return {self.ids[row]: row for row in range(self._count) if self._alive[row]}
+
+    def _compact_in_memory(self) -> None:
+        """Drop dead rows, unless the matrix is memory-mapped (persist() rewrites it) or codes are being trained (lock held)"""
+        if not self._dead or self._training or (isinstance(self._base, np.memmap) and self._base_rows):
+            return
+        rows = np.flatnonzero(self._alive[:self._count])
+        self._base = _gather(self._base, self._base_rows, self._tail, rows, self._dimensions)
+        self._tail = np.zeros((0, self._dimensions), dtype=np.float32)
+        self._norms = self._norms[rows]
+        self._codes = self._codes[rows] if self._codes is not None else None
+        self._adopt(rows)
+
+    def _adopt(self, rows: np.ndarray) -> None:
+        """Keep only ``rows`` of the texts and metadata, once the vectors have been compacted to them (lock held)"""
+        self.ids = [self.ids[row] for row in rows]
+        self.documents = [self.documents[row] for row in rows]
+        self.metadatas = [self.metadatas[row] for row in rows]
+        self._count = self._base_rows = len(rows)
+        self._alive = np.ones(self._count, dtype=bool)
+        self._dead = 0
+        if not self._count:
+            # The next rows may have other dimensions
+            self._dimensions = 0
+            self._quantizer, self._codes, self._trained_rows = None, None, 0
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[dict], documents: List[str]) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one embedding per id")
+        with self._lock:
+            self._append_rows(vectors, ids, metadatas, documents)
+        self._train()
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, include: Iterable[str] = ()) -> Dict[str, list]:
+        """Return the ``n_results`` nearest rows per query, nearest first"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        with self._lock:
+            count, dead = self._count, self._dead
+            base, base_rows, tail = self._base, self._base_rows, self._tail[:count - self._base_rows]
+            norms, alive = self._norms[:count], self._alive[:count].copy()
+            quantizer, codes = self._quantizer, self._codes[:count] if self._codes is not None else None
+            ids, documents, metadatas = self.ids[:count], self.documents[:count], self.metadatas[:count]
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        k = min(n_results, count - dead)
+        if k == 0:
+            for key in result:
+                result[key] = [[] for _ in queries]
+            return result
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        if codes is None:
+            # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2, one matrix product for every row and query
+            all_distances = norms[None, :] - 2.0 * _products(queries, base, base_rows, tail) + query_norms[:, None]
+            shortlist = k
+        else:
+            all_distances = quantizer.distances(queries, codes, norms)
+            shortlist = min(count - dead, k * self.rerank_factor)
+        if dead:
+            all_distances[:, ~alive] = np.inf
+        for query, query_norm, distances in zip(queries, query_norms, all_distances):
+            rows = _nearest(distances, shortlist)
+            if codes is None:
+                row_distances = distances[rows]
+            else:
+                # Exact distances for the shortlist; only these rows of the float matrix are read, in file order
+                rows = np.sort(rows)
+                exact = norms[rows] - 2.0 * (_gather(base, base_rows, tail, rows, query.shape[0]) @ query) + query_norm
+                order = _nearest(exact, k)
+                rows, row_distances = rows[order], exact[order]
+            result["ids"].append([ids[row] for row in rows])
+            result["documents"].append([documents[row] for row in rows])
+            result["metadatas"].append([metadatas[row] for row in rows])
+            result["distances"].append(row_distances.tolist())
+        return result
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None, include: Iterable[str] = ()) -> Dict[str, list]:
+        wanted = set(ids) if ids is not None else None
+        with self._lock:
+            rows = [
+                row for row in range(self._count)
+                if self._alive[row] and (wanted is None or self.ids[row] in wanted) and _matches(self.metadatas[row], where)
+            ]
+            return {
+                "ids": [self.ids[row] for row in rows],
+                "documents": [self.documents[row] for row in rows],
+                "metadatas": [self.metadatas[row] for row in rows],
+            }
+
+    def peek(self, limit: int = 10) -> Dict[str, list]:
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._count])[:limit]
+            vectors = _gather(self._base, self._base_rows, self._tail, rows, self._dimensions)
+            return {
+                "ids": [self.ids[row] for row in rows],
+                "embeddings": vectors.tolist(),
+                "documents": [self.documents[row] for row in rows],
+                "metadatas": [self.metadatas[row] for row in rows],
+            }
+
+    def update(
+        self,
+        ids: List[str],
+        embeddings: Optional[List[List[float]]] = None,
+        metadatas: Optional[List[dict]] = None,
+        documents: Optional[List[str]] = None,
+    ) -> None:
+        """Replace the embeddings, metadata or texts of existing rows; unknown IDs are ignored
+
+        A new embedding is appended as a new row and the old row dies.
+        """
+        with self._lock:
+            rows = self._live_rows()
+            moved = []
+            for position, chunk_id in enumerate(ids):
+                row = rows.get(chunk_id)
+                if row is None:
+                    continue
+                if metadatas is not None:
+                    self.metadatas[row] = dict(metadatas[position] or {})
+                if documents is not None:
+                    self.documents[row] = documents[position]
+                if embeddings is not None:
+                    moved.append((row, embeddings[position]))
+            if moved:
+                for row, _ in moved:
+                    self._kill(row)
+                self._append_rows(
+                    np.asarray([vector for _, vector in moved], dtype=np.float32),
+                    [self.ids[row] for row, _ in moved],
+                    [self.metadatas[row] for row, _ in moved],
+                    [self.documents[row] for row, _ in moved],
+                )
+                self._compact_in_memory()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None) -> None:
+        wanted = set(ids) if ids is not None else None
+        with self._lock:
+            for row in range(self._count):
+                if self._alive[row] and (wanted is None or self.ids[row] in wanted) and _matches(self.metadatas[row], where):
+                    self._kill(row)
+            self._compact_in_memory()
+
+    def persist(self) -> None:
+        """Atomically write the live rows' matrix (.npy), chunk texts and metadata (.json) and any codes (.codes.npz)
+
+        A memory-mapped collection then maps the rewritten matrix, dropping
+        its dead rows and its in-memory tail.
+        """
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            version, dimensions = self._version, self._dimensions
+            base, base_rows, tail = self._base, self._base_rows, self._tail
+            rows = np.flatnonzero(self._alive[:self._count])
+            data = {
+                "ids": [self.ids[row] for row in rows],
+                "documents": [self.documents[row] for row in rows],
+                "metadatas": [self.metadatas[row] for row in rows],
+            }
+            norms = self._norms[rows]
+            codes = None
+            if self._codes is not None:
+                codes = dict(
+                    self._quantizer.arrays(),
+                    kind=np.array(self._quantizer.kind),
+                    codes=self._codes[rows],
+                    norms=norms,
+                    trained_rows=np.array(self._trained_rows),
+                )
+        suffix = f".{threading.get_ident()}.tmp"
+        if len(rows):
+            # Written block by block, so a memory-mapped matrix is never read into memory whole
+            matrix = np.lib.format.open_memmap(
+                self.path + ".npy" + suffix, mode="w+", dtype=np.float32, shape=(len(rows), dimensions)
+            )
+            for start in range(0, len(rows), _BLOCK_ROWS):
+                matrix[start:start + _BLOCK_ROWS] = _gather(base, base_rows, tail, rows[start:start + _BLOCK_ROWS], dimensions)
+            matrix.flush()
+            del matrix
+        else:
+            with open(self.path + ".npy" + suffix, "wb") as f:
+                np.save(f, np.zeros((0, dimensions), dtype=np.float32))
+        with open(self.path + ".json" + suffix, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        if codes is not None:
+            with open(self.path + ".codes.npz" + suffix, "wb") as f:
+                np.savez(f, **codes)
+        os.replace(self.path + ".npy" + suffix, self.path + ".npy")
+        os.replace(self.path + ".json" + suffix, self.path + ".json")
+        if codes is not None:
+            os.replace(self.path + ".codes.npz" + suffix, self.path + ".codes.npz")
+        elif os.path.exists(self.path + ".codes.npz"):
+            os.remove(self.path + ".codes.npz")
+
+        if not self.mmap or not len(rows):
+            return
+        matrix = np.load(self.path + ".npy", mmap_mode="r")
+        with self._lock:
+            # Changes made while writing stay in memory until the next persist
+            if self._version != version or self._training:
+                return
+            self._base, self._tail = matrix, np.zeros((0, dimensions), dtype=np.float32)
+            self._norms = norms
+            if codes is not None:
+                self._codes = codes["codes"]
+            self._adopt(rows)
@@ -0,0 +1,48 @@
+"""
+NumPy vector store
+LangChain adapter for NumpyCollection
+"""
+
+import uuid
+from typing import Any, Iterable, List, Optional
+
+from langchain.docstore.document import Document
+from langchain.vectorstores.base import VectorStore
+
+from numpy_collection import NumpyCollection
+
+
+class NumpyVectorStore(VectorStore):
+    """LangChain vector store over a NumpyCollection, scanned exactly or through quantized codes"""
+
+    def __init__(
+        self, embedding_function, path: Optional[str] = None, mmap: bool = False, quantization: Optional[str] = None
+    ) -> None:
+        self._embedding_function = embedding_function
+        self._collection = NumpyCollection(path, mmap, quantization)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = kwargs.get("ids") or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self._collection.add(ids, self._embedding_function.embed_documents(texts), metadatas, texts)
+        return ids
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding_function.embed_query(query), k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        result = self._collection.query([embedding], n_results=k)
+        return [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(result["documents"][0], result["metadatas"][0])
+        ]
+
+    def persist(self) -> None:
+        self._collection.persist()
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding, metadatas: Optional[List[dict]] = None, **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(embedding, kwargs.get("path"), kwargs.get("mmap", False), kwargs.get("quantization"))
+        store.add_texts(texts, metadatas)
+        return store
@@ -0,0 +1,136 @@
+"""
+Vector quantization
+Compact int8 and product-quantized codes for approximate distances over large embedding matrices
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from config import Config
+
+# Rows decoded per step of a scan, bounding scratch memory to a few MB
+_BLOCK_ROWS = 4096
+
+
+class Int8Quantizer:
+    """Scalar quantization of every dimension to int8, 4x smaller than float32"""
+
+    kind = "int8"
+
+    def __init__(self, scale: Optional[np.ndarray] = None) -> None:
+        self.scale = scale
+
+    def fit(self, vectors: np.ndarray) -> "Int8Quantizer":
+        peak = np.abs(vectors).max(axis=0)
+        self.scale = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def distances(self, queries: np.ndarray, codes: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        """Approximate squared L2 distances, from exact row norms and quantized dot products"""
+        scaled = queries * self.scale
+        products = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            block = codes[start:start + _BLOCK_ROWS].astype(np.float32)
+            products[:, start:start + len(block)] = scaled @ block.T
+        return norms[None, :] - 2.0 * products + np.einsum("ij,ij->i", queries, queries)[:, None]
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"scale": self.scale}
+
+
+class ProductQuantizer:
+    """Product quantization: each ``subvector_dims``-wide slice is stored as the index of its nearest centroid
+
+    With 4-dimension slices and 256 centroids a 1536-dimension embedding
+    takes 384 bytes instead of 6144.
+    """
+
+    kind = "pq"
+
+    def __init__(
+        self,
+        subvector_dims: int = Config.NUMPY_STORE_PQ_SUBVECTOR_DIMS,
+        iterations: int = 10,
+        seed: int = 0,
+        codebooks: Optional[np.ndarray] = None,
+    ) -> None:
+        self.subvector_dims = subvector_dims
+        self.iterations = iterations
+        self.seed = seed
+        # (subvectors, centroids, subvector_dims)
+        self.codebooks = codebooks
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        if vectors.shape[1] % self.subvector_dims:
+            raise ValueError(f"{vectors.shape[1]}-dimensional vectors do not split into {self.subvector_dims}-dimensional slices")
+        return vectors.reshape(len(vectors), -1, self.subvector_dims)
+
+    def fit(self, vectors: np.ndarray) -> "ProductQuantizer":
+        slices = self._split(np.asarray(vectors, dtype=np.float32))
+        centroids = min(256, len(vectors))
+        rng = np.random.default_rng(self.seed)
+        codebooks = slices[rng.choice(len(vectors), centroids, replace=False)].transpose(1, 0, 2).copy()
+        for _ in range(self.iterations):
+            # Lloyd's k-means on every slice at once
+            assignments = self._assign(slices, codebooks)
+            for subvector in range(codebooks.shape[0]):
+                members = assignments[:, subvector]
+                sizes = np.bincount(members, minlength=centroids)
+                sums = np.stack([
+                    np.bincount(members, weights=slices[:, subvector, dim], minlength=centroids)
+                    for dim in range(self.subvector_dims)
+                ], axis=1)
+                filled = sizes > 0
+                # Empty clusters keep their previous centroid
+                codebooks[subvector, filled] = (sums[filled] / sizes[filled, None]).astype(np.float32)
+        self.codebooks = codebooks
+        return self
+
+    @staticmethod
+    def _assign(slices: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+        """Return the nearest centroid of every slice, shape (rows, subvectors)"""
+        codes = np.empty(slices.shape[:2], dtype=np.uint8)
+        centroid_norms = np.einsum("mkd,mkd->mk", codebooks, codebooks)
+        for start in range(0, len(slices), _BLOCK_ROWS):
+            block = slices[start:start + _BLOCK_ROWS]
+            for subvector, centroids in enumerate(codebooks):
+                # ||c||^2 - 2 x.c ranks centroids like ||x - c||^2
+                scores = centroid_norms[subvector] - 2.0 * (block[:, subvector] @ centroids.T)
+                codes[start:start + len(block), subvector] = scores.argmin(axis=1)
+        return codes
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return self._assign(self._split(np.asarray(vectors, dtype=np.float32)), self.codebooks)
+
+    def distances(self, queries: np.ndarray, codes: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        """Approximate squared L2 distances from per-query lookup tables of slice-to-centroid distances"""
+        slices = self._split(queries)
+        # (queries, subvectors, centroids)
+        tables = ((slices[:, :, None, :] - self.codebooks[None]) ** 2).sum(axis=3)
+        offsets = np.arange(codes.shape[1]) * self.codebooks.shape[1]
+        distances = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            positions = codes[start:start + _BLOCK_ROWS] + offsets
+            for query, table in enumerate(tables):
+                distances[query, start:start + len(positions)] = table.ravel()[positions].sum(axis=1)
+        return distances
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+
+def make_quantizer(kind: str, arrays: Optional[Dict[str, np.ndarray]] = None):
+    """Create an untrained quantizer, or restore a trained one from its ``arrays()``"""
+    arrays = arrays or {}
+    if kind == "int8":
+        return Int8Quantizer(arrays.get("scale"))
+    if kind == "pq":
+        codebooks = arrays.get("codebooks")
+        if codebooks is not None:
+            return ProductQuantizer(codebooks.shape[2], codebooks=codebooks)
+        return ProductQuantizer()
+    raise ValueError(f"Unsupported quantization: {kind}")
@@ -0,0 +1,238 @@
+"""
+Query service
+HTTP API over YoutubeQuery so many frontends can share one warm process
+
+Run with ``uvicorn --factory query_service:create_app`` (one worker process;
+scale with concurrency inside it, which is what the micro-batching needs).
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from config import Config
+from embedders import embedding_batch_stats, embedding_cache_stats, query_batch_stats
+from metrics import get_metrics, last_trace
+from micro_batcher import MicroBatcher
+from shared_resources import QueryClients, ResourceRegistry
+from transcript_segments import video_id_from_url
+from vectorstore import search_stores, search_stores_batch
+from youtubequery import YoutubeQuery
+
+
+class IngestRequest(BaseModel):
+    url: str = Field(..., description="YouTube video URL")
+
+
+class AskRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    videos: List[str] = Field(..., min_items=1, description="YouTube URLs of the videos to answer from")
+
+
+class SummarizeRequest(BaseModel):
+    url: str = Field(..., description="YouTube video URL")
+
+
+class QueryService:
+    """Answers requests with short-lived YoutubeQuery sessions over one shared registry
+
+    Video indexes and clients live in the registry, so a request only pays
+    for loading a video the first time any frontend asks about it. With
+    ``batch`` set, query embeddings and vector searches of concurrent
+    requests are coalesced into batched calls.
+    """
+
+    def __init__(self, openai_api_key: str, registry: Optional[ResourceRegistry] = None, batch: bool = True) -> None:
+        if not openai_api_key or not openai_api_key.startswith('sk-'):
+            raise ValueError("OPENAI_API_KEY must be set to a valid OpenAI API key")
+        self.openai_api_key = openai_api_key
+        self.registry = registry or ResourceRegistry(
+            client_factory=functools.partial(QueryClients, batch_queries=batch)
+        )
+        self.search_batcher = MicroBatcher(search_stores_batch, name="search") if batch else None
+        self._summarizer = None
+        self._summarizer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.requests = {"ingest": 0, "ask": 0, "summarize": 0}
+
+    def _count(self, endpoint: str) -> None:
+        with self._stats_lock:
+            self.requests[endpoint] += 1
+
+    def _search(self, stores, query_vector: List[float], k: int):
+        return self.search_batcher((list(stores), query_vector, k))
+
+    def session(self) -> YoutubeQuery:
+        """Create a request-scoped session; call ``forget()`` on it when done"""
+        store_search = self._search if self.search_batcher is not None else search_stores
+        return YoutubeQuery(self.openai_api_key, self.registry, store_search=store_search)
+
+    async def _load(self, query: YoutubeQuery, urls: List[str]) -> None:
+        loop = asyncio.get_running_loop()
+        for url in urls:
+            # A video already held by the registry is a lookup; a new one is fetched and embedded
+            result = await loop.run_in_executor(None, query.ingest, url)
+            if result != "Success":
+                raise HTTPException(status_code=422, detail=result)
+
+    async def ingest(self, request: IngestRequest) -> dict:
+        self._count("ingest")
+        started = time.perf_counter()
+        query = self.session()
+        try:
+            await self._load(query, [request.url])
+        finally:
+            query.forget()
+        return {
+            "video_id": video_id_from_url(request.url),
+            "url": request.url,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    async def ask(self, request: AskRequest) -> dict:
+        self._count("ask")
+        started = time.perf_counter()
+        query = self.session()
+        try:
+            await self._load(query, request.videos)
+            video_ids = query.active_video_ids()
+            answer, sources = await query.aask_with_sources(request.question, raise_errors=True)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Error processing your question: {e}")
+        finally:
+            query.forget()
+        response = {
+            "answer": answer,
+            "sources": sources,
+            "video_ids": video_ids,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        # The ask ran in this request's task, so its trace is this task's last one
+        trace = last_trace()
+        if Config.DEBUG and trace is not None:
+            response["stages"] = trace.as_dict()["stages"]
+        return response
+
+    def _summarize(self, video_id: str) -> str:
+        from summarizer import build_summarizer, summarize_video
+
+        with self._summarizer_lock:
+            if self._summarizer is None:
+                self._summarizer = build_summarizer(self.openai_api_key)
+        return summarize_video(self._summarizer, video_id)
+
+    async def summarize(self, request: SummarizeRequest) -> dict:
+        from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+
+        self._count("summarize")
+        started = time.perf_counter()
+        video_id = video_id_from_url(request.url)
+        if video_id is None:
+            raise HTTPException(status_code=422, detail="Invalid YouTube URL format.")
+        loop = asyncio.get_running_loop()
+        try:
+            summary = await loop.run_in_executor(None, self._summarize, video_id)
+        except (NoTranscriptFound, TranscriptsDisabled):
+            summary = ""
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Error summarizing video: {e}")
+        if not summary:
+            raise HTTPException(status_code=404, detail="No transcript found for this video.")
+        return {
+            "video_id": video_id,
+            "summary": summary,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def stats(self) -> dict:
+        """Return request counts, shared resource usage and batching efficiency"""
+        embeddings = self.registry.clients(self.openai_api_key).embeddings
+        with self._stats_lock:
+            requests = dict(self.requests)
+        return {
+            "requests": requests,
+            "registry": self.registry.stats(),
+            "query_embedding_batches": query_batch_stats(embeddings),
+            "search_batches": self.search_batcher.stats() if self.search_batcher is not None else {},
+            "embedding_requests": embedding_batch_stats(embeddings),
+            "embedding_cache": embedding_cache_stats(embeddings),
+        }
+
+
+def pool_openai_connections(pool_size: int = Config.SERVICE_HTTP_POOL_SIZE):
+    """Route synchronous OpenAI calls through one pooled session; return an aiohttp session for async calls"""
+    import aiohttp
+    import openai
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    # By default each thread opens its own connections, and every async call a new ClientSession
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    openai.requestssession = session
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size))
+
+
+def create_app(service: Optional[QueryService] = None, pool_connections: bool = True) -> FastAPI:
+    """Build the FastAPI app, by default for the OPENAI_API_KEY in the environment"""
+    service = service or QueryService(os.environ.get("OPENAI_API_KEY"))
+    aiohttp_session = None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        nonlocal aiohttp_session
+        # Retrieval and ingest block, so they run on a pool sized for the expected concurrency
+        executor = ThreadPoolExecutor(max_workers=Config.SERVICE_WORKERS, thread_name_prefix="service")
+        asyncio.get_running_loop().set_default_executor(executor)
+        if pool_connections:
+            aiohttp_session = pool_openai_connections()
+        yield
+        if aiohttp_session is not None:
+            await aiohttp_session.close()
+        executor.shutdown(wait=False)
+
+    app = FastAPI(title=f"{Config.APP_NAME} query service", version=Config.APP_VERSION, lifespan=lifespan)
+    app.state.service = service
+
+    def use_pooled_session() -> None:
+        # openai keeps the async session in a context variable, which is per request task
+        if aiohttp_session is not None:
+            import openai
+
+            openai.aiosession.set(aiohttp_session)
+
+    @app.post("/ingest")
+    async def ingest(request: IngestRequest) -> dict:
+        use_pooled_session()
+        return await service.ingest(request)
+
+    @app.post("/ask")
+    async def ask(request: AskRequest) -> dict:
+        use_pooled_session()
+        return await service.ask(request)
+
+    @app.post("/summarize")
+    async def summarize(request: SummarizeRequest) -> dict:
+        use_pooled_session()
+        return await service.summarize(request)
+
+    @app.get("/stats")
+    async def stats() -> dict:
+        return service.stats()
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics() -> str:
+        return get_metrics().prometheus_text()
+
+    return app
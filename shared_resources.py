@@ -0,0 +1,174 @@
+"""
+Shared resources
+Clients and per-video indexes shared by every chat session in a process
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from langchain.chains.question_answering import load_qa_chain
+from langchain.llms import OpenAI
+
+from config import Config
+from embedders import build_embeddings
+from vectorstore import unload_video_store
+
+
+class QueryClients:
+    """Embeddings, LLMs and QA chains for one OpenAI API key"""
+
+    def __init__(self, openai_api_key: str, batch_queries: bool = False) -> None:
+        self.embeddings = build_embeddings(openai_api_key, batch_queries=batch_queries)
+        self.llm = OpenAI(temperature=0, max_tokens=Config.ANSWER_MAX_TOKENS, openai_api_key=openai_api_key)
+        self.streaming_llm = OpenAI(
+            temperature=0, max_tokens=Config.ANSWER_MAX_TOKENS, streaming=True, openai_api_key=openai_api_key
+        )
+        self.chain = load_qa_chain(self.llm, chain_type="stuff")
+        self.streaming_chain = load_qa_chain(self.streaming_llm, chain_type="stuff")
+
+
+class _VideoEntry:
+    def __init__(self, index, size_bytes: int) -> None:
+        self.index = index
+        self.size_bytes = size_bytes
+        self.refs = 0
+
+
+class _LoadSlot:
+    """Serializes loads of one video; dropped once no session is waiting on it"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.waiters = 0
+
+
+class ResourceRegistry:
+    """Reference-counted registry of per-video indexes plus per-key clients
+
+    Sessions ``acquire_video`` the indexes they chat with and
+    ``release_video`` them when done. Indexes no session holds stay loaded
+    for re-use until the total estimated size exceeds ``max_index_bytes``,
+    then the least recently released are evicted first. ``client_factory``
+    builds the clients for a new API key.
+
+    Estimated sizes only cover memory that eviction frees (see
+    ``vectorstore.video_store_unloadable``): with persistent Chroma the
+    budget applies to the keyword indexes alone.
+    """
+
+    def __init__(
+        self,
+        max_index_bytes: int = Config.SHARED_INDEX_MAX_MB * 1024 * 1024,
+        max_clients: int = Config.SHARED_CLIENTS_MAX,
+        client_factory: Callable[[str], QueryClients] = QueryClients,
+    ) -> None:
+        self.max_index_bytes = max_index_bytes
+        self.max_clients = max_clients
+        self.client_factory = client_factory
+        self._clients: "OrderedDict[str, QueryClients]" = OrderedDict()
+        self._videos: "OrderedDict[str, _VideoEntry]" = OrderedDict()
+        self._loading: Dict[str, _LoadSlot] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def clients(self, openai_api_key: str) -> QueryClients:
+        """Return the shared clients for an API key, creating them on first use"""
+        key = hashlib.sha256(openai_api_key.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._clients:
+                self._clients.move_to_end(key)
+                return self._clients[key]
+        clients = self.client_factory(openai_api_key)
+        with self._lock:
+            clients = self._clients.setdefault(key, clients)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return clients
+
+    def acquire_video(self, video_id: str, load: Callable[[str], Optional[object]]):
+        """Return the shared index of a video, loading it with ``load`` on first use
+
+        ``load`` returns an object with an ``estimated_bytes()`` method, or
+        None, in which case nothing is held and None is returned.
+        """
+        with self._lock:
+            slot = self._loading.setdefault(video_id, _LoadSlot())
+            slot.waiters += 1
+
+        try:
+            # Concurrent sessions asking for the same video wait for one load
+            with slot.lock:
+                with self._lock:
+                    entry = self._videos.get(video_id)
+                    if entry is not None:
+                        entry.refs += 1
+                        self._videos.move_to_end(video_id)
+                        return entry.index
+
+                index = load(video_id)
+                if index is None:
+                    return None
+
+                entry = _VideoEntry(index, index.estimated_bytes())
+                with self._lock:
+                    entry.refs = 1
+                    self._videos[video_id] = entry
+                    self._evict()
+                return index
+        finally:
+            with self._lock:
+                slot.waiters -= 1
+                if not slot.waiters:
+                    del self._loading[video_id]
+
+    def release_video(self, video_id: str) -> None:
+        """Drop one session's hold on a video index"""
+        with self._lock:
+            entry = self._videos.get(video_id)
+            if entry is None or entry.refs == 0:
+                return
+            entry.refs -= 1
+            # Recently released indexes are the last to be evicted
+            self._videos.move_to_end(video_id)
+            self._evict()
+
+    def release_videos(self, video_ids: Iterable[str]) -> None:
+        """Release several videos, e.g. when a session ends"""
+        for video_id in list(video_ids):
+            self.release_video(video_id)
+
+    def _evict(self) -> List[str]:
+        """Drop idle indexes, oldest first, until under the size budget (lock held)
+
+        Stores are unloaded before the lock is released, so a concurrent
+        ``acquire_video`` reloads a video instead of picking up a store that
+        is being dropped.
+        """
+        total = sum(entry.size_bytes for entry in self._videos.values())
+        evicted = []
+        for video_id in list(self._videos):
+            if total <= self.max_index_bytes:
+                break
+            entry = self._videos[video_id]
+            if entry.refs > 0:
+                continue
+            del self._videos[video_id]
+            unload_video_store(video_id)
+            total -= entry.size_bytes
+            evicted.append(video_id)
+        self.evictions += len(evicted)
+        return evicted
+
+    def stats(self) -> dict:
+        """Return counts of shared clients and indexes"""
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "videos": len(self._videos),
+                "videos_in_use": sum(1 for entry in self._videos.values() if entry.refs > 0),
+                "index_bytes": sum(entry.size_bytes for entry in self._videos.values()),
+                "evictions": self.evictions,
+            }
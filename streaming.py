@@ -0,0 +1,33 @@
+"""
+Streaming helpers
+LangChain callback handlers that forward LLM tokens to sync and async consumers
+"""
+
+import asyncio
+import queue
+from typing import Any
+
+from langchain.callbacks.base import AsyncCallbackHandler, BaseCallbackHandler
+
+# Marks the end of a token stream
+STREAM_END = object()
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Puts every new LLM token on a thread-safe queue"""
+
+    def __init__(self, tokens: queue.Queue) -> None:
+        self.tokens = tokens
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.tokens.put(token)
+
+
+class AsyncQueueCallbackHandler(AsyncCallbackHandler):
+    """Puts every new LLM token on an asyncio queue"""
+
+    def __init__(self, tokens: asyncio.Queue) -> None:
+        self.tokens = tokens
+
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        await self.tokens.put(token)
@@ -2,12 +2,24 @@ import os
 import tempfile
 import streamlit as st
 from streamlit_chat import message
+from metrics import debug_breakdown
+from shared_resources import ResourceRegistry
 from youtubequery import YoutubeQuery
 import re
 
 st.set_page_config(page_title="Youtube to Chatbot", page_icon="🎥")
 
 
+@st.cache_resource
+def get_registry() -> ResourceRegistry:
+    """Process-wide clients and video indexes shared by every browser session"""
+    return ResourceRegistry()
+
+
+def new_youtubequery(api_key: str) -> YoutubeQuery:
+    return YoutubeQuery(api_key, registry=get_registry())
+
+
 def is_valid_youtube_url(url):
     """Validate if the URL is a valid YouTube URL"""
     youtube_regex = r'(?:https?://)?(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]{11})'
@@ -34,15 +46,24 @@ def process_input():
             st.error("Please add a YouTube video first before asking questions.")
             return
             
-        with st.session_state["thinking_spinner"], st.spinner(f"Thinking..."):
-            try:
-                query_text = st.session_state["youtubequery"].ask(user_text)
-                st.session_state["messages"].append((user_text, True))
-                st.session_state["messages"].append((query_text, False))
-            except Exception as e:
-                st.error(f"Error processing your question: {str(e)}")
-                st.session_state["messages"].append((user_text, True))
-                st.session_state["messages"].append(("Sorry, I encountered an error while processing your question. Please try again.", False))
+        placeholder = st.session_state["thinking_spinner"]
+        try:
+            # Render tokens into the placeholder as they arrive
+            query_text = ""
+            for token in st.session_state["youtubequery"].stream_ask(user_text):
+                query_text += token
+                placeholder.markdown(query_text + "▌")
+            placeholder.empty()
+            st.session_state["messages"].append((user_text, True))
+            st.session_state["messages"].append((query_text, False))
+            breakdown = debug_breakdown()
+            if breakdown:
+                st.caption(breakdown)
+        except Exception as e:
+            placeholder.empty()
+            st.error(f"Error processing your question: {str(e)}")
+            st.session_state["messages"].append((user_text, True))
+            st.session_state["messages"].append(("Sorry, I encountered an error while processing your question. Please try again.", False))
 
 
 def ingest_input():
@@ -58,6 +79,12 @@ def ingest_input():
                 ingest_text = st.session_state["youtubequery"].ingest(url)
                 if ingest_text == "Success":
                     st.success("Video processed successfully! You can now ask questions about it.")
+                    cache_stats = st.session_state["youtubequery"].get_cache_stats()
+                    if cache_stats:
+                        st.caption(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+                    breakdown = debug_breakdown()
+                    if breakdown:
+                        st.caption(breakdown)
                     st.session_state["db_loaded"] = True
                     st.session_state["current_video"] = url
                 else:
@@ -79,7 +106,7 @@ def main():
         st.session_state["current_video"] = ""
         st.session_state["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY", "")
         if is_openai_api_key_set():
-            st.session_state["youtubequery"] = YoutubeQuery(st.session_state["OPENAI_API_KEY"])
+            st.session_state["youtubequery"] = new_youtubequery(st.session_state["OPENAI_API_KEY"])
         else:
             st.session_state["youtubequery"] = None
 
@@ -106,7 +133,9 @@ def main():
                 st.session_state["user_input"] = ""
                 st.session_state["input_url"] = ""
                 st.session_state["db_loaded"] = False
-                st.session_state["youtubequery"] = YoutubeQuery(st.session_state["OPENAI_API_KEY"])
+                if st.session_state["youtubequery"] is not None:
+                    st.session_state["youtubequery"].forget()
+                st.session_state["youtubequery"] = new_youtubequery(st.session_state["OPENAI_API_KEY"])
                 st.success("API key updated successfully!")
             else:
                 st.error("Invalid OpenAI API key format. Please check your key.")
@@ -114,13 +143,26 @@ def main():
     # URL Input Section
     st.subheader("📹 Add a YouTube Video")
     
-    if st.session_state.get("current_video"):
-        st.info(f"Currently loaded: {st.session_state['current_video']}")
-        if st.button("Load Different Video"):
-            st.session_state["db_loaded"] = False
-            st.session_state["current_video"] = ""
-            st.session_state["messages"] = []
-            st.rerun()
+    youtubequery = st.session_state["youtubequery"]
+    if youtubequery is not None and youtubequery.is_video_loaded():
+        loaded_videos = youtubequery.loaded_videos()
+        st.markdown("**Loaded videos**")
+        for video_id, video_url in loaded_videos.items():
+            url_column, remove_column = st.columns([5, 1])
+            url_column.write(video_url)
+            if remove_column.button("Remove", key=f"remove_{video_id}"):
+                youtubequery.remove_video(video_id)
+                st.session_state["db_loaded"] = youtubequery.is_video_loaded()
+                st.rerun()
+        
+        # Switching between loaded videos is instant: no re-ingest
+        selected = st.multiselect(
+            "Ask about",
+            options=list(loaded_videos),
+            default=youtubequery.active_video_ids(),
+            format_func=lambda video_id: loaded_videos[video_id],
+        )
+        youtubequery.select_videos(selected)
     
     url_input = st.text_input(
         "YouTube URL", 
@@ -136,11 +178,11 @@ def main():
 
     # Chat Section
     if st.session_state.get("db_loaded", False):
-        st.subheader("💬 Chat with the Video")
+        st.subheader("💬 Chat with the Videos")
         display_messages()
         
         user_input = st.text_input(
-            "Ask a question about the video", 
+            "Ask a question about the selected videos", 
             key="user_input", 
             disabled=not is_openai_api_key_set(),
             on_change=process_input,
@@ -156,9 +198,9 @@ def main():
     st.markdown("""
     ### How to use:
     1. Enter your OpenAI API key
-    2. Paste a YouTube video URL
+    2. Paste a YouTube video URL (add as many videos as you like)
     3. Wait for the video to be processed
-    4. Start asking questions about the video!
+    4. Choose which videos to ask about and start asking questions!
     
     **Note:** The video must have captions/transcripts available for this to work.
     """)
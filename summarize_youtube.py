@@ -4,13 +4,13 @@ YouTube Video Summarizer
 Summarize any YouTube video using AI
 """
 
+import argparse
+import atexit
 import os
 import sys
-from langchain.document_loaders import YoutubeLoader
-from langchain import OpenAI
-from langchain.chains.summarize import load_summarize_chain
-from langchain.text_splitter import CharacterTextSplitter
-from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+from config import Config
+from metrics import debug_breakdown, flush_metrics
+from transcript_segments import video_id_from_url
 import re
 
 def validate_youtube_url(url):
@@ -18,7 +18,83 @@ def validate_youtube_url(url):
     youtube_regex = r'(?:https?://)?(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]{11})'
     return bool(re.match(youtube_regex, url))
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize YouTube videos. Without --urls or --channel, runs interactively.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--urls", help="file with one YouTube URL per line (batch mode)")
+    source.add_argument("--channel", help="channel ID whose videos to summarize (batch mode)")
+    parser.add_argument("--workers", type=int, default=Config.SUMMARY_BATCH_WORKERS, help="videos summarized at once")
+    parser.add_argument("--output", help="JSONL file to write and resume from (default: under OUTPUT_DIR)")
+    return parser.parse_args(argv)
+
+def read_video_ids(path):
+    """Read video IDs from a file of URLs, skipping blank lines and # comments"""
+    video_ids = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            url = line.strip()
+            if not url or url.startswith("#"):
+                continue
+            if not validate_youtube_url(url):
+                print(f"⚠️  Skipping invalid URL: {url}")
+                continue
+            video_ids.append(video_id_from_url(url))
+    return video_ids
+
+def run_batch(args):
+    """Summarize a list of videos or a whole channel without prompting"""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key or not api_key.startswith('sk-'):
+        print("❌ Batch mode needs a valid OPENAI_API_KEY environment variable!")
+        sys.exit(1)
+    
+    if args.channel:
+        # Imported here so URL-file batches don't load the vector store stack
+        from chat_channel import channel_video_ids, validate_channel_id
+        if not validate_channel_id(args.channel):
+            print("❌ Invalid channel ID format!")
+            sys.exit(1)
+        video_ids = channel_video_ids(args.channel)
+        name = args.channel
+    else:
+        video_ids = read_video_ids(args.urls)
+        name = os.path.splitext(os.path.basename(args.urls))[0]
+    output_path = args.output or os.path.join(Config.SUMMARY_BATCH_DIR, f"{name}.jsonl")
+    
+    from summarizer import build_summarizer, summarize_video
+    from summary_batch import summarize_batch
+    summarizer = build_summarizer(api_key)
+    
+    def report_record(record):
+        if record["status"] == "ok":
+            print(f"✅ {record['url']} ({record['seconds']:.1f}s)")
+        elif record["status"] == "no_transcript":
+            print(f"⚠️  No transcript: {record['url']}")
+        else:
+            print(f"❌ {record['url']}: {record['error']}")
+    
+    print(f"📝 Summarizing into {output_path} with {args.workers} workers...")
+    report = summarize_batch(
+        video_ids,
+        lambda video_id: summarize_video(summarizer, video_id),
+        output_path,
+        workers=args.workers,
+        on_record=report_record,
+    )
+    print(report.report())
+    stats = summarizer.stats()
+    cache_hits = stats.get("cache", {}).get("hits", 0)
+    print(f"🤖 {stats['llm_calls']} LLM calls, {stats['retries']} retries, {cache_hits} cached chunk summaries")
+    if report.failed:
+        sys.exit(1)
+
 def main():
+    args = parse_args()
+    atexit.register(flush_metrics)
+    if args.urls or args.channel:
+        run_batch(args)
+        return
+    
     print("📝 YouTube Video Summarizer")
     print("=" * 40)
     
@@ -48,32 +124,28 @@ def main():
         print("❌ Invalid YouTube URL format!")
         sys.exit(1)
     
+    # The LLM stack is only imported once the input is known to be valid
+    from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+    from summarizer import build_summarizer, summarize_video
+    
     try:
-        # Initialize OpenAI
-        llm = OpenAI(temperature=0, openai_api_key=api_key)
+        summarizer = build_summarizer(api_key)
         
-        # Load video transcript
+        # Load the transcript and summarize it chunk by chunk
         print("\n🔄 Loading video transcript...")
-        loader = YoutubeLoader.from_youtube_url(url, add_video_info=False)
-        docs = loader.load()
+        print("🤖 Generating summary...")
+        summary = summarize_video(summarizer, video_id_from_url(url))
         
-        if not docs:
+        if not summary:
             print("❌ No transcript found for this video!")
             sys.exit(1)
         
-        # Split documents
-        print("📄 Processing transcript...")
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-        split_docs = text_splitter.split_documents(docs)
-        
-        if not split_docs:
-            print("❌ Failed to process transcript!")
-            sys.exit(1)
-        
-        # Create summarization chain
-        print("🤖 Generating summary...")
-        chain = load_summarize_chain(llm, chain_type="map_reduce")
-        summary = chain.run(split_docs)
+        stats = summarizer.stats()
+        cache_hits = stats.get("cache", {}).get("hits", 0)
+        print(f"✅ {stats['llm_calls']} LLM calls, {cache_hits} cached chunk summaries, {stats['reduce_levels']} reduce levels")
+        breakdown = debug_breakdown()
+        if breakdown:
+            print(f"⏱️  {breakdown}")
         
         # Display results
         print("\n" + "=" * 50)
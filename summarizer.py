@@ -0,0 +1,219 @@
+"""
+Summarizer
+Concurrent, hierarchical map-reduce summarization with cached per-chunk summaries
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from langchain.llms import OpenAI
+
+from config import Config
+from embedding_batcher import RateLimiter, is_retryable_error, pack_batches
+from metrics import count, in_current_trace, request_trace, span
+from token_budget import count_tokens
+from transcript_store import load_transcript
+
+MAP_PROMPT = """Write a concise summary of the following:
+
+
+"{text}"
+
+
+CONCISE SUMMARY:"""
+
+# Used both to merge groups of partial summaries and for the final summary
+REDUCE_PROMPT = MAP_PROMPT
+
+
+def _summary_key(model: str, prompt: str, text: str) -> str:
+    """Hash the model, prompt template and chunk text into a cache key"""
+    return hashlib.sha256(f"{model}\0{prompt}\0{text}".encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """SQLite store of per-chunk summaries keyed by (model, map prompt, chunk text)"""
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)", (key, summary))
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_shared_cache: Optional[SummaryCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> SummaryCache:
+    """Return the process-wide summary cache"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SummaryCache(Config.SUMMARY_CACHE_PATH)
+        return _shared_cache
+
+
+class SummarizationEngine:
+    """Map-reduce summarizer that maps chunks concurrently and reduces in token-bounded levels
+
+    ``llm(prompt)`` completes one prompt and returns text; a LangChain LLM
+    works, as does any callable. Map summaries are cached by chunk text, so
+    re-running with another ``reduce_prompt`` only repeats the reduce calls.
+    """
+
+    def __init__(
+        self,
+        llm: Callable[[str], str],
+        model_name: Optional[str] = None,
+        cache: Optional[SummaryCache] = None,
+        map_workers: int = Config.SUMMARY_MAP_WORKERS,
+        reduce_tokens: int = Config.SUMMARY_REDUCE_TOKENS,
+        requests_per_minute: float = Config.SUMMARY_REQUESTS_PER_MINUTE,
+        max_retries: int = Config.SUMMARY_MAX_RETRIES,
+        map_prompt: str = MAP_PROMPT,
+        reduce_prompt: str = REDUCE_PROMPT,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ) -> None:
+        self.llm = llm
+        # Summaries from another model must not be served from the cache
+        self.model_name = model_name or getattr(llm, "model_name", type(llm).__name__)
+        self.cache = cache
+        self.reduce_tokens = reduce_tokens
+        self.max_retries = max_retries
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.count_tokens = token_counter or count_tokens
+        self._limiter = RateLimiter(requests_per_minute)
+        self._executor = ThreadPoolExecutor(max_workers=map_workers, thread_name_prefix="summarize")
+        self._stats_lock = threading.Lock()
+        self.llm_calls = 0
+        self.retries = 0
+        self.reduce_levels = 0
+
+    def _complete(self, prompt: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            self._limiter.acquire()
+            try:
+                with span("llm"):
+                    text = self.llm(prompt)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e):
+                    raise
+                with self._stats_lock:
+                    self.retries += 1
+                # Exponential backoff with jitter
+                time.sleep(min(60.0, 2 ** attempt) * random.uniform(0.5, 1.5))
+        with self._stats_lock:
+            self.llm_calls += 1
+        count("prompt_tokens", self.count_tokens(prompt))
+        count("completion_tokens", self.count_tokens(text))
+        return text.strip()
+
+    def _map_one(self, text: str) -> str:
+        key = _summary_key(self.model_name, self.map_prompt, text)
+        if self.cache is not None:
+            summary = self.cache.get(key)
+            count("summary_cache_hits" if summary is not None else "summary_cache_misses")
+            if summary is not None:
+                return summary
+        summary = self._complete(self.map_prompt.format(text=text))
+        if self.cache is not None:
+            self.cache.put(key, summary)
+        return summary
+
+    def map(self, texts: List[str]) -> List[str]:
+        """Summarize every chunk, several at a time"""
+        return list(self._executor.map(in_current_trace(self._map_one), texts))
+
+    def _groups(self, summaries: List[str]) -> List[List[int]]:
+        """Group summaries so each group fits one reduce prompt"""
+        groups = pack_batches([self.count_tokens(summary) for summary in summaries], self.reduce_tokens, len(summaries))
+        if len(groups) == len(summaries) and len(summaries) > 1:
+            # Every summary is over budget on its own; pair them so each level still shrinks
+            groups = [list(range(i, min(i + 2, len(summaries)))) for i in range(0, len(summaries), 2)]
+        return groups
+
+    def reduce(self, summaries: List[str]) -> str:
+        """Merge summaries level by level until they fit one final prompt"""
+        groups = self._groups(summaries)
+        while len(groups) > 1:
+            with self._stats_lock:
+                self.reduce_levels += 1
+            prompts = [
+                self.reduce_prompt.format(text="\n\n".join(summaries[i] for i in group))
+                for group in groups
+            ]
+            summaries = list(self._executor.map(in_current_trace(self._complete), prompts))
+            groups = self._groups(summaries)
+        with self._stats_lock:
+            self.reduce_levels += 1
+        return self._complete(self.reduce_prompt.format(text="\n\n".join(summaries)))
+
+    def summarize(self, texts: List[str]) -> str:
+        """Summarize a sequence of chunks (e.g. a transcript split by tokens)"""
+        texts = [text for text in texts if text.strip()]
+        if not texts:
+            return ""
+        return self.reduce(self.map(texts))
+
+    def stats(self) -> dict:
+        """Return LLM call, retry and cache counters"""
+        with self._stats_lock:
+            stats = {"llm_calls": self.llm_calls, "retries": self.retries, "reduce_levels": self.reduce_levels}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+def build_summarizer(openai_api_key: Optional[str] = None) -> SummarizationEngine:
+    """Create a summarization engine backed by the OpenAI completion API"""
+    llm = OpenAI(temperature=0, max_tokens=Config.SUMMARY_MAX_TOKENS, openai_api_key=openai_api_key)
+    cache = get_summary_cache() if Config.SUMMARY_CACHE_ENABLED else None
+    return SummarizationEngine(llm, cache=cache)
+
+
+def summarize_video(engine: SummarizationEngine, video_id: str) -> str:
+    """Summarize a video's transcript, or return "" if it has none"""
+    with request_trace("summarize", video_id=video_id) as trace:
+        segments = load_transcript(video_id)
+        with span("split"):
+            chunks = segments.chunk(max_tokens=Config.SUMMARY_CHUNK_TOKENS)
+        summary = engine.summarize([chunk.page_content for chunk in chunks])
+        if not summary:
+            trace.status = "no_transcript"
+        return summary
@@ -0,0 +1,153 @@
+"""
+Batch summarization
+Summarize many videos concurrently into a resumable JSONL file
+"""
+
+import json
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Set
+
+from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+
+from config import Config
+from metrics import percentile
+
+
+def completed_video_ids(path: str) -> Set[str]:
+    """Return the videos a previous run already finished (summarized or without transcript)"""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a truncated last line
+                continue
+            if record.get("status") in ("ok", "no_transcript"):
+                done.add(record["video_id"])
+    return done
+
+
+def _open_output(path: str):
+    """Open a batch file for appending, starting on a fresh line after a truncated record"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    out = open(path, "a", encoding="utf-8")
+    if out.tell() > 0:
+        with open(path, "rb") as existing:
+            existing.seek(-1, os.SEEK_END)
+            if existing.read(1) != b"\n":
+                out.write("\n")
+    return out
+
+
+class BatchReport:
+    """Outcome of a batch run"""
+
+    def __init__(self) -> None:
+        self.summarized: List[str] = []
+        self.no_transcript: List[str] = []
+        self.failed: List[str] = []
+        self.resumed: List[str] = []
+        self.latencies: List[float] = []
+        self.wall_seconds = 0.0
+
+    @property
+    def videos_per_minute(self) -> float:
+        finished = len(self.summarized) + len(self.no_transcript) + len(self.failed)
+        return finished * 60.0 / self.wall_seconds if self.wall_seconds else 0.0
+
+    def report(self) -> str:
+        """Return a human readable throughput and latency summary"""
+        return (
+            f"summarized={len(self.summarized)} no_transcript={len(self.no_transcript)} "
+            f"failed={len(self.failed)} already_done={len(self.resumed)} "
+            f"in {self.wall_seconds:.1f}s ({self.videos_per_minute:.1f} videos/min)\n"
+            f"latency p50={percentile(self.latencies, 50):.1f}s "
+            f"p95={percentile(self.latencies, 95):.1f}s max={max(self.latencies, default=0.0):.1f}s"
+        )
+
+
+def summarize_batch(
+    video_ids: Iterable[str],
+    summarize: Callable[[str], str],
+    output_path: Optional[str],
+    workers: int = Config.SUMMARY_BATCH_WORKERS,
+    on_record: Optional[Callable[[dict], None]] = None,
+) -> BatchReport:
+    """Summarize videos on a worker pool, appending one JSON record per video
+
+    ``summarize(video_id)`` returns the summary, or "" when the video has no
+    transcript. Videos already finished in ``output_path`` are skipped, so
+    an interrupted run picks up where it stopped; failures are retried.
+    Without ``output_path`` records are only passed to ``on_record``.
+
+    ``video_ids`` is read lazily and at most two videos per worker are in
+    flight, so a large channel listing is neither held in memory nor
+    submitted to the rate limiter in one burst.
+    """
+    report = BatchReport()
+    started = time.perf_counter()
+    done = completed_video_ids(output_path) if output_path else set()
+
+    def work(video_id: str) -> dict:
+        video_started = time.perf_counter()
+        record = {"video_id": video_id, "url": f"https://www.youtube.com/watch?v={video_id}"}
+        try:
+            summary = summarize(video_id)
+            record["status"] = "ok" if summary else "no_transcript"
+            record["summary"] = summary
+        except (NoTranscriptFound, TranscriptsDisabled):
+            record["status"] = "no_transcript"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["seconds"] = round(time.perf_counter() - video_started, 3)
+        record["finished_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return record
+
+    def finish(record: dict, out) -> None:
+        if out is not None:
+            # One flushed line per video is the resume checkpoint
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+        status = record["status"]
+        if status == "ok":
+            report.summarized.append(record["video_id"])
+        elif status == "no_transcript":
+            report.no_transcript.append(record["video_id"])
+        else:
+            report.failed.append(record["video_id"])
+        report.latencies.append(record["seconds"])
+        if on_record is not None:
+            on_record(record)
+
+    output = _open_output(output_path) if output_path else nullcontext()
+    with output as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        seen: Set[str] = set()
+        in_flight = set()
+        for video_id in video_ids:
+            if video_id in seen:
+                continue
+            seen.add(video_id)
+            if video_id in done:
+                report.resumed.append(video_id)
+                continue
+            if len(in_flight) >= 2 * workers:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish(future.result(), out)
+            in_flight.add(executor.submit(work, video_id))
+
+        for future in wait(in_flight).done:
+            finish(future.result(), out)
+
+    report.wall_seconds = time.perf_counter() - started
+    return report
@@ -3,10 +3,21 @@
 Test script to verify the YouTube to Chatbot setup
 """
 
+import os
 import sys
 import importlib
+import subprocess
+from contextlib import contextmanager
 from config import Config
 
+# Command-line entry points must start without loading these stacks
+ENTRY_POINTS = ['chat_youtube', 'chat_channel', 'summarize_youtube', 'youtube_cli']
+HEAVY_MODULES = [
+    'langchain', 'chromadb', 'openai', 'numpy', 'tiktoken', 'torch',
+    'sentence_transformers', 'scrapetube', 'youtube_transcript_api',
+]
+IMPORT_TIME_BUDGET_SECONDS = 1.0
+
 def test_imports():
     """Test if all required packages can be imported"""
     required_packages = [
@@ -83,6 +94,806 @@ def test_youtube_url_validation():
         status = "✅" if result == expected else "❌"
         print(f"{status} {url}: {result} (expected {expected})")
 
+def measure_import(module):
+    """Import a module in a fresh interpreter; return (cumulative seconds, heavy modules loaded)"""
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative_us / 1e6, loaded
+
+def test_entry_point_import_time():
+    """Test that the command-line scripts start without importing heavy packages"""
+    print("\n⏱️  Testing entry point import time...")
+    
+    for module in ENTRY_POINTS:
+        seconds, loaded = measure_import(module)
+        status = "✅" if not loaded and seconds < IMPORT_TIME_BUDGET_SECONDS else "❌"
+        print(f"{status} {module}: {seconds * 1000:.0f} ms" + (f", loaded {', '.join(loaded)}" if loaded else ""))
+        assert not loaded, f"{module} imports {', '.join(loaded)} at startup"
+        assert seconds < IMPORT_TIME_BUDGET_SECONDS, f"{module} took {seconds:.2f}s to import"
+
+def test_embedding_cache():
+    """Test that cached embeddings are reused across instances and the least recently used are evicted"""
+    print("\n🗄️  Testing embedding cache...")
+    
+    import tempfile
+    import time
+    from benchmarks.fakes import FakeEmbeddings
+    from embedding_cache import CachedEmbeddings, EmbeddingCache
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "embeddings.sqlite3")
+        backend = FakeEmbeddings(dim=8, request_latency=0.0)
+        embeddings = CachedEmbeddings(backend, EmbeddingCache(path, max_entries=3), "fake")
+        first = embeddings.embed_documents(["alpha", "beta", "alpha"])
+        assert backend.requests == 1 and backend.texts == 2, "identical texts in one call are embedded once"
+        assert first[0] == first[2]
+        
+        # A second process reads the same file back
+        reopened = CachedEmbeddings(backend, EmbeddingCache(path, max_entries=3), "fake")
+        cached = reopened.embed_documents(["beta", "alpha"])
+        # Vectors are stored as float32
+        assert all(abs(a - b) < 1e-6 for got, want in zip(cached, [first[1], first[0]]) for a, b in zip(got, want))
+        assert backend.requests == 1
+        assert reopened.stats()["hits"] == 2
+        
+        # Another model never shares vectors
+        CachedEmbeddings(backend, reopened.cache, "other-model").embed_documents(["alpha"])
+        assert backend.requests == 2
+        
+        # "beta" was used least recently, so it is evicted first
+        time.sleep(0.01)
+        reopened.embed_documents(["alpha"])
+        reopened.embed_documents(["gamma"])
+        assert len(reopened.cache) == 3
+        assert reopened.cache.get_many("fake", ["alpha", "beta", "gamma"])[1] is None
+        assert reopened.cache.get_many("fake", ["alpha", "gamma"]) != [None, None]
+    print(f"✅ {backend.requests} backend requests for {backend.texts} texts, LRU eviction at capacity")
+
+def test_persistent_video_store():
+    """Test that a video's collection is reopened from disk without re-embedding, and dropped on delete"""
+    print("\n📦 Testing persistent video stores...")
+    
+    import tempfile
+    import pytest
+    pytest.importorskip("langchain")
+    pytest.importorskip("chromadb")
+    import vectorstore
+    from benchmarks.fakes import FakeDocument, FakeEmbeddings
+    
+    saved = Config.VECTOR_STORE_DIR, Config.VECTOR_STORE_TYPE
+    with tempfile.TemporaryDirectory() as directory:
+        Config.VECTOR_STORE_DIR, Config.VECTOR_STORE_TYPE = directory, "chroma"
+        try:
+            backend = FakeEmbeddings(dim=8, request_latency=0.0)
+            store = vectorstore.open_video_store("videoAAAAAA", backend)
+            documents = [FakeDocument(f"chunk {i} about topic {i}", {"source": "videoAAAAAA"}) for i in range(5)]
+            vectorstore.add_video_documents(store, "videoAAAAAA", documents)
+            assert backend.requests == 1
+            
+            # A fresh client (as in a new process) reads the persisted collection
+            vectorstore._clients.clear()
+            reopened = vectorstore.open_video_store("videoAAAAAA", backend)
+            assert vectorstore.store_size(reopened) == 5 and backend.requests == 1
+            (nearest,) = reopened.similarity_search_by_vector(backend.embed_query("chunk 3 about topic 3"), k=1)
+            assert nearest.page_content == "chunk 3 about topic 3" and nearest.metadata["video_id"] == "videoAAAAAA"
+            assert vectorstore.store_size(vectorstore.open_video_store("videoBBBBBB", backend)) == 0
+            
+            vectorstore.delete_video_store("videoAAAAAA")
+            assert vectorstore.store_size(vectorstore.open_video_store("videoAAAAAA", backend)) == 0
+        finally:
+            Config.VECTOR_STORE_DIR, Config.VECTOR_STORE_TYPE = saved
+            vectorstore._clients.clear()
+    print("✅ Collection reopened without re-embedding, deleted on request")
+
+def test_embedding_batcher():
+    """Test token-packed batching, order across parallel batches and retry of rate-limited requests"""
+    print("\n📨 Testing embedding batcher...")
+    
+    import embedding_batcher
+    from benchmarks.fakes import FakeEmbeddings, fake_vector
+    
+    assert embedding_batcher.pack_batches([40, 40, 40, 10, 90], max_tokens=100, max_size=10) == [[0, 1], [2, 3], [4]]
+    assert embedding_batcher.pack_batches([1] * 5, max_tokens=100, max_size=2) == [[0, 1], [2, 3], [4]]
+    
+    class RateLimited(Exception):
+        http_status = 429
+    
+    backend = FakeEmbeddings(dim=4, request_latency=0.0)
+    failures = [RateLimited(), RateLimited()]
+    
+    def flaky(texts):
+        if failures:
+            raise failures.pop()
+        return backend.embed_documents(texts)
+    
+    texts = [" ".join(["word"] * n) for n in (30, 30, 30, 60, 5)]
+    batcher = embedding_batcher.BatchedEmbeddings(
+        flaky, max_batch_tokens=64, max_batch_size=8, max_concurrency=3, requests_per_minute=6000,
+        tokens_per_minute=10 ** 6, max_retries=3, token_counter=lambda text: len(text.split()),
+    )
+    uniform = embedding_batcher.random.uniform
+    embedding_batcher.random.uniform = lambda low, high: 0.0  # no backoff sleeps in the test
+    try:
+        vectors = batcher.embed_documents(texts)
+        failures.append(ValueError("bad input"))
+        try:
+            batcher.embed_documents(["x"])
+            raise AssertionError("a non-retryable error must not be retried")
+        except ValueError:
+            pass
+    finally:
+        embedding_batcher.random.uniform = uniform
+    
+    assert vectors == [fake_vector(text, 4) for text in texts], "vectors come back in input order"
+    stats = batcher.stats()
+    assert stats["requests"] == 4 and stats["retries"] == 2 and stats["tokens"] == 155, stats
+    print(f"✅ {len(texts)} texts in {stats['requests']} requests after {stats['retries']} retries")
+
+def test_local_embeddings():
+    """Test that the local backend encodes through one shared model and gets its own index namespace"""
+    print("\n🖥️  Testing local embedding backend...")
+    
+    import pytest
+    np = pytest.importorskip("numpy")
+    import local_embeddings
+    from benchmarks.fakes import fake_vector
+    from embedders import build_embeddings
+    
+    class FakeSentenceTransformer:
+        """Stand-in for a loaded sentence-transformers model"""
+        
+        def __init__(self):
+            self.calls = []
+        
+        def encode(self, texts, batch_size, show_progress_bar, convert_to_numpy, normalize_embeddings):
+            self.calls.append((len(texts), batch_size, normalize_embeddings))
+            return np.array([fake_vector(text, 4) for text in texts])
+    
+    model = FakeSentenceTransformer()
+    saved = Config.EMBEDDING_BACKEND, Config.EMBEDDING_CACHE_ENABLED, Config.LOCAL_EMBEDDING_THREADS
+    local_embeddings._models[f"{Config.LOCAL_EMBEDDING_MODEL}@cpu"] = model
+    try:
+        Config.EMBEDDING_BACKEND = "openai"
+        openai_namespace = Config.index_namespace()
+        Config.EMBEDDING_BACKEND, Config.EMBEDDING_CACHE_ENABLED, Config.LOCAL_EMBEDDING_THREADS = "local", False, 0
+        first, second = build_embeddings(), build_embeddings()
+        vectors = first.embed_documents(["alpha", "beta"])
+        assert second.embed_query("alpha") == vectors[0]
+        assert first.embed_documents([]) == []
+        assert model.calls == [(2, Config.LOCAL_EMBEDDING_BATCH_SIZE, True), (1, Config.LOCAL_EMBEDDING_BATCH_SIZE, True)]
+        # Vectors of another model must never be searched with local ones
+        assert Config.index_namespace() != openai_namespace
+    finally:
+        Config.EMBEDDING_BACKEND, Config.EMBEDDING_CACHE_ENABLED, Config.LOCAL_EMBEDDING_THREADS = saved
+        local_embeddings._models.clear()
+    print(f"✅ One shared model served {len(model.calls)} encode calls")
+
+def test_segment_chunking():
+    """Test that chunks follow segment boundaries, carry their time range and cite sources in time order"""
+    print("\n⏱️  Testing timestamped segment chunking...")
+    
+    import pytest
+    pytest.importorskip("langchain")
+    from benchmarks.fakes import FakeDocument
+    from transcript_segments import TranscriptSegments, source_timestamps
+    
+    entries = [{"text": f"segment {i} says  words\n", "start": 5.0 * i, "duration": 4.0} for i in range(6)]
+    entries.insert(3, {"text": "  ", "start": 14.0, "duration": 1.0})
+    segments = TranscriptSegments.from_entries("videoAAAAAA", entries, "en")
+    assert len(segments) == 6 and segments.segment_text(2) == "segment 2 says words"
+    assert TranscriptSegments.from_dict(segments.to_dict()).full_text() == segments.full_text()
+    
+    words = lambda text: len(text.split())
+    chunks = segments.chunk(max_tokens=10, overlap_tokens=0, count_tokens=words)
+    assert [chunk.page_content for chunk in chunks] == [
+        "segment 0 says words segment 1 says words",
+        "segment 2 says words segment 3 says words",
+        "segment 4 says words segment 5 says words",
+    ]
+    assert [(chunk.metadata["start"], chunk.metadata["end"]) for chunk in chunks] == [(0.0, 9.0), (10.0, 19.0), (20.0, 29.0)]
+    assert all(chunk.metadata["video_id"] == "videoAAAAAA" for chunk in chunks)
+    # Overlap repeats whole trailing segments of the previous chunk
+    overlapping = segments.chunk(max_tokens=10, overlap_tokens=4, count_tokens=words)
+    assert [chunk.metadata["start"] for chunk in overlapping] == [0.0, 5.0, 10.0, 15.0, 20.0]
+    
+    retrieved = [
+        FakeDocument("b", {"video_id": "videoAAAAAA", "start": 3725.0, "end": 3730.0}),
+        FakeDocument("a", {"video_id": "videoAAAAAA", "start": 10.0, "end": 19.0}),
+        FakeDocument("a", {"video_id": "videoAAAAAA", "start": 10.4, "end": 19.0}),
+    ]
+    sources = source_timestamps(retrieved)
+    assert [source["timestamp"] for source in sources] == ["0:10", "1:02:05"]
+    assert sources[1]["url"] == "https://www.youtube.com/watch?v=videoAAAAAA&t=3725s"
+    print(f"✅ {len(chunks)} segment-aligned chunks, sources {', '.join(source['timestamp'] for source in sources)}")
+
+@contextmanager
+def offline_backends(transcript_words=600, store_type="numpy"):
+    """Point stores and caches at a scratch directory and transcripts and tokens at local fakes; yield fake embeddings"""
+    import tempfile
+    import token_budget
+    import transcript_store
+    from benchmarks import bench_suite
+    from benchmarks.fakes import FakeEmbeddings, FixtureTranscripts
+    
+    saved_config = {name: value for name, value in vars(Config).items() if name.isupper()}
+    saved = token_budget.get_encoding, transcript_store.fetch_segments
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            bench_suite.use_workdir(directory, store_type)
+            bench_suite.use_tokenizer("words")
+            bench_suite.use_transcripts(FixtureTranscripts(words=transcript_words))
+            yield FakeEmbeddings(dim=16, request_latency=0.0)
+        finally:
+            for name, value in saved_config.items():
+                setattr(Config, name, value)
+            token_budget.get_encoding, transcript_store.fetch_segments = saved
+            transcript_store._shared_store = None
+
+def test_streaming_ask():
+    """Test that sync, async and streamed answers agree, tokens arrive one by one and sources follow them"""
+    print("\n🌊 Testing async and streaming ask...")
+    
+    import asyncio
+    import pytest
+    pytest.importorskip("langchain")
+    pytest.importorskip("numpy")
+    from benchmarks.fake_llm import ANSWER, FakeClients
+    from benchmarks.fakes import fixture_questions
+    from shared_resources import ResourceRegistry
+    from youtubequery import YoutubeQuery
+    
+    async def collect(tokens):
+        return [token async for token in tokens]
+    
+    with offline_backends() as embeddings:
+        registry = ResourceRegistry(client_factory=lambda key: FakeClients(embeddings, llm_latency=0.0))
+        query = YoutubeQuery("sk-fake", registry=registry)
+        assert query.ingest("https://www.youtube.com/watch?v=videoAAAAAA") == "Success"
+        question = fixture_questions(1)[0]
+        
+        answer, sources = query.ask_with_sources(question, raise_errors=True)
+        assert answer == ANSWER and sources
+        assert asyncio.run(query.aask_with_sources(question, raise_errors=True)) == (answer, sources)
+        for tokens in (list(query.stream_ask(question)), asyncio.run(collect(query.astream_ask(question)))):
+            assert len(tokens) == len(ANSWER.split()) + 1, tokens
+            assert "".join(tokens[:-1]) == ANSWER
+            assert tokens[-1] == query.format_answer("", sources)
+        assert list(query.stream_ask(" ")) == ["Please provide a question to ask."]
+    print(f"✅ {len(tokens) - 1} streamed tokens, then {len(sources)} sources")
+
+def test_shared_registry():
+    """Test that concurrent sessions load a video once and idle indexes are evicted over the budget"""
+    print("\n🤝 Testing shared index registry...")
+    
+    import threading
+    import time
+    import pytest
+    pytest.importorskip("langchain")
+    from shared_resources import ResourceRegistry
+    
+    class Index:
+        def __init__(self, video_id):
+            self.video_id = video_id
+        
+        def estimated_bytes(self):
+            return 100
+    
+    loads = []
+    
+    def load(video_id):
+        loads.append(video_id)
+        time.sleep(0.05)
+        return Index(video_id) if video_id != "videoNOSUBS" else None
+    
+    with offline_backends():
+        registry = ResourceRegistry(max_index_bytes=250, max_clients=2, client_factory=lambda key: object())
+        indexes = []
+        threads = [
+            threading.Thread(target=lambda: indexes.append(registry.acquire_video("videoAAAAAA", load)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert loads == ["videoAAAAAA"] and len({id(index) for index in indexes}) == 1
+        assert registry.acquire_video("videoNOSUBS", load) is None
+        
+        # Held indexes are kept even over budget; released ones go oldest first
+        for video_id in ("videoBBBBBB", "videoCCCCCC"):
+            registry.acquire_video(video_id, load)
+        assert registry.stats()["videos"] == 3 and registry.evictions == 0
+        registry.release_video("videoBBBBBB")
+        assert registry.stats()["videos"] == 2 and registry.evictions == 1
+        registry.release_videos(["videoAAAAAA"] * 8)
+        assert registry.stats()["videos_in_use"] == 1
+        
+        assert registry.clients("sk-one") is registry.clients("sk-one")
+        registry.clients("sk-two")
+        registry.clients("sk-three")
+        assert registry.stats()["clients"] == 2
+    print(f"✅ 8 sessions shared one load; {registry.evictions} idle index evicted over budget")
+
+def test_hierarchical_summarizer():
+    """Test that summaries are reduced level by level within the prompt budget and chunk summaries are cached"""
+    print("\n📝 Testing hierarchical summarization...")
+    
+    import tempfile
+    import threading
+    import pytest
+    pytest.importorskip("langchain")
+    from summarizer import SummarizationEngine, SummaryCache
+    
+    prompts = []
+    lock = threading.Lock()
+    
+    def llm(prompt):
+        with lock:
+            prompts.append(prompt)
+        return " short partial summary "
+    
+    words = lambda text: len(text.split())
+    chunks = [" ".join([f"chunk{i}"] * 20) for i in range(8)] + ["   "]
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SummaryCache(os.path.join(directory, "summaries.sqlite3"))
+        engine = SummarizationEngine(llm, "fake", cache, map_workers=4, reduce_tokens=7, token_counter=words)
+        assert engine.summarize(chunks) == "short partial summary"
+        # 8 map calls, then 8 -> 4 -> 2 summaries before the final merge
+        assert engine.stats()["llm_calls"] == 15 and engine.stats()["reduce_levels"] == 3
+        # Every reduce prompt holds at most two summaries of three words
+        reduce_prompts = [prompt for prompt in prompts if "chunk" not in prompt]
+        assert all(prompt.count("short partial summary") <= 2 for prompt in reduce_prompts)
+        
+        prompts.clear()
+        rerun = SummarizationEngine(llm, "fake", cache, map_workers=4, reduce_tokens=7, token_counter=words)
+        rerun.summarize(chunks)
+        assert len(prompts) == 7 and not any("chunk" in prompt for prompt in prompts), "map summaries come from the cache"
+        assert cache.stats()["hits"] == 8
+        
+        # Another model never reuses them
+        SummarizationEngine(llm, "other", cache, reduce_tokens=7, token_counter=words).summarize(chunks[:1])
+        assert any("chunk0" in prompt for prompt in prompts)
+    print(f"✅ {engine.stats()['reduce_levels']} reduce levels, {cache.stats()['hits']} cached chunk summaries reused")
+
+def test_batch_summaries():
+    """Test that a batch run appends one JSONL record per video and a re-run only retries what isn't done"""
+    print("\n📚 Testing resumable batch summarization...")
+    
+    import json
+    import tempfile
+    import threading
+    import pytest
+    pytest.importorskip("youtube_transcript_api")
+    from summary_batch import completed_video_ids, summarize_batch
+    
+    calls = []
+    failed_once = []
+    listed = [0]
+    ahead_most = [0]
+    lock = threading.Lock()
+    
+    def summarize(video_id):
+        with lock:
+            calls.append(video_id)
+        if video_id == "videoBROKEN" and not failed_once:
+            failed_once.append(video_id)
+            raise RuntimeError("rate limited")
+        return "" if video_id == "videoNOSUBS" else f"summary of {video_id}"
+    
+    def listing(video_ids):
+        for video_id in video_ids:
+            # Videos are listed lazily: at most two per worker (of 2) are in flight
+            with lock:
+                ahead = listed[0] - len(calls)
+            listed[0] += 1
+            ahead_most[0] = max(ahead_most[0], ahead)
+            yield video_id
+    
+    video_ids = [f"video{i:06d}" for i in range(12)] + ["videoBROKEN", "videoNOSUBS", "video000000"]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "batch.jsonl")
+        report = summarize_batch(listing(video_ids), summarize, path, workers=2)
+        assert len(report.summarized) == 12 and report.no_transcript == ["videoNOSUBS"] and report.failed == ["videoBROKEN"]
+        assert ahead_most[0] <= 2 * 2
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == 14 and {record["status"] for record in records} == {"ok", "no_transcript", "error"}
+        assert all(record["url"].endswith(record["video_id"]) for record in records)
+        
+        # A crash mid-write leaves a truncated line; the re-run only retries the failure
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"video_id": "video0000')
+        assert completed_video_ids(path) == set(video_ids) - {"videoBROKEN"}
+        calls.clear()
+        listed[0] = 0
+        rerun = summarize_batch(listing(video_ids), summarize, path, workers=2)
+        assert calls == ["videoBROKEN"] and rerun.summarized == ["videoBROKEN"] and len(rerun.resumed) == 13
+        assert "videoBROKEN" in completed_video_ids(path)
+    print(f"✅ {len(records)} records, re-run resumed {len(rerun.resumed)} and retried {len(rerun.summarized)}")
+
+def test_hybrid_retrieval():
+    """Test BM25 ranking, reciprocal rank fusion and the keyword shortcut that skips vector search"""
+    print("\n🔎 Testing hybrid retrieval...")
+    
+    from benchmarks.fakes import FakeDocument
+    from keyword_index import BM25Index, exact_terms, hybrid_search, reciprocal_rank_fusion
+    
+    documents = [
+        FakeDocument(text, {"video_id": "videoAAAAAA", "start": float(i)})
+        for i, text in enumerate([
+            "the model trains on a gpu cluster",
+            "we compare the model with the baseline model",
+            "Kubernetes 1.29 ships sidecar containers",
+            "cooking pasta takes ten minutes",
+        ])
+    ]
+    index = BM25Index(documents)
+    assert [document.metadata["start"] for _, document in index.search("model", 3)] == [1.0, 0.0]
+    assert index.search("the of and", 3) == [], "stopwords never match"
+    assert exact_terms('What changed in Kubernetes 1.29 about "sidecar containers"?') == [
+        "sidecar", "containers", "kubernetes", "1.29",
+    ]
+    
+    # Documents ranked well by both lists come first
+    fused = reciprocal_rank_fusion([[documents[0], documents[1]], [documents[1], documents[2]]], k=3)
+    assert fused == [documents[1], documents[0], documents[2]]
+    
+    searches = []
+    
+    def vector_search(query, k):
+        searches.append(query)
+        return [documents[3], documents[0]]
+    
+    stats = {}
+    hits = hybrid_search([index], "What is new in Kubernetes 1.29?", vector_search, k=2, stats=stats)
+    assert hits[0] is documents[2] and not searches, "exact terms found by BM25 skip the embedding"
+    hits = hybrid_search([index], "how long does dinner take", vector_search, k=2, stats=stats)
+    assert hits == [documents[3], documents[0]] and searches == ["how long does dinner take"]
+    assert stats == {"keyword_only": 1, "fused": 1}
+    print(f"✅ BM25 + RRF fusion, {stats['keyword_only']} query answered from keywords alone")
+
+def test_cli_records():
+    """Test that the CLI reads plain and JSON questions and writes one JSON line per answer"""
+    print("\n🖥️  Testing CLI records...")
+    
+    import io
+    import json
+    from contextlib import redirect_stderr, redirect_stdout
+    from youtube_cli import answer_questions, read_questions
+    
+    questions = list(read_questions([
+        "What is the talk about?",
+        '{"id": "q-2", "question": "Who is the speaker?"}',
+        '{"text": "not a question"}',
+        "What is the weather?",
+    ]))
+    assert questions == [
+        (0, "What is the talk about?"),
+        ("q-2", "Who is the speaker?"),
+        (2, '{"text": "not a question"}'),
+        (3, "What is the weather?"),
+    ]
+    
+    def answer(question):
+        if "weather" in question:
+            return None, []
+        if "not a question" in question:
+            raise RuntimeError("LLM unavailable")
+        return f"Answer to {question}", [{"video_id": "videoAAAAAA", "start": 12.0}]
+    
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        failed = answer_questions(iter(questions), answer, workers=2)
+    records = {record["id"]: record for record in map(json.loads, stdout.getvalue().splitlines())}
+    assert failed == 1 and len(records) == 4
+    assert records[0]["status"] == "ok" and records[0]["sources"][0]["start"] == 12.0
+    assert records["q-2"]["answer"] == "Answer to Who is the speaker?"
+    assert records[2]["status"] == "error" and records[2]["error"] == "LLM unavailable"
+    assert records[3]["status"] == "no_context" and records[3]["answer"] is None
+    assert all(isinstance(record["seconds"], float) for record in records.values())
+    assert "4 questions (1 failed)" in stderr.getvalue(), "the summary goes to stderr, not stdout"
+    print(f"✅ {len(records)} JSONL records: ok, no_context and error statuses")
+
+def test_micro_batching():
+    """Test that concurrent query embeddings are coalesced into batched requests"""
+    print("\n📦 Testing micro-batching...")
+    
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from benchmarks.fakes import FakeEmbeddings, fake_vector
+    from micro_batcher import MicroBatcher, MicroBatchedEmbeddings
+    
+    fake = FakeEmbeddings(dim=16, request_latency=0.01)
+    embeddings = MicroBatchedEmbeddings(
+        fake, MicroBatcher(fake.embed_documents, window=0.05, max_size=4, name="test-embed")
+    )
+    questions = [f"question {i}" for i in range(8)]
+    start = threading.Barrier(len(questions))
+    
+    def embed(question):
+        start.wait()
+        return embeddings.embed_query(question)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=len(questions)) as executor:
+            vectors = list(executor.map(embed, questions))
+        stats = embeddings.stats()
+    finally:
+        embeddings.batcher.close()
+    assert vectors == [fake_vector(question, 16) for question in questions], "each caller gets its own vector"
+    assert stats["items"] == 8 and stats["largest_batch"] <= 4, "batches close at max_size"
+    assert fake.requests == stats["batches"] <= 3, "concurrent queries share requests"
+    
+    # A failed batch fails every item in it, not just the first
+    def fail(items):
+        raise RuntimeError("embedding service unavailable")
+    
+    batcher = MicroBatcher(fail, window=0.05, name="test-fail")
+    try:
+        futures = [batcher.submit(i) for i in range(3)]
+        assert all(isinstance(future.exception(timeout=5), RuntimeError) for future in futures)
+    finally:
+        batcher.close()
+    print(f"✅ 8 concurrent queries embedded in {fake.requests} requests")
+
+def test_request_metrics():
+    """Test that request traces feed the per-request breakdown and the Prometheus export"""
+    print("\n📈 Testing request metrics...")
+    
+    import metrics
+    
+    enabled = Config.METRICS_ENABLED
+    Config.METRICS_ENABLED = False  # keep the test from writing to LOG_DIR
+    try:
+        try:
+            with metrics.request_trace("ask", videos=1) as trace:
+                with metrics.span("retrieval"):
+                    metrics.count("answer_cache_misses")
+                with metrics.span("llm"):
+                    raise RuntimeError("LLM unavailable")
+        except RuntimeError:
+            pass
+    finally:
+        Config.METRICS_ENABLED = enabled
+    
+    assert metrics.last_trace() is trace
+    assert trace.status == "error" and set(trace.stages) == {"retrieval", "llm"}
+    assert trace.counters == {"answer_cache_misses": 1}
+    text = metrics.get_metrics().prometheus_text()
+    assert 'youtube_chatbot_request_seconds_count{kind="ask",status="error"}' in text
+    assert 'youtube_chatbot_cache_hit_ratio{cache="answer_cache"} 0.0000' in text
+    print(f"✅ {trace.breakdown()}")
+
+def test_answer_cache():
+    """Test exact and semantic answer reuse, scoped to the videos, index namespace and model"""
+    print("\n💾 Testing answer cache...")
+    
+    import pytest
+    pytest.importorskip("numpy")
+    from answer_cache import AnswerCache, normalize_question
+    from config import Config
+    
+    vectors = {"what is a matrix": [1.0, 0.0], "what s a matrix exactly": [0.99, 0.1], "how do i cook pasta": [0.0, 1.0]}
+    embed_query = lambda text: vectors[normalize_question(text)]
+    cache = AnswerCache(max_entries=2, similarity_threshold=0.9)
+    cache.put("videoAAAAAA", "What is a matrix?", "a grid", embed_query)
+    assert cache.get("videoAAAAAA", "what is a MATRIX") == "a grid"
+    assert cache.get("videoAAAAAA", "what s a matrix exactly", embed_query) == "a grid"
+    assert cache.get("videoAAAAAA", "how do i cook pasta", embed_query) is None
+    assert cache.get("videoBBBBBB", "what is a matrix", embed_query) is None
+    
+    # Another model or chunking never reuses an answer
+    model = Config.OPENAI_MODEL
+    Config.OPENAI_MODEL = "another-model"
+    try:
+        assert cache.get("videoAAAAAA", "what is a matrix") is None
+    finally:
+        Config.OPENAI_MODEL = model
+    
+    # Re-indexing a video drops answers drawn from it, alone or with other videos
+    cache.put("videoAAAAAA,videoBBBBBB", "how do i cook pasta", "boil it", embed_query)
+    cache.invalidate("videoBBBBBB")
+    assert cache.get("videoAAAAAA,videoBBBBBB", "how do i cook pasta", embed_query) is None
+    assert cache.get("videoAAAAAA", "what is a matrix") == "a grid"
+    
+    # Evicted questions leave the semantic tier too
+    cache.put("videoAAAAAA", "how do i cook pasta", "boil it", embed_query)
+    cache.put("videoCCCCCC", "how do i cook pasta", "boil it", embed_query)
+    assert cache.get("videoAAAAAA", "what s a matrix exactly", embed_query) is None
+    stats = cache.stats()
+    assert stats["exact_hits"] == 2 and stats["semantic_hits"] == 1 and stats["entries"] == 2
+    print(f"✅ {stats['exact_hits']} exact and {stats['semantic_hits']} semantic hits, scopes kept apart")
+
+def test_transcript_store_languages():
+    """Test that a transcript stored under its own language is found through the preference list"""
+    print("\n🌐 Testing transcript store languages...")
+    
+    import tempfile
+    from transcript_segments import TranscriptSegments
+    from transcript_store import TranscriptStore
+    
+    with tempfile.TemporaryDirectory() as directory:
+        store = TranscriptStore(directory)
+        entries = [{"text": "hallo zusammen", "start": 0.0, "duration": 2.0}]
+        store.put(TranscriptSegments.from_entries("videoAAAAAA", entries, "de"))
+        assert store.get("videoAAAAAA", ["en"]) is None
+        segments = store.get("videoAAAAAA", ["en", "de"])
+        assert segments is not None and segments.language == "de"
+        assert store.stats() == {"hits": 1, "misses": 1}
+    print("✅ Transcript found under its fetched language")
+
+class FakeChunk:
+    """Stand-in for a LangChain Document"""
+    
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+class FakeChunkStore:
+    """Dict-backed stand-in for vectorstore.ChunkStore"""
+    
+    def __init__(self):
+        self.rows = {}
+    
+    def add(self, ids, documents, vectors):
+        for chunk_id, document, vector in zip(ids, documents, vectors):
+            self.rows[chunk_id] = {"embedding": vector, "metadata": dict(document.metadata), "document": document.page_content}
+    
+    def update_metadatas(self, metadatas):
+        for chunk_id, metadata in metadatas.items():
+            self.rows[chunk_id]["metadata"] = dict(metadata)
+    
+    def delete_video(self, video_id):
+        for chunk_id in [i for i, row in self.rows.items() if row["metadata"]["video_id"] == video_id]:
+            del self.rows[chunk_id]
+
+def test_chunk_dedup():
+    """Test that near-duplicate chunks collapse across videos, cap their references and survive their owner's removal"""
+    print("\n🧬 Testing chunk deduplication...")
+    
+    import tempfile
+    import chunk_dedup
+    from transcript_segments import chunk_references
+    
+    class Embeddings:
+        def embed_documents(self, texts):
+            return [[float(len(text)), 1.0] for text in texts]
+    
+    intro = ("welcome back to the channel today we are going to talk about something "
+             "really interesting so stay tuned and remember to subscribe")
+    bodies = {
+        "videoAAAAAA": "the first video explains linear algebra with matrices and eigenvalues in depth",
+        "videoBBBBBB": "the second video covers cooking fresh pasta with garlic and olive oil",
+        "videoCCCCCC": "the third video reviews a mountain bike on rocky trails in the rain",
+        "videoDDDDDD": "the fourth video teaches the basics of playing chess openings well",
+    }
+    
+    def ingest(dedup, video_id, body):
+        chunks = [
+            FakeChunk(intro, {"source": video_id, "start": 0.0, "end": 10.0}),
+            FakeChunk(body, {"source": video_id, "start": 10.0, "end": 60.0}),
+        ]
+        new, signatures = dedup.select_new(video_id, chunks)
+        vectors = dict(zip(map(id, new), Embeddings().embed_documents([chunk.page_content for chunk in new])))
+        dedup.add_video(video_id, chunks, [vectors.get(id(chunk)) for chunk in chunks], signatures)
+    
+    store = FakeChunkStore()
+    count_tokens = chunk_dedup.count_tokens
+    chunk_dedup.count_tokens = lambda text: len(text.split())  # keep the test free of tiktoken
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/channel/dedup.sqlite3"
+        dedup = chunk_dedup.ChunkDeduplicator(store, Embeddings(), path, references_per_chunk=2)
+        try:
+            for video_id, body in bodies.items():
+                ingest(dedup, video_id, body)
+        finally:
+            chunk_dedup.count_tokens = count_tokens
+        
+        rows = store.rows
+        assert len(rows) == 5, sorted(rows)
+        shared = [row for row in rows.values() if row["document"] == intro]
+        assert len(shared) == 1 and shared[0]["metadata"]["video_id"] == "videoAAAAAA"
+        # Only the first references are stored on the chunk, next to how many there are
+        assert [ref["video_id"] for ref in chunk_references(shared[0]["metadata"])] == ["videoBBBBBB", "videoCCCCCC"]
+        assert shared[0]["metadata"]["duplicate_count"] == 3
+        stats = dedup.stats()
+        assert stats["chunks"] == 8 and stats["duplicates"] == 3 and stats["skipped_embeddings"] == 3
+        assert stats["skipped_tokens"] == 3 * len(intro.split())
+        assert stats["saved_bytes"] == 3 * (len(intro.encode("utf-8")) + 2 * 4)
+        
+        # The shared intro is handed over to the video that repeated it first
+        dedup.delete_video("videoAAAAAA")
+        assert len(rows) == 4
+        shared = [row for row in rows.values() if row["document"] == intro]
+        assert shared[0]["metadata"]["video_id"] == "videoBBBBBB" and shared[0]["metadata"]["start"] == 0.0
+        assert [ref["video_id"] for ref in chunk_references(shared[0]["metadata"])] == ["videoCCCCCC", "videoDDDDDD"]
+        assert shared[0]["metadata"]["duplicate_count"] == 2
+        dedup.close()
+        
+        # A fresh deduplicator reads the same index back from disk
+        reloaded = chunk_dedup.ChunkDeduplicator(store, Embeddings(), path, references_per_chunk=2)
+        new, _ = reloaded.select_new("videoEEEEEE", [FakeChunk(intro, {}), FakeChunk(bodies["videoAAAAAA"], {})])
+        assert [chunk.page_content for chunk in new] == [bodies["videoAAAAAA"]]
+        reloaded.close()
+    print(f"✅ {stats['duplicates']} of {stats['chunks']} chunks collapsed, references capped, shared chunk handed over on delete")
+
+def test_quantized_store():
+    """Test that a quantized NumPy store returns the exact top-k after re-ranking, before and after reopening"""
+    print("\n🗜️  Testing quantized vector store...")
+    
+    import tempfile
+    import pytest
+    np = pytest.importorskip("numpy")
+    from numpy_collection import NumpyCollection
+    
+    rng = np.random.default_rng(0)
+    # Clusters of about 15 rows, so the true neighbours fit in the 5 x NUMPY_STORE_RERANK_FACTOR re-ranked candidates
+    centers = rng.standard_normal((100, 32))
+    vectors = (centers[rng.integers(0, 100, 1500)] + 0.3 * rng.standard_normal((1500, 32))).astype(np.float32)
+    queries = vectors[:20] + 0.05 * rng.standard_normal((20, 32)).astype(np.float32)
+    ids = [str(row) for row in range(len(vectors))]
+    
+    exact = NumpyCollection()
+    exact.add(ids, vectors, [{} for _ in ids], ids)
+    expected = exact.query(queries, n_results=5)["ids"]
+    
+    settings = Config.NUMPY_STORE_QUANTIZE_MIN_ROWS, Config.NUMPY_STORE_QUANTIZE_TRAIN_ROWS
+    Config.NUMPY_STORE_QUANTIZE_MIN_ROWS, Config.NUMPY_STORE_QUANTIZE_TRAIN_ROWS = 256, 1000
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for kind in ("int8", "pq"):
+                path = os.path.join(directory, kind)
+                store = NumpyCollection(path, quantization=kind)
+                for start in range(0, len(ids), 500):
+                    store.add(ids[start:start + 500], vectors[start:start + 500], [{} for _ in range(500)], ids[start:start + 500])
+                assert store._codes is not None, f"{kind} quantizer was not trained"
+                assert store.query(queries, n_results=5)["ids"] == expected, f"{kind} top-k differs from exact search"
+                store.persist()
+                reopened = NumpyCollection(path, quantization=kind)
+                assert reopened.vector_bytes() < vectors.nbytes
+                assert reopened.query(queries, n_results=5)["ids"] == expected, f"reopened {kind} top-k differs"
+                del store, reopened  # Unmaps the matrices before the directory is removed
+    finally:
+        Config.NUMPY_STORE_QUANTIZE_MIN_ROWS, Config.NUMPY_STORE_QUANTIZE_TRAIN_ROWS = settings
+    print("✅ int8 and product-quantized top-k match exact search, also after reopening")
+
+def test_benchmark_baseline():
+    """Test that the --quick benchmark suite does no more work than the committed baseline"""
+    print("\n📈 Testing benchmark baseline...")
+    
+    import json
+    import pytest
+    pytest.importorskip("langchain")
+    from benchmarks import bench_suite
+    
+    args = bench_suite.parse_args(["--quick", "--check"])
+    if args.store in ("chroma", "memory"):
+        pytest.importorskip("chromadb")
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    records = list(baseline["results"].values())
+    more = [dict(record, embedding_tokens=record["embedding_tokens"] + 1) for record in records]
+    assert len(bench_suite.regressions(more, baseline, args.tolerance)) == len(records)
+    
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_suite", "--quick", "--check"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    print(f"✅ {result.stdout.strip().splitlines()[-1]}")
+
 def main():
     """Run all tests"""
     print("🧪 YouTube to Chatbot - Setup Test")
@@ -99,6 +910,63 @@ def main():
     # Test URL validation
     test_youtube_url_validation()
     
+    # Test startup cost of the command-line scripts
+    test_entry_point_import_time()
+    
+    # Test the embedding cache
+    test_embedding_cache()
+    
+    # Test persistent per-video stores
+    test_persistent_video_store()
+    
+    # Test the embedding batcher
+    test_embedding_batcher()
+    
+    # Test the local embedding backend
+    test_local_embeddings()
+    
+    # Test segment-aligned chunking
+    test_segment_chunking()
+    
+    # Test the async and streaming ask paths
+    test_streaming_ask()
+    
+    # Test the shared index registry
+    test_shared_registry()
+    
+    # Test hierarchical summarization
+    test_hierarchical_summarizer()
+    
+    # Test resumable batch summarization
+    test_batch_summaries()
+    
+    # Test hybrid BM25 and vector retrieval
+    test_hybrid_retrieval()
+    
+    # Test the command-line JSONL records
+    test_cli_records()
+    
+    # Test micro-batching of concurrent queries
+    test_micro_batching()
+    
+    # Test request metrics
+    test_request_metrics()
+    
+    # Test the answer cache
+    test_answer_cache()
+    
+    # Test transcript store language lookup
+    test_transcript_store_languages()
+    
+    # Test chunk deduplication
+    test_chunk_dedup()
+    
+    # Test the quantized NumPy vector store
+    test_quantized_store()
+    
+    # Test the offline benchmark baseline
+    test_benchmark_baseline()
+    
     print("\n" + "=" * 50)
     print("🎉 Setup test completed!")
     print("\n📝 Next steps:")
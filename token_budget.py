@@ -0,0 +1,50 @@
+"""
+Token budgeting
+Token counting and packing of retrieved chunks into the prompt budget
+"""
+
+import functools
+from typing import List
+
+from config import Config
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = Config.TOKEN_ENCODING):
+    """Load a tiktoken encoding once per process"""
+    import tiktoken
+
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in a piece of text"""
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def context_budget(question: str) -> int:
+    """Get the number of tokens retrieved chunks may use in a prompt for this question"""
+    available = Config.MAX_TOKENS - Config.ANSWER_MAX_TOKENS - Config.PROMPT_OVERHEAD_TOKENS - count_tokens(question)
+    return max(0, min(Config.CONTEXT_TOKEN_BUDGET, available))
+
+
+def pack_context(documents: List, budget: int, min_tokens: int = Config.CONTEXT_MIN_CHUNK_TOKENS) -> List:
+    """Select documents in ranked order until the token budget is used up
+
+    The first document that does not fit is trimmed to the remaining budget,
+    unless less than ``min_tokens`` would be left of it.
+    """
+    encoding = get_encoding()
+    packed = []
+    remaining = budget
+    for document in documents:
+        tokens = encoding.encode(document.page_content, disallowed_special=())
+        if len(tokens) <= remaining:
+            packed.append(document)
+            remaining -= len(tokens)
+            continue
+        if remaining >= min_tokens:
+            trimmed = encoding.decode(tokens[:remaining])
+            packed.append(type(document)(page_content=trimmed, metadata=dict(document.metadata)))
+        break
+    return packed
@@ -0,0 +1,223 @@
+"""
+Transcript segments
+Compact, timestamp-preserving transcript storage and segment-aligned chunking
+"""
+
+import hashlib
+import json
+import re
+from array import array
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+from config import Config
+from token_budget import count_tokens as count_text_tokens
+
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+
+
+def video_id_from_url(url: str) -> Optional[str]:
+    """Extract the 11 character video ID from a YouTube URL"""
+    match = re.match(Config.YOUTUBE_URL_PATTERN, url.strip())
+    return match.group(1) if match else None
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as M:SS or H:MM:SS"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def timestamp_url(video_id: str, seconds: float) -> str:
+    """Get a URL that opens a video at the given moment"""
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(seconds)}s"
+
+
+class TranscriptSegments:
+    """A video's transcript segments held in flat arrays
+
+    Segment texts are joined into one string with an offsets array, and
+    start times and durations live in ``array('d')`` buffers, so a long
+    transcript costs a few bytes per segment instead of a dict per segment.
+    """
+
+    __slots__ = ("video_id", "language", "text", "offsets", "starts", "durations")
+
+    def __init__(self, video_id: str, language: str, text: str, offsets: array, starts: array, durations: array) -> None:
+        self.video_id = video_id
+        self.language = language
+        self.text = text
+        self.offsets = offsets
+        self.starts = starts
+        self.durations = durations
+
+    @classmethod
+    def from_entries(cls, video_id: str, entries: Iterable[dict], language: str = "en") -> "TranscriptSegments":
+        """Build from youtube_transcript_api entries ({"text", "start", "duration"})"""
+        parts: List[str] = []
+        offsets = array("I", [0])
+        starts = array("d")
+        durations = array("d")
+        position = 0
+        for entry in entries:
+            text = " ".join(entry["text"].split())
+            if not text:
+                continue
+            parts.append(text)
+            position += len(text)
+            offsets.append(position)
+            starts.append(float(entry["start"]))
+            durations.append(float(entry.get("duration", 0.0)))
+        return cls(video_id, language, "".join(parts), offsets, starts, durations)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def segment_text(self, index: int) -> str:
+        return self.text[self.offsets[index]:self.offsets[index + 1]]
+
+    def segment_end(self, index: int) -> float:
+        return self.starts[index] + self.durations[index]
+
+    def full_text(self) -> str:
+        """Get the transcript as plain text, segments separated by spaces"""
+        return " ".join(self.segment_text(i) for i in range(len(self)))
+
+    def content_hash(self) -> str:
+        """Hash the transcript text and timings"""
+        digest = hashlib.sha256(self.text.encode("utf-8"))
+        digest.update(self.offsets.tobytes())
+        digest.update(self.starts.tobytes())
+        return digest.hexdigest()
+
+    def chunk(
+        self,
+        max_tokens: int = Config.CHUNK_SIZE,
+        overlap_tokens: int = Config.CHUNK_OVERLAP,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ) -> List["Document"]:
+        """Group consecutive segments into chunks of at most ``max_tokens``
+
+        Chunks always start and end on segment boundaries and carry their
+        time range in metadata. With ``overlap_tokens`` a chunk repeats the
+        trailing whole segments of the previous one up to that many tokens.
+        """
+        count_tokens = count_tokens or count_text_tokens
+        token_counts = [count_tokens(self.segment_text(i)) for i in range(len(self))]
+        chunks: List["Document"] = []
+        first = 0
+        while first < len(self):
+            last = first
+            tokens = token_counts[first]
+            while last + 1 < len(self) and tokens + token_counts[last + 1] <= max_tokens:
+                last += 1
+                tokens += token_counts[last]
+            chunks.append(self._document(first, last))
+            if last + 1 >= len(self):
+                break
+
+            # Step back over whole segments to create the overlap
+            next_first = last + 1
+            carried = 0
+            while next_first - 1 > first and carried + token_counts[next_first - 1] <= overlap_tokens:
+                next_first -= 1
+                carried += token_counts[next_first]
+            first = next_first
+        return chunks
+
+    def _document(self, first: int, last: int) -> "Document":
+        from langchain.docstore.document import Document
+
+        text = " ".join(self.segment_text(i) for i in range(first, last + 1))
+        return Document(
+            page_content=text,
+            metadata={
+                "source": self.video_id,
+                "video_id": self.video_id,
+                "start": self.starts[first],
+                "end": self.segment_end(last),
+            },
+        )
+
+    def to_dict(self) -> Dict:
+        """Serialize to plain JSON-compatible types"""
+        return {
+            "video_id": self.video_id,
+            "language": self.language,
+            "text": self.text,
+            "offsets": self.offsets.tolist(),
+            "starts": self.starts.tolist(),
+            "durations": self.durations.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TranscriptSegments":
+        return cls(
+            data["video_id"],
+            data["language"],
+            data["text"],
+            array("I", data["offsets"]),
+            array("d", data["starts"]),
+            array("d", data["durations"]),
+        )
+
+
+def fetch_segments(video_id: str, languages: Optional[List[str]] = None) -> TranscriptSegments:
+    """Download a video's transcript in the first available of ``languages``, with its segment timings"""
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    languages = languages or Config.TRANSCRIPT_LANGUAGES
+    transcript = YouTubeTranscriptApi.list_transcripts(video_id).find_transcript(languages)
+    return TranscriptSegments.from_entries(video_id, transcript.fetch(), transcript.language_code)
+
+
+def chunk_references(metadata: dict) -> List[dict]:
+    """Return the other moments ({"video_id", "start", "end"}) a deduplicated chunk was said at"""
+    duplicates = metadata.get("duplicates")
+    return json.loads(duplicates) if duplicates else []
+
+
+def with_references(metadata: dict, references: List[dict], total: Optional[int] = None) -> dict:
+    """Return chunk metadata listing ``references`` as the chunk's other moments
+
+    ``total`` counts every other moment when only the first few are listed.
+    """
+    metadata = dict(metadata)
+    if references:
+        # Vector store metadata values must be scalars, so the list is stored as JSON
+        metadata["duplicates"] = json.dumps(references, separators=(",", ":"))
+        metadata["duplicate_count"] = total if total is not None else len(references)
+    else:
+        metadata.pop("duplicates", None)
+        metadata.pop("duplicate_count", None)
+    return metadata
+
+
+def source_timestamps(
+    documents: List["Document"], references_per_chunk: int = Config.CHANNEL_DEDUP_SOURCES_PER_CHUNK
+) -> List[dict]:
+    """Collect the distinct video moments that retrieved chunks came from, in time order
+
+    A deduplicated chunk also cites up to ``references_per_chunk`` of the
+    other moments it was said at.
+    """
+    sources = {}
+    for document in documents:
+        moments = [document.metadata] + chunk_references(document.metadata)[:references_per_chunk]
+        for moment in moments:
+            video_id = moment.get("video_id")
+            start = moment.get("start")
+            if video_id is None or start is None:
+                continue
+            sources[(video_id, int(start))] = {
+                "video_id": video_id,
+                "start": float(start),
+                "end": float(moment.get("end", start)),
+                "timestamp": format_timestamp(start),
+                "url": timestamp_url(video_id, start),
+            }
+    return [sources[key] for key in sorted(sources)]
@@ -0,0 +1,121 @@
+"""
+Transcript store
+Compressed on-disk transcripts so each video is fetched from YouTube at most once
+"""
+
+import json
+import os
+import threading
+import zlib
+from typing import List, Optional
+
+from config import Config
+from metrics import count, span
+from transcript_segments import TranscriptSegments, fetch_segments
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4 = None
+
+
+def _codecs():
+    """Return the available (extension, compress, decompress) codecs, best first"""
+    codecs = []
+    if zstandard is not None:
+        # zstandard contexts aren't thread-safe, so each call gets its own
+        codecs.append((
+            ".zst",
+            lambda data: zstandard.ZstdCompressor(level=10).compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data),
+        ))
+    if lz4 is not None:
+        codecs.append((".lz4", lz4.frame.compress, lz4.frame.decompress))
+    codecs.append((".zz", zlib.compress, zlib.decompress))
+    return codecs
+
+
+class TranscriptStore:
+    """Directory of compressed transcript segment files keyed by video ID and language"""
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory or Config.TRANSCRIPT_STORE_DIR
+        self.codecs = _codecs()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _base_path(self, video_id: str, language: str) -> str:
+        # Shard by ID prefix to keep directories small for large channels
+        return os.path.join(self.directory, language, video_id[:2], f"{video_id}.json")
+
+    def _read(self, video_id: str, language: str) -> Optional[TranscriptSegments]:
+        base_path = self._base_path(video_id, language)
+        for extension, _, decompress in self.codecs:
+            path = base_path + extension
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = json.loads(decompress(f.read()).decode("utf-8"))
+                return TranscriptSegments.from_dict(data)
+        return None
+
+    def get(self, video_id: str, languages: List[str]) -> Optional[TranscriptSegments]:
+        """Read the stored transcript in the most preferred language, or return None if none was fetched"""
+        for language in languages:
+            segments = self._read(video_id, language)
+            if segments is not None:
+                with self._lock:
+                    self.hits += 1
+                count("transcript_cache_hits")
+                return segments
+        with self._lock:
+            self.misses += 1
+        count("transcript_cache_misses")
+        return None
+
+    def put(self, segments: TranscriptSegments) -> None:
+        """Compress and store a transcript"""
+        extension, compress, _ = self.codecs[0]
+        path = self._base_path(segments.video_id, segments.language) + extension
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = compress(json.dumps(segments.to_dict(), separators=(",", ":")).encode("utf-8"))
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_shared_store: Optional[TranscriptStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_transcript_store() -> TranscriptStore:
+    """Return the process-wide transcript store"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = TranscriptStore()
+        return _shared_store
+
+
+def load_transcript(video_id: str, languages: Optional[List[str]] = None) -> TranscriptSegments:
+    """Load a video's transcript from the local store, fetching it from YouTube only once"""
+    languages = languages or Config.TRANSCRIPT_LANGUAGES
+    store = get_transcript_store()
+    with span("transcript_fetch"):
+        segments = store.get(video_id, languages)
+        if segments is None:
+            segments = fetch_segments(video_id, languages)
+            store.put(segments)
+    return segments
+
@@ -0,0 +1,280 @@
+"""
+Vector store layer
+Persistent per-video collections (Chroma or NumPy) so indexes survive sessions and process restarts
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from metrics import span
+
+if TYPE_CHECKING:
+    from langchain.docstore.document import Document
+    from langchain.vectorstores import Chroma
+
+    from numpy_store import NumpyVectorStore
+
+# chromadb, LangChain and NumPy are imported on first use: chromadb alone
+# pulls in duckdb, clickhouse-connect and posthog, which slows every startup
+_clients: Dict[str, object] = {}
+_clients_lock = threading.Lock()
+_numpy_stores: Dict[str, "NumpyVectorStore"] = {}
+_numpy_stores_lock = threading.Lock()
+
+
+def video_collection_name(video_id: str) -> str:
+    """Return the collection name used for a single video"""
+    # Suffix keeps the name valid when an ID ends in "-" or "_"
+    return f"video_{video_id}_chunks"
+
+
+def _persist_directory() -> str:
+    """Return the on-disk location for the configured embedding model and chunking"""
+    # Indexes built with another embedding model or chunking are never reopened
+    return os.path.join(Config.VECTOR_STORE_DIR, Config.index_namespace())
+
+
+def get_chroma_client(persist_directory: Optional[str] = None):
+    """Return the process-wide Chroma client for a persist directory"""
+    # One client per directory: separate duckdb+parquet clients on the same
+    # directory would overwrite each other's files on persist.
+    import chromadb
+    from chromadb.config import Settings
+
+    key = persist_directory or ""
+    with _clients_lock:
+        if key not in _clients:
+            if persist_directory:
+                os.makedirs(persist_directory, exist_ok=True)
+                settings = Settings(chroma_db_impl="duckdb+parquet", persist_directory=persist_directory)
+            else:
+                settings = Settings()
+            _clients[key] = chromadb.Client(settings)
+        return _clients[key]
+
+
+def _numpy_store_path(name: str) -> str:
+    return os.path.join(_persist_directory(), "numpy", name)
+
+
+def _open_numpy_store(name: str, embeddings) -> "NumpyVectorStore":
+    """Return the process-wide NumPy store for a collection, loading it from disk once"""
+    from numpy_store import NumpyVectorStore
+
+    path = _numpy_store_path(name)
+    with _numpy_stores_lock:
+        if path not in _numpy_stores:
+            _numpy_stores[path] = NumpyVectorStore(
+                embeddings, path, mmap=Config.NUMPY_STORE_MMAP, quantization=Config.NUMPY_STORE_QUANTIZATION
+            )
+        return _numpy_stores[path]
+
+
+def _open_collection(name: str, embeddings, persist_directory: Optional[str]) -> "Chroma":
+    """Open (or create) a named collection on the shared client"""
+    if Config.VECTOR_STORE_TYPE == "numpy":
+        return _open_numpy_store(name, embeddings)
+    from langchain.vectorstores import Chroma
+
+    return Chroma(
+        collection_name=name,
+        embedding_function=embeddings,
+        persist_directory=persist_directory,
+        client=get_chroma_client(persist_directory),
+    )
+
+
+def _configured_persist_directory() -> Optional[str]:
+    """Return the persist directory for the configured store type (None if in-memory)"""
+    if Config.VECTOR_STORE_TYPE == "chroma":
+        return _persist_directory()
+    if Config.VECTOR_STORE_TYPE == "memory":
+        return None
+    if Config.VECTOR_STORE_TYPE == "numpy":
+        return os.path.join(_persist_directory(), "numpy")
+    raise ValueError(f"Unsupported vector store type: {Config.VECTOR_STORE_TYPE}")
+
+
+def open_video_store(video_id: str, embeddings) -> "Chroma":
+    """Open (or create) the vector store collection for a video"""
+    return _open_collection(video_collection_name(video_id), embeddings, _configured_persist_directory())
+
+
+def open_channel_store(channel_id: str, embeddings) -> "Chroma":
+    """Open (or create) the collection holding every chunk of a channel"""
+    return _open_collection(f"channel_{channel_id}_chunks", embeddings, _configured_persist_directory())
+
+
+def persist_store(store: "Chroma") -> None:
+    """Flush a store to disk if it is persistent"""
+    if Config.VECTOR_STORE_TYPE in ("chroma", "numpy"):
+        store.persist()
+
+
+def store_size(store: "Chroma") -> int:
+    """Return the number of chunks held by a store"""
+    return store._collection.count()
+
+
+def estimate_store_bytes(store) -> int:
+    """Roughly estimate the memory a store's vectors and texts take"""
+    count = store_size(store)
+    if count == 0:
+        return 0
+    sample = store._collection.peek(1)
+    dimensions = len(sample["embeddings"][0]) if sample.get("embeddings") else 0
+    text_bytes = len(sample["documents"][0].encode("utf-8")) if sample.get("documents") else 0
+    if hasattr(store._collection, "vector_bytes"):
+        # Quantized NumPy collections hold codes instead of float vectors
+        return store._collection.vector_bytes() + count * text_bytes
+    return count * (dimensions * 4 + text_bytes)
+
+
+def store_documents(store: "Chroma") -> List["Document"]:
+    """Read back every chunk held by a store"""
+    from langchain.docstore.document import Document
+
+    result = store._collection.get(include=["documents", "metadatas"])
+    return [
+        Document(page_content=text, metadata=metadata or {})
+        for text, metadata in zip(result["documents"], result["metadatas"])
+    ]
+
+
+def _query_store(store: "Chroma", query_vectors: List[List[float]], k: int) -> List[List[Tuple[float, "Document"]]]:
+    """Return the ``k`` nearest (distance, chunk) pairs in one store for each query vector"""
+    from langchain.docstore.document import Document
+
+    n_results = min(k, store_size(store))
+    if n_results == 0:
+        return [[] for _ in query_vectors]
+    result = store._collection.query(
+        query_embeddings=query_vectors,
+        n_results=n_results,
+        include=["documents", "metadatas", "distances"],
+    )
+    return [
+        [(distance, Document(page_content=text, metadata=metadata or {})) for text, metadata, distance in zip(*hits)]
+        for hits in zip(result["documents"], result["metadatas"], result["distances"])
+    ]
+
+
+def search_stores(stores: Iterable["Chroma"], query_vector: List[float], k: int) -> List["Document"]:
+    """Return the ``k`` chunks nearest to a query vector across several stores, best first"""
+    return search_stores_batch([(stores, query_vector, k)])[0]
+
+
+def search_stores_batch(searches: List[Tuple[Iterable["Chroma"], List[float], int]]) -> List[List["Document"]]:
+    """Run several ``search_stores`` searches, querying each distinct store once for all of them"""
+    by_store: Dict[int, Tuple["Chroma", List[int]]] = {}
+    for position, (stores, _, _) in enumerate(searches):
+        for store in stores:
+            by_store.setdefault(id(store), (store, []))[1].append(position)
+
+    # Every store uses the same embedding model and distance, so scores are comparable
+    scored: List[list] = [[] for _ in searches]
+    for store, positions in by_store.values():
+        k = max(searches[position][2] for position in positions)
+        hits = _query_store(store, [searches[position][1] for position in positions], k)
+        for position, store_hits in zip(positions, hits):
+            scored[position].extend(store_hits)
+
+    results = []
+    for (_, _, k), hits in zip(searches, scored):
+        hits.sort(key=lambda item: item[0])
+        results.append([document for _, document in hits[:k]])
+    return results
+
+
+def add_embedded_documents(store: "Chroma", video_id: str, documents: List, vectors: List[List[float]]) -> None:
+    """Add already-embedded chunks of a video to a store"""
+    for document in documents:
+        document.metadata["video_id"] = video_id
+    store._collection.add(
+        ids=[f"{video_id}-{i}" for i in range(len(documents))],
+        embeddings=vectors,
+        metadatas=[document.metadata for document in documents],
+        documents=[document.page_content for document in documents],
+    )
+
+
+def add_video_documents(store: "Chroma", video_id: str, documents: List) -> None:
+    """Embed a video's chunks, add them to its store and persist them"""
+    with span("embed"):
+        vectors = store._embedding_function.embed_documents([document.page_content for document in documents])
+    with span("index_build"):
+        add_embedded_documents(store, video_id, documents, vectors)
+        persist_store(store)
+
+
+def delete_video_chunks(store: "Chroma", video_id: str) -> None:
+    """Remove every chunk of a video from a shared store"""
+    store._collection.delete(where={"video_id": video_id})
+
+
+class ChunkStore:
+    """Chunk-level writes to a shared store, for callers that choose chunk IDs themselves"""
+
+    def __init__(self, store: "Chroma") -> None:
+        self.store = store
+
+    def add(self, ids: List[str], documents: List, vectors: List[List[float]]) -> None:
+        self.store._collection.add(
+            ids=ids,
+            embeddings=vectors,
+            metadatas=[document.metadata for document in documents],
+            documents=[document.page_content for document in documents],
+        )
+
+    def update_metadatas(self, metadatas: Dict[str, dict]) -> None:
+        """Replace the metadata of stored chunks, by chunk ID"""
+        ids = list(metadatas)
+        self.store._collection.update(ids=ids, metadatas=[metadatas[chunk_id] for chunk_id in ids])
+
+    def delete_video(self, video_id: str) -> None:
+        delete_video_chunks(self.store, video_id)
+
+
+def delete_video_store(video_id: str) -> None:
+    """Drop the stored collection for a video"""
+    if Config.VECTOR_STORE_TYPE == "numpy":
+        path = _numpy_store_path(video_collection_name(video_id))
+        with _numpy_stores_lock:
+            _numpy_stores.pop(path, None)
+        for extension in (".npy", ".json", ".codes.npz"):
+            if os.path.exists(path + extension):
+                os.remove(path + extension)
+        return
+    persist_directory = _configured_persist_directory()
+    client = get_chroma_client(persist_directory)
+    try:
+        client.delete_collection(video_collection_name(video_id))
+    except ValueError:
+        # Collection did not exist
+        return
+    if persist_directory:
+        client.persist()
+
+
+def video_store_unloadable() -> bool:
+    """Return whether unload_video_store frees the memory of the configured store type"""
+    # Chroma 0.3's duckdb+parquet client loads every persisted collection into
+    # one in-process DuckDB at startup and caches their HNSW indexes, so a
+    # single collection's memory can't be given back short of deleting it.
+    return Config.VECTOR_STORE_TYPE != "chroma"
+
+
+def unload_video_store(video_id: str) -> None:
+    """Release the memory held by a video's collection (a no-op for persistent Chroma)"""
+    # NumPy indexes are reopened from disk on demand; in-memory Chroma
+    # collections are dropped, and are rebuilt on the next ingest.
+    if Config.VECTOR_STORE_TYPE == "numpy":
+        with _numpy_stores_lock:
+            _numpy_stores.pop(_numpy_store_path(video_collection_name(video_id)), None)
+    elif _configured_persist_directory() is None:
+        try:
+            get_chroma_client(None).delete_collection(video_collection_name(video_id))
+        except ValueError:
+            pass
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+YouTube to Chatbot CLI
+Non-interactive ingest, ask, summarize and channel commands for scripts and job schedulers
+
+Every result is written to stdout as one JSON line; progress and errors go to
+stderr. Questions and videos are taken from the arguments, or one per line
+from stdin when none are given, and are processed in parallel.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from config import Config
+from metrics import flush_metrics, last_trace, percentile, request_trace
+import re
+
+_stdout_lock = threading.Lock()
+
+def log(message):
+    """Print a progress message to stderr, keeping stdout pure JSONL"""
+    print(message, file=sys.stderr, flush=True)
+
+def emit(record):
+    """Write one result record to stdout"""
+    line = json.dumps(record, ensure_ascii=False)
+    with _stdout_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+def require_api_key():
+    """Read the OpenAI API key from the environment; the CLI never prompts"""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key or not api_key.startswith('sk-'):
+        log("❌ OPENAI_API_KEY must be set to a valid OpenAI API key!")
+        sys.exit(2)
+    return api_key
+
+def input_lines(values):
+    """Yield the command-line values, or the non-blank lines of stdin when there are none"""
+    if values:
+        yield from values
+        return
+    if sys.stdin.isatty():
+        return
+    for line in sys.stdin:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+def parse_video_id(value):
+    """Accept a YouTube URL or a bare 11 character video ID"""
+    if re.match(r'^[a-zA-Z0-9_-]{11}$', value):
+        return value
+    match = re.match(Config.YOUTUBE_URL_PATTERN, value)
+    return match.group(1) if match else None
+
+def read_questions(values):
+    """Yield (id, question) pairs
+
+    Lines may be plain questions or JSON objects with a "question" and an
+    optional "id"; plain questions are numbered from 0 in input order.
+    """
+    for number, line in enumerate(input_lines(values)):
+        if line.startswith("{"):
+            try:
+                item = json.loads(line)
+                yield item.get("id", number), item["question"]
+                continue
+            except (ValueError, KeyError):
+                log(f"⚠️  Treating line {number} as a plain question: not a JSON object with a \"question\"")
+        yield number, line
+
+def run_parallel(items, work, workers):
+    """Apply ``work`` to items on a thread pool, yielding results as they finish
+
+    Only a couple of items per worker are read ahead, so a long stdin
+    stream is answered while it is still being read.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for item in items:
+            pending.add(executor.submit(work, item))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def attach_stages(record, previous_trace):
+    """Add the stage timings of the request just finished to its record (DEBUG only)
+
+    Worker threads keep their last trace between items, so one that is
+    still ``previous_trace`` belongs to an earlier item.
+    """
+    trace = last_trace()
+    if Config.DEBUG and trace is not None and trace is not previous_trace:
+        record["stages"] = trace.as_dict()["stages"]
+
+def report_latency(noun, records, wall_seconds):
+    """Log throughput and latency percentiles for a run"""
+    latencies = [record["seconds"] for record in records]
+    failed = sum(record["status"] == "error" for record in records)
+    rate = len(records) / wall_seconds if wall_seconds else 0.0
+    log(f"📊 {len(records)} {noun} ({failed} failed) in {wall_seconds:.1f}s ({rate:.2f}/s), "
+        f"latency p50={percentile(latencies, 50):.2f}s p95={percentile(latencies, 95):.2f}s "
+        f"max={max(latencies, default=0.0):.2f}s")
+    return failed
+
+def answer_questions(questions, answer, workers):
+    """Answer questions in parallel and emit one record per question; return the number that failed"""
+    def work(item):
+        question_id, question = item
+        started = time.perf_counter()
+        previous_trace = last_trace()
+        record = {"id": question_id, "question": question}
+        try:
+            text, sources = answer(question)
+            record["status"] = "ok" if text is not None else "no_context"
+            record["answer"] = text
+            record["sources"] = sources
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["seconds"] = round(time.perf_counter() - started, 3)
+        attach_stages(record, previous_trace)
+        return record
+
+    started = time.perf_counter()
+    records = []
+    for record in run_parallel(questions, work, workers):
+        emit(record)
+        records.append(record)
+    return report_latency("questions", records, time.perf_counter() - started)
+
+def index_videos(video_ids, index, workers):
+    """Index videos in parallel, yielding one record per video as it finishes
+
+    ``index(video_id)`` returns False when the video has no transcript and
+    raises on any other failure.
+    """
+    from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+
+    def work(video_id):
+        started = time.perf_counter()
+        previous_trace = last_trace()
+        record = {"video_id": video_id, "url": f"https://www.youtube.com/watch?v={video_id}"}
+        try:
+            record["status"] = "ok" if index(video_id) else "no_transcript"
+        except (NoTranscriptFound, TranscriptsDisabled):
+            record["status"] = "no_transcript"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["seconds"] = round(time.perf_counter() - started, 3)
+        attach_stages(record, previous_trace)
+        return record
+
+    return run_parallel(dict.fromkeys(video_ids), work, workers)
+
+def video_ids_from(values):
+    """Parse video URLs or IDs, exiting on the first one that isn't valid"""
+    video_ids = []
+    for value in input_lines(values):
+        video_id = parse_video_id(value)
+        if video_id is None:
+            log(f"❌ Invalid YouTube URL or video ID: {value}")
+            sys.exit(2)
+        video_ids.append(video_id)
+    return video_ids
+
+def cmd_ingest(args):
+    video_ids = video_ids_from(args.videos)
+    api_key = require_api_key()
+    if Config.VECTOR_STORE_TYPE == "memory":
+        log("⚠️  VECTOR_STORE_TYPE is \"memory\": indexes are not kept after this process exits")
+    from embedders import build_embeddings
+    from youtubequery import build_video_store
+    embeddings = build_embeddings(api_key)
+
+    def index(video_id):
+        with request_trace("ingest", video_id=video_id) as trace:
+            if build_video_store(video_id, embeddings) is None:
+                trace.status = "no_transcript"
+                return False
+            return True
+
+    started = time.perf_counter()
+    records = []
+    for record in index_videos(video_ids, index, args.workers):
+        emit(record)
+        records.append(record)
+    return report_latency("videos", records, time.perf_counter() - started)
+
+def cmd_ask(args):
+    video_ids = video_ids_from(args.video)
+    api_key = require_api_key()
+    from youtubequery import YoutubeQuery
+    youtube_query = YoutubeQuery(api_key)
+
+    def index(video_id):
+        result = youtube_query.ingest(f"https://www.youtube.com/watch?v={video_id}")
+        if result != "Success":
+            raise ValueError(result)
+        return True
+
+    log(f"🔄 Loading {len(video_ids)} videos...")
+    failed = [record for record in index_videos(video_ids, index, args.workers) if record["status"] != "ok"]
+    for record in failed:
+        log(f"❌ {record['url']}: {record.get('error', 'no transcript')}")
+    if failed:
+        return 1
+
+    def answer(question):
+        text, sources = youtube_query.ask_with_sources(question, raise_errors=True)
+        # answer_questions reports a None answer as "no_context"
+        if text == YoutubeQuery.NO_CONTEXT_ANSWER:
+            return None, []
+        return text, sources
+
+    return answer_questions(read_questions(args.questions), answer, args.workers)
+
+def cmd_summarize(args):
+    video_ids = video_ids_from(args.videos)
+    api_key = require_api_key()
+    from summarizer import build_summarizer, summarize_video
+    from summary_batch import summarize_batch
+    summarizer = build_summarizer(api_key)
+    report = summarize_batch(
+        video_ids,
+        lambda video_id: summarize_video(summarizer, video_id),
+        args.output,
+        workers=args.workers,
+        on_record=emit,
+    )
+    log(report.report())
+    return len(report.failed)
+
+def log_video(video_id, chunk_count, error):
+    """Report one channel video's indexing outcome on stderr"""
+    if error is None:
+        log(f"✅ {video_id} ({chunk_count} chunks)")
+    else:
+        log(f"⚠️  {video_id}: {str(error) or type(error).__name__}")
+
+def cmd_channel(args):
+    from chat_channel import (
+        answer_channel_question, channel_video_ids, refresh_channel_index, validate_channel_id
+    )
+    if not validate_channel_id(args.channel_id):
+        log("❌ Invalid channel ID format!")
+        sys.exit(2)
+    api_key = require_api_key()
+    from shared_resources import QueryClients
+    from vectorstore import open_channel_store, store_size
+    clients = QueryClients(api_key)
+    store = open_channel_store(args.channel_id, clients.embeddings)
+
+    if not args.no_refresh:
+        log("📺 Updating the channel index...")
+        _, result, removed = refresh_channel_index(
+            args.channel_id, channel_video_ids(args.channel_id), clients.embeddings,
+            store=store, on_video_done=log_video,
+        )
+        log(result.report())
+        if removed:
+            log(f"🗑️  Removed {len(removed)} videos no longer on the channel")
+    if store_size(store) == 0:
+        log("❌ No transcripts indexed for this channel!")
+        return 1
+
+    def answer(question):
+        return answer_channel_question(store, clients.embeddings, clients.chain, question)
+
+    return answer_questions(read_questions(args.questions), answer, args.workers)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Non-interactive YouTube to Chatbot commands. Results are printed as JSON lines.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="index videos so later runs can ask about them")
+    ingest.add_argument("videos", nargs="*", help="YouTube URLs or video IDs (default: one per line on stdin)")
+    ingest.set_defaults(handler=cmd_ingest, workers=Config.CLI_INGEST_WORKERS)
+
+    ask = commands.add_parser("ask", help="answer questions about one or more videos")
+    ask.add_argument("--video", action="append", required=True, help="YouTube URL or video ID (repeatable)")
+    ask.add_argument("questions", nargs="*", help="questions (default: one per line on stdin, plain or JSON)")
+    ask.set_defaults(handler=cmd_ask, workers=Config.CLI_QUESTION_WORKERS)
+
+    summarize = commands.add_parser("summarize", help="summarize videos")
+    summarize.add_argument("videos", nargs="*", help="YouTube URLs or video IDs (default: one per line on stdin)")
+    summarize.add_argument("--output", help="also append records to this JSONL file and skip videos already in it")
+    summarize.set_defaults(handler=cmd_summarize, workers=Config.SUMMARY_BATCH_WORKERS)
+
+    channel = commands.add_parser("channel", help="update a channel's index and answer questions about it")
+    channel.add_argument("channel_id", help="channel ID (24 characters starting with UC)")
+    channel.add_argument("questions", nargs="*", help="questions (default: one per line on stdin, plain or JSON)")
+    channel.add_argument("--no-refresh", action="store_true", help="answer from the existing index without updating it")
+    channel.set_defaults(handler=cmd_channel, workers=Config.CLI_QUESTION_WORKERS)
+
+    for command in (ingest, ask, summarize, channel):
+        # The per-command default comes from set_defaults above
+        command.add_argument("--workers", type=int, help="items processed at once")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    failed = args.handler(args)
+    flush_metrics()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
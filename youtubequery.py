@@ -1,100 +1,525 @@
+import asyncio
 import os
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import Chroma
-from langchain.chains.question_answering import load_qa_chain
-from langchain.document_loaders import YoutubeLoader
-from langchain.llms import OpenAI
+import queue
+import threading
+import weakref
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from langchain.docstore.document import Document
 from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+from embedders import embedding_cache_stats
+from streaming import STREAM_END, AsyncQueueCallbackHandler, QueueCallbackHandler
+from answer_cache import get_answer_cache
+from metrics import RequestTrace, activate, count, in_current_trace, request_trace, span
+from shared_resources import QueryClients, ResourceRegistry
+from token_budget import context_budget, count_tokens, pack_context
+from transcript_segments import source_timestamps, video_id_from_url
+from transcript_store import load_transcript
+from config import Config
+from keyword_index import BM25Index, hybrid_search
+from vectorstore import (
+    add_video_documents, estimate_store_bytes, open_video_store, search_stores, store_documents, store_size,
+    video_store_unloadable,
+)
 import re
 
+
+def build_video_store(video_id: str, embeddings):
+    """Open a video's vector store, indexing its transcript first if needed; None if it has no transcript"""
+    store = open_video_store(video_id, embeddings)
+    
+    # Only fetch and embed the transcript if the video isn't indexed yet
+    if store_size(store) == 0:
+        # Transcripts fetched before are re-chunked from the local store
+        segments = load_transcript(video_id)
+        with span("split"):
+            chunks = segments.chunk() if len(segments) else []
+        if not chunks:
+            return None
+        add_video_documents(store, video_id, chunks)
+        if Config.ANSWER_CACHE_ENABLED:
+            # Answers drawn from an earlier index of the video no longer match it
+            get_answer_cache().invalidate(video_id)
+    return store
+
+
+class VideoIndex:
+    """A loaded video's vector store plus the keyword index built from the same chunks"""
+
+    def __init__(self, store) -> None:
+        self.store = store
+        self.keywords = None
+        if Config.HYBRID_RETRIEVAL:
+            with span("index_build"):
+                self.keywords = BM25Index(store_documents(store))
+
+    def estimated_bytes(self) -> int:
+        keyword_bytes = self.keywords.estimated_bytes() if self.keywords is not None else 0
+        # Only count vectors that evicting this index frees
+        store_bytes = estimate_store_bytes(self.store) if video_store_unloadable() else 0
+        return store_bytes + keyword_bytes
+
+
 class YoutubeQuery:
-    def __init__(self, openai_api_key=None) -> None:
+    NO_CONTEXT_ANSWER = "I couldn't find relevant information in the video to answer your question. Try asking something else."
+    EMPTY_ANSWER = "I couldn't generate a response for your question. Please try rephrasing it."
+
+    def __init__(
+        self,
+        openai_api_key=None,
+        registry: Optional[ResourceRegistry] = None,
+        store_search: Callable[[List, List[float], int], List[Document]] = search_stores,
+    ) -> None:
         if not openai_api_key:
             raise ValueError("OpenAI API key is required")
         
         if not openai_api_key.startswith('sk-'):
             raise ValueError("Invalid OpenAI API key format")
             
-        self.embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
         os.environ["OPENAI_API_KEY"] = openai_api_key
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        self.llm = OpenAI(temperature=0, openai_api_key=openai_api_key)
-        self.chain = None
-        self.db = None
+        # With a registry, clients and video indexes are shared with other sessions
+        self.registry = registry
+        clients = registry.clients(openai_api_key) if registry is not None else QueryClients(openai_api_key)
+        self.embeddings = clients.embeddings
+        self.llm = clients.llm
+        self.streaming_llm = clients.streaming_llm
+        self.chain = clients.chain
+        self.streaming_chain = clients.streaming_chain
+        # search_stores(stores, query_vector, k); the query service swaps in a batched one
+        self.store_search = store_search
+        # Loaded videos: video ID -> (URL, VideoIndex). Questions search the
+        # selected subset, or every loaded video when no selection is set.
+        self.videos: Dict[str, Tuple[str, VideoIndex]] = {}
+        self.selected_video_ids: Optional[List[str]] = None
         self.current_video_url = None
+        self.current_video_id = None
+        self.retrieval_stats: Dict[str, int] = {}
+        self.answer_cache = get_answer_cache() if Config.ANSWER_CACHE_ENABLED else None
+        if registry is not None:
+            # Give back shared indexes if the session is dropped without forget()
+            self._held_video_ids = set()
+            weakref.finalize(self, registry.release_videos, self._held_video_ids)
 
     def _validate_youtube_url(self, url: str) -> bool:
         """Validate if the URL is a valid YouTube URL"""
         youtube_regex = r'(?:https?://)?(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]{11})'
         return bool(re.match(youtube_regex, url))
 
-    def ask(self, question: str) -> str:
-        """Ask a question about the loaded video"""
+    def _check_question(self, question: str) -> Optional[str]:
+        """Return a message explaining why a question can't be answered, if it can't"""
         if not question or not question.strip():
             return "Please provide a question to ask."
-            
-        if self.chain is None or self.db is None:
+        if not self.videos:
             return "Please add a video first before asking questions."
+        if not self.active_video_ids():
+            return "Please select at least one video to ask about."
+        return None
+
+    def _answer_scope(self) -> str:
+        """Key answers by the set of videos they were drawn from"""
+        return ",".join(sorted(self.active_video_ids()))
+
+    def _question_embedder(self) -> Callable[[str], List[float]]:
+        """Return an embed_query that embeds each text once, so the semantic answer cache and vector search share a question's vector"""
+        vectors: Dict[str, List[float]] = {}
+        
+        def embed_query(text: str) -> List[float]:
+            if text not in vectors:
+                vectors[text] = self.embeddings.embed_query(text)
+            return vectors[text]
+        
+        return embed_query
+
+    def _cached_answer(self, question: str, embed_query: Callable) -> Optional[Tuple[str, List[dict]]]:
+        if self.answer_cache is None:
+            return None
+        cached = self.answer_cache.get(
+            self._answer_scope(), question, embed_query if Config.ANSWER_CACHE_SEMANTIC else None
+        )
+        count("answer_cache_hits" if cached is not None else "answer_cache_misses")
+        return cached
+
+    async def _run_blocking(self, function: Callable, *args):
+        """Run a blocking call (an embedding request, a search) in the default executor, inside the current trace"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, in_current_trace(function), *args)
+
+    def _finish_answer(
+        self, question: str, response: str, docs: List[Document], embed_query: Callable
+    ) -> Tuple[str, List[dict]]:
+        """Attach sources to a generated answer and cache it"""
+        # The prompt template adds a fixed overhead on top of the question and context
+        count("prompt_tokens", count_tokens(question) + sum(count_tokens(doc.page_content) for doc in docs))
+        count("completion_tokens", count_tokens(response or ""))
+        if not response or not response.strip():
+            return self.EMPTY_ANSWER, []
+        result = (response.strip(), source_timestamps(docs))
+        if self.answer_cache is not None:
+            self.answer_cache.put(
+                self._answer_scope(), question, result, embed_query if Config.ANSWER_CACHE_SEMANTIC else None
+            )
+        return result
+
+    @staticmethod
+    def format_answer(answer: str, sources: List[dict]) -> str:
+        """Render an answer with its source timestamps as plain text"""
+        if not sources:
+            return answer
+        timestamps = ", ".join(source["timestamp"] for source in sources)
+        return f"{answer}\n\nSources: {timestamps}"
+
+    def retrieve(self, question: str, embed_query: Optional[Callable] = None) -> List[Document]:
+        """Retrieve transcript chunks for a question from the active videos, trimmed to the prompt budget"""
+        indexes = [self.videos[video_id][1] for video_id in self.active_video_ids()]
+        embed_query = embed_query or self.embeddings.embed_query
+        
+        def vector_search(query: str, k: int) -> List[Document]:
+            with span("embed_query"):
+                query_vector = embed_query(query)
+            with span("vector_search"):
+                return self.store_search([index.store for index in indexes], query_vector, k)
+        
+        with span("retrieval"):
+            if Config.HYBRID_RETRIEVAL:
+                docs = hybrid_search(
+                    [index.keywords for index in indexes], question, vector_search, Config.RETRIEVAL_K,
+                    stats=self.retrieval_stats,
+                )
+            else:
+                docs = vector_search(question, Config.RETRIEVAL_K)
+            return pack_context(docs, context_budget(question))
+
+    async def aretrieve(self, question: str, embed_query: Optional[Callable] = None) -> List[Document]:
+        """Retrieve transcript chunks without blocking the event loop"""
+        return await self._run_blocking(self.retrieve, question, embed_query)
+
+    def ask_with_sources(self, question: str, raise_errors: bool = False) -> Tuple[str, List[dict]]:
+        """Ask a question and get the answer with the video moments it was based on
+        
+        Retrieval and LLM errors are returned as the answer text, unless
+        ``raise_errors`` is set (for callers that report failures themselves).
+        """
+        error = self._check_question(question)
+        if error:
+            return error, []
         
         try:
-            docs = self.db.get_relevant_documents(question)
-            if not docs:
-                return "I couldn't find relevant information in the video to answer your question. Try asking something else."
+            with request_trace("ask", videos=len(self.active_video_ids())) as trace:
+                embed_query = self._question_embedder()
+                cached = self._cached_answer(question, embed_query)
+                if cached is not None:
+                    trace.status = "cached"
+                    return cached
+                
+                docs = self.retrieve(question, embed_query)
+                if not docs:
+                    trace.status = "no_context"
+                    return self.NO_CONTEXT_ANSWER, []
+                
+                with span("llm"):
+                    response = self.chain.run(input_documents=docs, question=question)
+                return self._finish_answer(question, response, docs, embed_query)
             
-            response = self.chain.run(input_documents=docs, question=question)
-            return response if response else "I couldn't generate a response for your question. Please try rephrasing it."
+        except Exception as e:
+            if raise_errors:
+                raise
+            return f"Error processing your question: {str(e)}", []
+
+    async def aask_with_sources(self, question: str, raise_errors: bool = False) -> Tuple[str, List[dict]]:
+        """Async variant of ask_with_sources"""
+        error = self._check_question(question)
+        if error:
+            return error, []
+        
+        try:
+            with request_trace("ask", videos=len(self.active_video_ids())) as trace:
+                # Cache lookups and stores may embed the question, so they run off the event loop too
+                embed_query = self._question_embedder()
+                cached = await self._run_blocking(self._cached_answer, question, embed_query)
+                if cached is not None:
+                    trace.status = "cached"
+                    return cached
+                
+                docs = await self.aretrieve(question, embed_query)
+                if not docs:
+                    trace.status = "no_context"
+                    return self.NO_CONTEXT_ANSWER, []
+                
+                with span("llm"):
+                    response = await self.chain.arun(input_documents=docs, question=question)
+                return await self._run_blocking(self._finish_answer, question, response, docs, embed_query)
             
         except Exception as e:
-            return f"Error processing your question: {str(e)}"
+            if raise_errors:
+                raise
+            return f"Error processing your question: {str(e)}", []
+
+    def ask(self, question: str) -> str:
+        """Ask a question about the loaded video"""
+        return self.format_answer(*self.ask_with_sources(question))
+
+    async def aask(self, question: str) -> str:
+        """Async variant of ask"""
+        return self.format_answer(*await self.aask_with_sources(question))
+
+    def _prepare_stream(
+        self, question: str, trace: RequestTrace, embed_query: Callable
+    ) -> Tuple[Optional[str], List[Document]]:
+        """Return a complete reply that needs no generation (a cached answer or a fallback), or the context to generate from"""
+        with activate(trace):
+            cached = self._cached_answer(question, embed_query)
+            if cached is not None:
+                trace.status = "cached"
+                return self.format_answer(*cached), []
+            docs = self.retrieve(question, embed_query)
+        if not docs:
+            trace.status = "no_context"
+            return self.NO_CONTEXT_ANSWER, []
+        return None, docs
+
+    async def _aprepare_stream(
+        self, question: str, trace: RequestTrace, embed_query: Callable
+    ) -> Tuple[Optional[str], List[Document]]:
+        """Async variant of _prepare_stream"""
+        with activate(trace):
+            cached = await self._run_blocking(self._cached_answer, question, embed_query)
+            if cached is not None:
+                trace.status = "cached"
+                return self.format_answer(*cached), []
+            docs = await self.aretrieve(question, embed_query)
+        if not docs:
+            trace.status = "no_context"
+            return self.NO_CONTEXT_ANSWER, []
+        return None, docs
+
+    def stream_ask(self, question: str) -> Iterator[str]:
+        """Ask a question and yield the answer token by token, followed by its sources"""
+        error = self._check_question(question)
+        if error:
+            yield error
+            return
+        # The trace is activated around each step rather than across yields, which may resume in another context
+        trace = RequestTrace("ask", videos=len(self.active_video_ids()), streaming=True)
+        try:
+            yield from self._stream_answer(question, trace)
+        finally:
+            trace.finish()
+
+    def _stream_answer(self, question: str, trace: RequestTrace) -> Iterator[str]:
+        embed_query = self._question_embedder()
+        try:
+            reply, docs = self._prepare_stream(question, trace, embed_query)
+        except Exception as e:
+            trace.status = "error"
+            yield f"Error processing your question: {str(e)}"
+            return
+        if reply is not None:
+            yield reply
+            return
+        
+        tokens = queue.Queue()
+        
+        def generate():
+            try:
+                with activate(trace), span("llm"):
+                    self.streaming_chain.run(input_documents=docs, question=question, callbacks=[QueueCallbackHandler(tokens)])
+                tokens.put(STREAM_END)
+            except Exception as e:
+                tokens.put(e)
+        
+        threading.Thread(target=generate, daemon=True).start()
+        
+        parts = []
+        while True:
+            token = tokens.get()
+            if token is STREAM_END:
+                break
+            if isinstance(token, Exception):
+                trace.status = "error"
+                yield f"Error processing your question: {str(token)}"
+                return
+            if not parts:
+                token = token.lstrip()
+                if not token:
+                    continue
+            parts.append(token)
+            yield token
+        
+        yield from self._stream_suffix(question, parts, docs, trace, embed_query)
+
+    async def astream_ask(self, question: str) -> AsyncIterator[str]:
+        """Async variant of stream_ask"""
+        error = self._check_question(question)
+        if error:
+            yield error
+            return
+        trace = RequestTrace("ask", videos=len(self.active_video_ids()), streaming=True)
+        try:
+            async for token in self._astream_answer(question, trace):
+                yield token
+        finally:
+            trace.finish()
+
+    async def _astream_answer(self, question: str, trace: RequestTrace) -> AsyncIterator[str]:
+        embed_query = self._question_embedder()
+        try:
+            reply, docs = await self._aprepare_stream(question, trace, embed_query)
+        except Exception as e:
+            trace.status = "error"
+            yield f"Error processing your question: {str(e)}"
+            return
+        if reply is not None:
+            yield reply
+            return
+        
+        tokens = asyncio.Queue()
+        
+        async def generate():
+            with span("llm"):
+                return await self.streaming_chain.arun(
+                    input_documents=docs, question=question, callbacks=[AsyncQueueCallbackHandler(tokens)]
+                )
+        
+        # The task copies the current context, so its span lands in this trace
+        with activate(trace):
+            task = asyncio.ensure_future(generate())
+        task.add_done_callback(lambda _: tokens.put_nowait(STREAM_END))
+        
+        parts = []
+        while True:
+            token = await tokens.get()
+            if token is STREAM_END:
+                break
+            if not parts:
+                token = token.lstrip()
+                if not token:
+                    continue
+            parts.append(token)
+            yield token
+        
+        if task.exception() is not None:
+            trace.status = "error"
+            yield f"Error processing your question: {str(task.exception())}"
+            return
+        # Caching the answer may embed the question
+        suffixes = await self._run_blocking(
+            lambda: list(self._stream_suffix(question, parts, docs, trace, embed_query))
+        )
+        for suffix in suffixes:
+            yield suffix
+
+    def _stream_suffix(
+        self, question: str, parts: List[str], docs: List[Document], trace: RequestTrace, embed_query: Callable
+    ) -> Iterator[str]:
+        """Finish a streamed answer: cache it and yield its sources (or a fallback message)"""
+        with activate(trace):
+            answer, sources = self._finish_answer(question, "".join(parts), docs, embed_query)
+        if not parts:
+            yield answer
+        elif sources:
+            yield self.format_answer("", sources)
 
     def ingest(self, url: str) -> str:
-        """Load and process a YouTube video"""
+        """Load and process a YouTube video, adding it to the videos already loaded"""
         if not url or not url.strip():
             return "Please provide a valid YouTube URL."
             
         if not self._validate_youtube_url(url):
             return "Invalid YouTube URL format. Please provide a valid YouTube video URL."
         
-        try:
-            # Load the video transcript
-            loader = YoutubeLoader.from_youtube_url(url, add_video_info=False)
-            documents = loader.load()
-            
-            if not documents:
-                return "No transcript found for this video. Please try a video with captions/transcripts."
-            
-            # Split documents for processing
-            splitted_documents = self.text_splitter.split_documents(documents)
-            
-            if not splitted_documents:
-                return "Failed to process video transcript. Please try another video."
-            
-            # Create vector store
-            self.db = Chroma.from_documents(splitted_documents, self.embeddings).as_retriever()
-            self.chain = load_qa_chain(OpenAI(temperature=0), chain_type="stuff")
-            self.current_video_url = url
-            
-            return "Success"
-            
-        except NoTranscriptFound:
-            return "This video doesn't have any transcripts available. Please try a video with captions."
-        except TranscriptsDisabled:
-            return "Transcripts are disabled for this video. Please try another video."
-        except Exception as e:
-            return f"Error processing video: {str(e)}"
+        video_id = video_id_from_url(url)
+        with request_trace("ingest", video_id=video_id) as trace:
+            try:
+                # A video already in the session is switched to without any work
+                if video_id in self.videos:
+                    trace.status = "loaded"
+                    index = self.videos[video_id][1]
+                elif self.registry is not None:
+                    index = self.registry.acquire_video(video_id, self._load_video_index)
+                    if index is not None:
+                        self._held_video_ids.add(video_id)
+                else:
+                    index = self._load_video_index(video_id)
+                
+                if index is None:
+                    trace.status = "no_transcript"
+                    return "No transcript found for this video. Please try a video with captions/transcripts."
+                
+                self.videos[video_id] = (url, index)
+                if self.selected_video_ids is not None and video_id not in self.selected_video_ids:
+                    self.selected_video_ids.append(video_id)
+                self.current_video_url = url
+                self.current_video_id = video_id
+                
+                return "Success"
+                
+            except NoTranscriptFound:
+                trace.status = "no_transcript"
+                return "This video doesn't have any transcripts available. Please try a video with captions."
+            except TranscriptsDisabled:
+                trace.status = "no_transcript"
+                return "Transcripts are disabled for this video. Please try another video."
+            except Exception as e:
+                trace.status = "error"
+                return f"Error processing video: {str(e)}"
+
+    def _load_video_index(self, video_id: str) -> Optional[VideoIndex]:
+        """Open a video's indexes, building them first if needed; None if it has no transcript"""
+        store = build_video_store(video_id, self.embeddings)
+        return VideoIndex(store) if store is not None else None
+
+    def remove_video(self, video_id: str) -> None:
+        """Remove one video from the session (its persisted index is kept for re-use)"""
+        if self.videos.pop(video_id, None) is not None and self.registry is not None:
+            self._held_video_ids.discard(video_id)
+            self.registry.release_video(video_id)
+        if self.selected_video_ids is not None and video_id in self.selected_video_ids:
+            self.selected_video_ids.remove(video_id)
+        if self.current_video_id == video_id:
+            last_video_id = next(reversed(self.videos), None)
+            self.current_video_id = last_video_id
+            self.current_video_url = self.videos[last_video_id][0] if last_video_id else None
+
+    def select_videos(self, video_ids: Optional[Iterable[str]] = None) -> None:
+        """Restrict questions to some loaded videos, or to all of them with None"""
+        if video_ids is None:
+            self.selected_video_ids = None
+            return
+        video_ids = list(dict.fromkeys(video_ids))
+        unknown = [video_id for video_id in video_ids if video_id not in self.videos]
+        if unknown:
+            raise ValueError(f"Videos not loaded: {', '.join(unknown)}")
+        self.selected_video_ids = video_ids
+
+    def active_video_ids(self) -> List[str]:
+        """Return the IDs of the videos questions are answered from"""
+        if self.selected_video_ids is None:
+            return list(self.videos)
+        return list(self.selected_video_ids)
+
+    def loaded_videos(self) -> Dict[str, str]:
+        """Return the loaded videos as video ID -> URL"""
+        return {video_id: url for video_id, (url, _) in self.videos.items()}
 
     def forget(self) -> None:
-        """Clear the current video data"""
-        self.db = None
-        self.chain = None
+        """Clear every loaded video (the persisted indexes are kept for re-use)"""
+        for video_id in list(self.videos):
+            self.remove_video(video_id)
+        self.selected_video_ids = None
         self.current_video_url = None
+        self.current_video_id = None
 
     def get_current_video(self) -> str:
-        """Get the currently loaded video URL"""
+        """Get the most recently loaded video URL"""
         return self.current_video_url or "No video loaded"
 
+    def get_cache_stats(self) -> dict:
+        """Get embedding cache hit/miss statistics"""
+        return embedding_cache_stats(self.embeddings)
+
+    def get_answer_cache_stats(self) -> dict:
+        """Get answer cache hit/miss statistics"""
+        return self.answer_cache.stats() if self.answer_cache is not None else {}
+
     def is_video_loaded(self) -> bool:
-        """Check if a video is currently loaded"""
-        return self.db is not None and self.chain is not None
\ No newline at end of file
+        """Check if at least one video is loaded"""
+        return bool(self.videos)
\ No newline at end of file